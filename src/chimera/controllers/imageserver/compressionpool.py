@@ -0,0 +1,100 @@
+
+from chimera.util.image import compressFile
+
+import multiprocessing
+import threading
+
+import logging
+log = logging.getLogger(__name__)
+
+
+def _compress(key, filename, format):
+    # runs on the worker processes, errors go back as text (not all
+    # exceptions can be pickled)
+    try:
+        return (key, compressFile(filename, format), None)
+    except Exception, e:
+        return (key, None, "%s: %s" % (e.__class__.__name__, e))
+
+
+class CompressionPool (object):
+
+    """
+    Fixed set of worker processes compressing images for an
+    ImageServer (and so for every camera using it).
+
+    At most queueSize jobs are pending at any time, submit blocks
+    until there is room. That holds back whoever is producing images
+    instead of piling up processes and half-compressed files.
+
+    done(key, compressed, error) is called (from a pool thread) as
+    each job finishes, with the name of the compressed file or an
+    error message.
+    """
+
+    def __init__(self, workers=2, queueSize=8, done=None):
+        self.done = done
+
+        self._pool = multiprocessing.Pool(workers)
+        self._slots = threading.Semaphore(queueSize)
+        self._lock = threading.Lock()
+
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+
+    def submit(self, key, filename, format="bz2"):
+
+        self._slots.acquire()
+
+        self._lock.acquire()
+        try:
+            self.pending += 1
+        finally:
+            self._lock.release()
+
+        try:
+            self._pool.apply_async(_compress, (key, filename, format),
+                                   callback=self._finished)
+        except Exception:
+            self._finished((key, None, "pool closed"))
+            raise
+
+        return True
+
+    def _finished(self, result):
+
+        key, compressed, error = result
+
+        self._lock.acquire()
+        try:
+            self.pending -= 1
+            if error:
+                self.failed += 1
+            else:
+                self.completed += 1
+        finally:
+            self._lock.release()
+
+        self._slots.release()
+
+        if error:
+            log.warning("Unable to compress %s: %s" % (key, error))
+
+        if self.done:
+            try:
+                self.done(key, compressed, error)
+            except Exception:
+                log.exception("Error handling compressed %s" % key)
+
+    def getStats(self):
+        return {"pending": self.pending,
+                "completed": self.completed,
+                "failed": self.failed}
+
+    def close(self):
+        """
+        Wait for pending jobs and stop the workers.
+        """
+        self._pool.close()
+        self._pool.join()
@@ -2,11 +2,43 @@ from chimera.interfaces.camera import (Shutter, Bitpix)
 
 from chimera.core.exceptions import ChimeraValueError, ObjectNotFoundException
 
+import threading
+import time
+
 import logging
 #import chimera.core.log
 log = logging.getLogger(__name__)
 
 
+class MetadataFetcher (threading.Thread):
+
+    """
+    Calls getMetadata on a single source, so sources can be asked
+    concurrently and a slow one doesn't hold the others.
+    """
+
+    def __init__(self, location, proxy, request):
+        threading.Thread.__init__(self, name="metadata from %s" % location)
+        self.setDaemon(True)
+
+        self.location = location
+        self.proxy = proxy
+        self.request = request
+
+        self.metadata = None
+        self.error = None
+        self.elapsed = None
+
+    def run(self):
+        t0 = time.time()
+        try:
+            self.metadata = self.proxy.getMetadata(self.request)
+        except Exception, e:
+            log.exception('Unable to get metadata from %s' % self.location)
+            self.error = e
+        self.elapsed = time.time() - t0
+
+
 class ImageRequest (dict):
 
     valid_keys = ['exptime', 'frames',
@@ -15,7 +47,7 @@ class ImageRequest (dict):
                   'bitpix', 'filename',
                   'compress', 'compress_format',
                   'type', 'wait_dome',
-                  'object_name']
+                  'object_name', 'pipeline']
 
     def __init__(self, **kwargs):
 
@@ -28,10 +60,13 @@ class ImageRequest (dict):
                     'bitpix': Bitpix.uint16,
                     'filename': '$DATE-$TIME',
                     'compress': True,
+                    # BZ2, GZIP, ZIP or RICE/HCOMPRESS (FITS tile compression)
                     'compress_format': "BZ2",
                     'type': 'object',
                     'wait_dome': True,
-                    'object_name': ''}
+                    'object_name': '',
+                    # save frames in background while taking the next one
+                    'pipeline': False}
 
         # Automatically call getMetadata on all instruments + site as long
         # as only one instance of each is listed by the manager.
@@ -47,7 +82,19 @@ class ImageRequest (dict):
         # (=headers+metadatapre+metadatapost)
         self.headers = []
 
+        # Seconds to wait for each metadata source. Sources which don't
+        # answer in time get a COMMENT in the header instead (or their
+        # values from the previous frame, if useCachedMetadata is set).
+        self.metadataTimeout = 5.0
+        self.useCachedMetadata = True
+
+        # How long (in seconds) each source took to answer on the last
+        # frame, None for those which didn't answer in time.
+        self.metadataTimes = {}
+
         self._proxies = {}
+        self._lastMetadata = {}
+        self._pending = {}
 
         self.update(defaults)
 
@@ -147,13 +194,94 @@ class ImageRequest (dict):
 
     def _getHeaders(self, manager, locations):
 
+        sources = []
+
+        # all proxies first: fetchers pickle us while they run, so we
+        # don't touch our state until they are all started
         for location in locations:
 
+            # the same object may be listed more than once (a camera
+            # with a builtin filter wheel, for instance)
+            if location in sources:
+                continue
+
             if not location in self._proxies:
                 try:
                     self._proxies[location] = manager.getProxy(location)
                 except Exception:
                     log.exception(
                         'Unable to get metadata from %s' % (location))
+                    continue
+
+            sources.append(location)
+
+        fetchers = []
 
-            self.headers += self._proxies[location].getMetadata(self)
+        for location in sources:
+
+            # still busy with our last call? don't stack another one
+            fetcher = self._pending.get(location)
+
+            # a late answer from the last frame still refreshes our cache
+            if fetcher is not None and not fetcher.isAlive() and \
+                    fetcher.error is None:
+                self._lastMetadata[location] = fetcher.metadata
+
+            if fetcher is None or not fetcher.isAlive():
+                fetcher = MetadataFetcher(
+                    location, self._proxies[location], self)
+                fetcher.start()
+                self._pending[location] = fetcher
+
+            fetchers.append(fetcher)
+
+        deadline = time.time() + self.metadataTimeout
+
+        for fetcher in fetchers:
+
+            fetcher.join(max(0, deadline - time.time()))
+
+            location = fetcher.location
+
+            if not fetcher.isAlive():
+                del self._pending[location]
+                self.metadataTimes[location] = fetcher.elapsed
+                log.debug("Metadata from %s took %.3f s." %
+                          (location, fetcher.elapsed))
+
+                if fetcher.error is None:
+                    self._lastMetadata[location] = fetcher.metadata
+                    self.headers += fetcher.metadata
+                    continue
+
+                reason = "failed"
+            else:
+                self.metadataTimes[location] = None
+                log.warning("Metadata from %s not ready after %.1f s." %
+                            (location, self.metadataTimeout))
+                reason = "timed out"
+
+            if self.useCachedMetadata and location in self._lastMetadata:
+                self.headers += self._lastMetadata[location]
+                self.headers.append(
+                    ("COMMENT", "%s metadata %s, using previous values" %
+                     (location, reason), ""))
+            else:
+                self.headers.append(
+                    ("COMMENT", "%s metadata %s, not available" %
+                     (location, reason), ""))
+
+    # we are pickled on every getMetadata call, from the fetcher
+    # threads, while _getHeaders goes on: leave out threads and the
+    # bookkeeping it changes meanwhile, and send a copy of the headers
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_pending"] = {}
+        state["_proxies"] = {}
+        state["_lastMetadata"] = {}
+        state["metadataTimes"] = {}
+        state["headers"] = list(self.headers)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
@@ -1,5 +1,6 @@
 from chimera.core.chimeraobject import ChimeraObject
 from chimera.controllers.imageserver.imageserverhttp import ImageServerHTTP
+from chimera.controllers.imageserver.compressionpool import CompressionPool
 
 from chimera.util.image import Image
 
@@ -22,7 +23,13 @@ class ImageServer(ChimeraObject):
 
         'httpd': True,
         'http_host': 'default',
-        'http_port': 7669}
+        'http_port': 7669,
+
+        # compression worker processes, shared by all cameras, and
+        # how many images may be waiting for them before compress
+        # calls start to block
+        'compress_workers': 2,
+        'compress_queue': 8}
 
     def __init__(self):
         ChimeraObject.__init__(self)
@@ -30,8 +37,14 @@ class ImageServer(ChimeraObject):
         self.imagesByID = {}
         self.imagesByPath = {}
 
+        self.compressor = None
+
     def __start__(self):
 
+        self.compressor = CompressionPool(self['compress_workers'],
+                                          self['compress_queue'],
+                                          self._compressed)
+
         if self["http_host"] == "default":
             self["http_host"] = self.getManager().getHostname()
 
@@ -51,6 +64,10 @@ class ImageServer(ChimeraObject):
         if self["httpd"]:
             self.http.stop()
 
+        # don't leave half compressed files behind
+        if self.compressor:
+            self.compressor.close()
+
         for image in self.imagesByID.values():
             self.unregister(image)
 
@@ -92,9 +109,27 @@ class ImageServer(ChimeraObject):
             self.getDaemon().disconnect(image)
             del self.imagesByID[image.GUID()]
             del self.imagesByPath[image.filename()]
+            self.imagesByPath.pop(image.compressedFilename(), None)
         except Exception, e:
             print ''.join(Pyro.util.getPyroTraceback(e))
 
+    def compress(self, id, format="bz2"):
+        """
+        Queue the image with the given id to be compressed by our
+        worker pool. Blocks while the pool is full.
+        """
+        image = self.getImageByID(id)
+        if not image:
+            return False
+
+        return self.compressor.submit(id, image.filename(), format)
+
+    def _compressed(self, id, filename, error):
+        image = self.getImageByID(id)
+        if image and filename:
+            image.compressedFilename(filename)
+            self.imagesByPath[filename] = image
+
     def getImageByID(self, id):
         if id in self.imagesByID:
             return self.imagesByID[id]
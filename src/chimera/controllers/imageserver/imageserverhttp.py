@@ -1,19 +1,60 @@
-
 import threading
 #import logging
 import os
+import re
+import sys
+import errno
+import socket
+import json
+import urlparse
+import email.utils
 
 from SimpleHTTPServer import SimpleHTTPRequestHandler
 from BaseHTTPServer import HTTPServer
+from SocketServer import ThreadingMixIn
+
+try:
+    # zero-copy transfers (pysendfile)
+    from sendfile import sendfile
+    have_sendfile = True
+except ImportError:
+    have_sendfile = False
+
+
+# compressed variant extension -> (content type, content encoding)
+COMPRESSED_TYPES = {".gz": ("application/gzip", "gzip"),
+                    ".bz2": ("application/x-bzip2", "bzip2"),
+                    ".zip": ("application/zip", None),
+                    ".fz": ("image/fits", None)}
+
+# default and maximum page size of the image listings
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+COPY_CHUNK = 64 * 1024
 
 
 class ImageServerHTTPHandler(SimpleHTTPRequestHandler):
 
+    protocol_version = "HTTP/1.1"
+
     def do_GET(self):
-        if self.path.startswith("/image/"):
-            self.image()
+        self.route()
+
+    def do_HEAD(self):
+        self.route(body=False)
+
+    def route(self, body=True):
+
+        url = urlparse.urlparse(self.path)
+        query = urlparse.parse_qs(url.query)
+
+        if url.path.startswith("/image/"):
+            self.image(url.path[len("/image/"):], body)
+        elif url.path == "/list":
+            self.list_json(query, body)
         else:
-            self.list()
+            self.list(query, body)
 
     def log_message(self, format, *args):
         self.server.ctrl.log.info("%s - - [%s] %s" %
@@ -21,54 +62,245 @@ class ImageServerHTTPHandler(SimpleHTTPRequestHandler):
                                    self.log_date_time_string(),
                                    format % args))
 
-    def send_head(self, response=200, ctype=None, length=None, modified=None):
+    def send_head(self, response=200, ctype=None, length=None, modified=None,
+                  headers=()):
         self.send_response(response)
         self.send_header("Content-type", ctype or "text/plain")
-        self.send_header("Content-Length", length or 1)
-        self.send_header("Last-Modified", self.date_time_string(modified))
+        self.send_header("Content-Length", length or 0)
+        if modified:
+            self.send_header("Last-Modified", self.date_time_string(modified))
+        for header in headers:
+            self.send_header(*header)
         self.end_headers()
 
-    def response(self, code, txt, ctype):
+    def response(self, code, txt, ctype="text/plain", body=True):
         self.send_head(code, ctype, len(txt))
-        self.wfile.write(txt)
+        if body:
+            self.wfile.write(txt)
 
-    def response_file(self, filename, ctype):
-        f = open(filename)
-        if not f:
-            self.response(404, "Couldn't find")
-        else:
+    #
+    # images
+    #
+
+    def image(self, id, body=True):
+
+        if not id:
+            return self.response(404, "What are you looking for?", body=body)
+
+        img = self.server.ctrl.getImageByID(id)
+        if not img:
+            return self.response(404, "Couldn't find the image.", body=body)
+
+        filename, ctype, encoding = self.negotiate(img)
+
+        if not filename:
+            return self.response(404, "Couldn't find the image file.", body=body)
+
+        self.response_file(filename, ctype, encoding, body)
+
+    def negotiate(self, img):
+        """
+        Choose between the image and its compressed variant. Compressed
+        variants are sent as Content-Encoding when the client accepts
+        it, the plain file when it is still around, or else whatever
+        we have (a .fz is a FITS file anyway).
+        """
+        original = img.filename()
+        compressed = img.compressedFilename()
+
+        accepted = [enc.split(";")[0].strip().lower()
+                    for enc in self.headers.get("Accept-Encoding", "").split(",")]
+
+        if compressed != original and os.path.exists(compressed):
+            ext = os.path.splitext(compressed)[1]
+            ctype, encoding = COMPRESSED_TYPES.get(ext, ("application/octet-stream", None))
+
+            if encoding and encoding in accepted:
+                return (compressed, "image/fits", encoding)
+
+            if not os.path.exists(original):
+                return (compressed, ctype, None)
+
+        if os.path.exists(original):
+            return (original, "image/fits", None)
+
+        return (None, None, None)
+
+    def response_file(self, filename, ctype, encoding=None, body=True):
+
+        try:
+            f = open(filename, "rb")
+        except IOError:
+            return self.response(404, "Couldn't find the image file.", body=body)
+
+        try:
             fs = os.fstat(f.fileno())
-            self.send_head(200, "image/fits",  str(fs[6]), fs.st_mtime)
-            self.copyfile(f, self.wfile)
+            size = fs.st_size
+
+            etag = '"%x-%x-%x"' % (fs.st_ino, size, int(fs.st_mtime))
+
+            headers = [("ETag", etag),
+                       ("Accept-Ranges", "bytes"),
+                       ("Vary", "Accept-Encoding")]
+            if encoding:
+                headers.append(("Content-Encoding", encoding))
+
+            if self.not_modified(etag, fs.st_mtime):
+                return self.send_head(304, ctype, 0, fs.st_mtime, headers)
+
+            first, last = 0, size - 1
+            code = 200
+
+            ranges = self.headers.get("Range")
+            if ranges and self.headers.get("If-Range", etag) == etag:
+                byterange = self.parse_range(ranges, size)
+
+                if byterange is None:
+                    return self.send_head(416, ctype, 0, fs.st_mtime,
+                                          [("Content-Range", "bytes */%d" % size)])
+                if byterange:
+                    first, last = byterange
+                    code = 206
+                    headers.append(("Content-Range",
+                                    "bytes %d-%d/%d" % (first, last, size)))
+
+            length = last - first + 1
+            self.send_head(code, ctype, str(length), fs.st_mtime, headers)
+
+            if body and length > 0:
+                self.copy_range(f, first, length)
+        finally:
             f.close()
 
-    def image(self):
+    def not_modified(self, etag, mtime):
+
+        match = self.headers.get("If-None-Match")
+        if match is not None:
+            return match.strip() == "*" or etag in [tag.strip() for tag in match.split(",")]
+
+        since = self.headers.get("If-Modified-Since")
+        if since:
+            since = email.utils.parsedate_tz(since)
+            if since:
+                return int(mtime) <= email.utils.mktime_tz(since)
+
+        return False
+
+    def parse_range(self, ranges, size):
+        """
+        Parse a single range 'bytes=first-last' (either end may be
+        missing). Returns (first, last), False to ignore the header
+        (malformed or multiple ranges) or None if unsatisfiable.
+        """
+        match = re.match(r"^bytes=(\d*)-(\d*)$", ranges.strip())
+        if not match or match.groups() == ("", ""):
+            return False
 
-        args = self.path.split("/image/")
+        first, last = match.groups()
 
-        if len(args) < 2:
-            return self.response(200, "What are you looking for?")
+        if not first:
+            # suffix: last N bytes
+            first, last = max(0, size - int(last)), size - 1
         else:
-            img = self.server.ctrl.getImageByID(args[1])
-            if not img:
-                self.response(200, "Couldn't find the image.")
-            else:
-                self.response_file(img.filename(), "image/fits")
-
-    def list(self):
-
-        toReturn = '<table><tr><th>Image ID</th><th>Path</th></tr>'
-        keys = self.server.ctrl.imagesByPath.keys()
-        keys.sort()
-        for key in keys:
-            image = self.server.ctrl.imagesByPath[key]
+            first = int(first)
+            last = min(int(last), size - 1) if last else size - 1
+
+        if first >= size or first > last:
+            return None
+
+        return (first, last)
+
+    def copy_range(self, f, offset, length):
+
+        if have_sendfile:
+            self.wfile.flush()
+            out = self.connection.fileno()
+            while length > 0:
+                sent = sendfile(out, f.fileno(), offset, length)
+                if not sent:
+                    break
+                offset += sent
+                length -= sent
+            return
+
+        f.seek(offset)
+        while length > 0:
+            chunk = f.read(min(COPY_CHUNK, length))
+            if not chunk:
+                break
+            self.wfile.write(chunk)
+            length -= len(chunk)
+
+    #
+    # listings
+    #
+
+    def page(self, query):
+
+        def arg(name, default):
+            try:
+                return max(0, int(query.get(name, [default])[0]))
+            except ValueError:
+                return default
+
+        offset = arg("offset", 0)
+        limit = min(arg("limit", PAGE_SIZE) or PAGE_SIZE, MAX_PAGE_SIZE)
+
+        # by ID: compressed images are also listed by their compressed path
+        images = sorted(self.server.ctrl.imagesByID.values(),
+                        key=lambda image: image.filename())
+
+        return (len(images), offset, limit, images[offset:offset + limit])
+
+    def list_json(self, query, body=True):
+
+        total, offset, limit, images = self.page(query)
+
+        result = {"total": total,
+                  "offset": offset,
+                  "limit": limit,
+                  "images": [{"id": image.GUID(),
+                              "path": image.filename(),
+                              "compressed": image.compressedFilename(),
+                              "url": "/image/%s" % image.GUID()}
+                             for image in images]}
+
+        self.response(200, json.dumps(result), "application/json", body)
+
+    def list(self, query={}, body=True):
+
+        total, offset, limit, images = self.page(query)
+
+        rows = ['<table><tr><th>Image ID</th><th>Path</th></tr>']
+        for image in images:
             id = image.GUID()
-            path = image.filename()
-            toReturn += (
+            rows.append(
                 '<tr><td><a href="/image/%s">%s</a></td><td><a href="/image/%s">%s</a></td></tr>' %
-                (id, id, id, path))
+                (id, id, id, image.filename()))
+        rows.append('</table>')
+
+        if offset > 0:
+            rows.append('<a href="/?offset=%d&limit=%d">previous</a> ' %
+                        (max(0, offset - limit), limit))
+        if offset + limit < total:
+            rows.append('<a href="/?offset=%d&limit=%d">next</a>' %
+                        (offset + limit, limit))
+
+        self.response(200, "".join(rows), "text/html", body)
 
-        self.response(200, toReturn, "text/html")
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+
+    # one thread per request, so a client downloading a large frame
+    # doesn't hold everybody else
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # clients going away in the middle of a transfer are no news
+        e = sys.exc_info()[1]
+        if isinstance(e, socket.error) and e.errno in (errno.EPIPE, errno.ECONNRESET):
+            return
+        HTTPServer.handle_error(self, request, client_address)
 
 
 class ImageServerHTTP(threading.Thread):
@@ -85,7 +317,7 @@ class ImageServerHTTP(threading.Thread):
 
     def run(self):
 
-        srv = HTTPServer(
+        srv = ThreadingHTTPServer(
             (self.ctrl['http_host'], self.ctrl['http_port']),
             ImageServerHTTPHandler)
         self.ctrl.log.info("Starting HTTP server on %s:%d" %
@@ -99,5 +331,7 @@ class ImageServerHTTP(threading.Thread):
         while not self.die.isSet():
             srv.handle_request()
 
+        srv.server_close()
+
     def stop(self):
         self.die.set()
@@ -3,6 +3,7 @@ from chimera.controllers.scheduler.sequential import SequentialScheduler
 from chimera.controllers.scheduler.model import Session, Program
 
 import logging
+import time
 
 log = logging.getLogger(__name__)
 
@@ -15,11 +16,9 @@ class CircularScheduler (SequentialScheduler):
     def next (self):
         if self.rq.empty():
             session = Session()
-            programs = session.query(Program).all()
-
-            for program in programs:
-                program.finished = False
-
+            session.query(Program).update({Program.finished: False,
+                                           Program.updatedAt: time.time()},
+                                          synchronize_session=False)
             session.commit()
 
             self.reschedule(self.machine)
@@ -4,6 +4,7 @@ from chimera.core.event import event
 from chimera.controllers.scheduler.machine import Machine
 from chimera.controllers.scheduler.sequential import SequentialScheduler
 from chimera.controllers.scheduler.circular import CircularScheduler
+from chimera.controllers.scheduler.slewcost import SlewCostScheduler
 from chimera.controllers.scheduler.executor import ProgramExecutor
 from chimera.controllers.scheduler.states import State
 from chimera.controllers.scheduler.model import Session
@@ -11,11 +12,12 @@ from chimera.controllers.scheduler.model import Session
 from chimera.util.enum import Enum
 
 
-SchedulingAlgorithm = Enum("SEQUENTIAL", "CIRCULAR")
+SchedulingAlgorithm = Enum("SEQUENTIAL", "CIRCULAR", "SLEWCOST")
 
 
 SchedulingAlgorithms = {SchedulingAlgorithm.SEQUENTIAL: SequentialScheduler(),
-                        SchedulingAlgorithm.CIRCULAR: CircularScheduler()}
+                        SchedulingAlgorithm.CIRCULAR: CircularScheduler(),
+                        SchedulingAlgorithm.SLEWCOST: SlewCostScheduler()}
 
 
 class Scheduler(ChimeraObject):
@@ -78,6 +80,14 @@ class Scheduler(ChimeraObject):
         if self.machine:
             self.machine.restartAllPrograms()
 
+    def getStats(self):
+        """
+        Programs dispatched and how late they started compared to
+        their slewAt (in seconds). See Machine.getStats.
+        """
+        if self.machine:
+            return self.machine.getStats()
+
     def state(self):
         return self.machine.state()
 
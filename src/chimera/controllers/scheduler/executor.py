@@ -14,6 +14,32 @@ import time
 log = logging.getLogger(__name__)
 
 
+class Branch(threading.Thread):
+
+    """
+    One hardware move (see ActionHandler.setup) running on its own.
+    """
+
+    def __init__(self, instrument, function):
+        threading.Thread.__init__(self, name="%s branch" % instrument)
+        self.setDaemon(True)
+
+        self.instrument = instrument
+        self.function = function
+
+        self.error = None
+        self.elapsed = None
+
+    def run(self):
+        t0 = time.time()
+        try:
+            self.function()
+        except Exception, e:
+            log.exception("[branch] %s failed" % self.instrument)
+            self.error = e
+        self.elapsed = time.time() - t0
+
+
 class ProgramExecutor(object):
 
     def __init__ (self, controller):
@@ -21,6 +47,16 @@ class ProgramExecutor(object):
         self.currentHandler = None
         self.currentAction  = None
 
+        # actions whose hardware is moving (to be aborted too)
+        self.running = []
+
+        # run independent moves (slew, dome, filter...) at the same time
+        self.parallel = True
+
+        # per instrument time of the last setup, and how long it took
+        self.lastSetup = {}
+        self.lastSetupTime = 0.0
+
         self.mustStop = threading.Event()
 
         self.controller = controller
@@ -37,55 +73,153 @@ class ProgramExecutor(object):
 
         self.mustStop.clear()
 
-        for action in program.actions:
+        actions = list(program.actions)
+
+        while actions:
 
             # aborted?
             if self.mustStop.isSet():
                 raise ProgramExecutionAborted()
 
+            group = self._group(actions)
+            actions = actions[len(group):]
+
             t0 = time.time()
 
+            for action, handler, moves in group:
+                if self.parallel:
+                    for branch in moves:
+                        branch.start()
+                self.running.append((handler, action))
+
             try:
-                self.currentAction = action
-                self.currentHandler = self.actionHandlers[type(action)]
+                for action, handler, moves in group:
+                    self._execute(action, handler, moves, group, t0)
+            finally:
+                self.running = []
+
+    def _group(self, actions):
+        """
+        Actions which can start moving together: up to the first one
+        which needs everything in place (see ActionHandler.waitAll) or
+        which needs an instrument some other action is moving.
+        """
+        group = []
+        taken = set()
+
+        for action in actions:
+            handler = self.actionHandlers.get(type(action))
+
+            moves = []
+            if handler is not None:
+                moves = [Branch(instrument, function) for instrument, function in handler.setup(action)]
+
+            instruments = set([branch.instrument for branch in moves])
+            if group and instruments & taken:
+                break
+
+            group.append((action, handler, moves))
+            taken.update(instruments)
+
+            if not self.parallel or handler is None or handler.waitAll:
+                break
+
+        return group
 
-                logMsg = str(self.currentHandler.log(action))
-                log.debug("[start] %s " % logMsg)
-                self.controller.actionBegin(action, logMsg)
+    def _execute(self, action, handler, moves, group, t0):
 
+        t1 = time.time()
+
+        try:
+            self.currentAction = action
+            self.currentHandler = self.actionHandlers[type(action)]
+
+            logMsg = str(self.currentHandler.log(action))
+            log.debug("[start] %s " % logMsg)
+            self.controller.actionBegin(action, logMsg)
+
+            self._join(moves)
+
+            # everything must be in place before the shutter opens
+            if handler.waitAll:
+                everything = sum([branches for a, h, branches in group], [])
+                self._join(everything)
+                self._logSetup(everything, t0)
+
+            if not self.mustStop.isSet():
                 self.currentHandler.process(action)
 
-                # instruments just returns in case of abort, so we need to check handler
-                # returned 'cause of abort or not
-                if self.mustStop.isSet():
-                    self.controller.actionComplete(action, SchedulerStatus.ABORTED)
-                    raise ProgramExecutionAborted()
-                else:
-                    self.controller.actionComplete(action, SchedulerStatus.OK)
-
-            except ProgramExecutionException, e:
-                self.controller.actionComplete(action, SchedulerStatus.ERROR)
-                raise
-            except KeyError:
-                log.debug("No handler to %s action. Skipping it" % action)
-            finally:
-                log.debug("[finish] took: %f s" % (time.time() - t0))
+            # instruments just returns in case of abort, so we need to check handler
+            # returned 'cause of abort or not
+            if self.mustStop.isSet():
+                self.controller.actionComplete(action, SchedulerStatus.ABORTED)
+                raise ProgramExecutionAborted()
+            else:
+                self.controller.actionComplete(action, SchedulerStatus.OK)
+
+        except ProgramExecutionException, e:
+            self.controller.actionComplete(action, SchedulerStatus.ERROR)
+            raise
+        except KeyError:
+            log.debug("No handler to %s action. Skipping it" % action)
+        finally:
+            log.debug("[finish] took: %f s" % (time.time() - t1))
+
+    def _join(self, moves):
+
+        for branch in moves:
+            if self.parallel:
+                branch.join()
+            elif branch.elapsed is None:
+                branch.run()
+
+        if self.mustStop.isSet():
+            return
+
+        errors = ["%s: %s" % (branch.instrument, branch.error) for branch in moves if branch.error]
+        if errors:
+            # don't leave the others moving
+            self.stop()
+            self.mustStop.clear()
+            raise ProgramExecutionException(", ".join(errors))
+
+    def _logSetup(self, moves, t0):
+
+        if not moves:
+            return
+
+        elapsed = time.time() - t0
+        serial = sum([branch.elapsed or 0 for branch in moves])
+
+        self.lastSetup = dict([(branch.instrument, branch.elapsed) for branch in moves])
+        self.lastSetupTime = elapsed
+
+        for branch in moves:
+            log.debug("[setup] %s took %.3f s" % (branch.instrument, branch.elapsed or 0))
+
+        log.info("[setup] %s took %.3f s (%.3f s one after another)" %
+                 (", ".join([branch.instrument for branch in moves]), elapsed, serial))
 
     def stop(self):
         if self.currentHandler:
             self.mustStop.set()
-            self.currentHandler.abort(self.currentAction)
+
+            # everything moving, not only the current action
+            for handler, action in self.running or [(self.currentHandler, self.currentAction)]:
+                try:
+                    handler.abort(action)
+                except Exception:
+                    log.exception("Error aborting %s" % action)
 
     def _injectInstrument(self, handler):
         if not issubclass(handler, ActionHandler):
             return
 
-        if not hasattr(handler.process, "__requires__"):
-            return
+        for method in (handler.setup, handler.process):
 
-        for instrument in handler.process.__requires__:
-            try:
-                setattr(handler, instrument,
-                        self.controller.getManager().getProxy(self.controller[instrument]))
-            except ObjectNotFoundException, e:
-                log.error("No instrument to inject on %s handler" % handler)
+            for instrument in getattr(method, "__requires__", []):
+                try:
+                    setattr(handler, instrument,
+                            self.controller.getManager().getProxy(self.controller[instrument]))
+                except ObjectNotFoundException, e:
+                    log.error("No instrument to inject on %s handler" % handler)
@@ -1,5 +1,6 @@
 from chimera.core.exceptions import ProgramExecutionException, printException
 from chimera.controllers.imageserver.imagerequest import ImageRequest
+from chimera.interfaces.dome import Mode
 
 import copy
 
@@ -17,6 +18,21 @@ def requires(instrument):
 
 class ActionHandler(object):
 
+    # process needs everything in place, so all moves started so far
+    # (by this action or the ones before it) must finish first
+    waitAll = True
+
+    @staticmethod
+    def setup(action):
+        """
+        Hardware moves needed before process, as a list of
+        (instrument, function) pairs. Moves on different instruments
+        are independent, so the executor may run them at the same time
+        (and along with the moves of the following actions). Functions
+        run on their own threads, so they must get their own proxies.
+        """
+        return []
+
     @staticmethod
     def process(action):
         pass
@@ -31,25 +47,41 @@ class ActionHandler(object):
 
 class PointHandler(ActionHandler):
 
+    # just moves, the next action can start moving along
+    waitAll = False
+
     @staticmethod
     @requires("telescope")
     @requires("dome")
-    def process(action):
-        telescope = PointHandler.telescope
-        dome = PointHandler.dome
+    @requires("site")
+    def setup(action):
 
-        try:
+        def slew():
+            telescope = copy.copy(PointHandler.telescope)
             if action.targetRaDec is not None:
                 telescope.slewToRaDec(action.targetRaDec)
             elif action.targetAltAz is not None:
                 telescope.slewToAltAz(action.targetAltAz)
             elif action.targetName is not None:
                 telescope.slewToObject(action.targetName)
-                
+
+        def moveDome():
+            dome = copy.copy(PointHandler.dome)
             dome.openSlit()
-            
-        except Exception, e:
-            raise ProgramExecutionException(str(e))
+
+            # a tracking dome only follows the telescope after the
+            # slew, so we send it where the telescope is going
+            site = getattr(PointHandler, "site", None)
+            if site and action.targetRaDec is not None and dome.getMode() == Mode.Track:
+                altAz = copy.copy(site).raDecToAltAz(action.targetRaDec)
+                dome.slewToAz(altAz.az)
+
+        return [("telescope", slew), ("dome", moveDome)]
+
+    @staticmethod
+    def process(action):
+        # all done on setup
+        pass
 
     @staticmethod
     def abort(action):
@@ -72,17 +104,25 @@ class PointHandler(ActionHandler):
 class ExposeHandler(ActionHandler):
 
     @staticmethod
-    @requires("camera")
     @requires("filterwheel")
+    def setup(action):
+
+        def changeFilter():
+            # not considered in abort handling (should be fast enough to wait!)
+            filterwheel = copy.copy(ExposeHandler.filterwheel)
+            filterwheel.setFilter(str(action.filter))
+
+        if action.filter is not None:
+            return [("filterwheel", changeFilter)]
+
+        return []
+
+    @staticmethod
+    @requires("camera")
     def process(action):
 
         camera = ExposeHandler.camera
-        filterwheel = ExposeHandler.filterwheel
 
-        # not considered in abort handling (should be fast enough to wait!)
-        if action.filter is not None:
-            filterwheel.setFilter(str(action.filter))
-            
         ir = ImageRequest(frames   = int(action.frames),
                           exptime  = float(action.exptime),
                           shutter  = str(action.shutter),
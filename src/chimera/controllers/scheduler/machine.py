@@ -9,15 +9,100 @@ from chimera.core.site import Site
 import threading
 import logging
 
+import Queue
 import time
 
 log = logging.getLogger(__name__)
 
+
+class ProgramRunner(threading.Thread):
+
+    """
+    Runs programs handed by the Machine, one at a time, always on the
+    same thread. The Machine decides when (and whether) to run them.
+    """
+
+    def __init__(self, machine):
+        threading.Thread.__init__(self, name="scheduler program runner")
+        self.setDaemon(True)
+
+        self.machine = machine
+        self.programs = Queue.Queue()
+
+        self.aborted = False
+        self._busy = threading.Event()
+
+    def run(self):
+
+        while True:
+            program = self.programs.get()
+
+            if program is None:
+                break
+
+            try:
+                self.process(program)
+            except Exception:
+                log.exception("[error] unexpected error running %s" % str(program))
+
+            self._busy.clear()
+            self.machine.wakeup()
+
+    def runProgram(self, program):
+        self._busy.set()
+        self.programs.put(program)
+
+    def busy(self):
+        return self._busy.isSet()
+
+    def stop(self):
+        self.programs.put(None)
+
+    def process(self, program):
+
+        machine = self.machine
+
+        # session to be used by executor and handlers
+        session = Session()
+
+        # the scheduler already loaded it (actions included), no
+        # need to ask the database again
+        task = session.merge(program, load=False)
+
+        log.debug("[start] %s" % str(task))
+
+        self.aborted = False
+        machine.controller.programBegin(program)
+
+        try:
+            machine.executor.execute(task)
+            log.debug("[finish] %s" % str(task))
+            machine.scheduler.done(task)
+            machine.controller.programComplete(program, SchedulerStatus.OK)
+        except ProgramExecutionException, e:
+            machine.scheduler.done(task, error=e)
+            machine.controller.programComplete(program, SchedulerStatus.ERROR, str(e))
+            log.debug("[error] %s (%s)" % (str(task), str(e)))
+        except ProgramExecutionAborted, e:
+            machine.scheduler.done(task, error=e)
+            machine.controller.programComplete(program, SchedulerStatus.ABORTED, "Aborted by user.")
+            self.aborted = True
+            log.debug("[aborted by user] %s" % str(task))
+
+        session.commit()
+
+
 class Machine(threading.Thread):
 
+    """
+    Scheduler state machine. Programs are taken from the scheduler one
+    at a time and handed to a ProgramRunner when their slewAt time
+    comes. Waiting for it is just a (timed) sleep on the wake up call,
+    so state changes (start/stop/shutdown) are handled right away.
+    """
+
     __state = None
     __stateLock = threading.Lock()
-    __wakeUpCall = threading.Condition()
 
     def __init__(self, scheduler, executor, controller):
         threading.Thread.__init__(self)
@@ -28,6 +113,23 @@ class Machine(threading.Thread):
 
         self.currentProgram = None
 
+        # program waiting for its slewAt time
+        self.nextProgram = None
+
+        self.__wakeUpCall = threading.Condition()
+        self.__awake = False
+
+        self.runner = ProgramRunner(self)
+        self.site = Site()
+
+        # dispatch lag (actual - planned slew start, in seconds)
+        self.__statsLock = threading.Lock()
+        self.dispatched = 0
+        self.lastLag = None
+        self.maxLag = None
+        self.totalLag = 0.0
+        self.lagged = 0
+
         self.setDaemon(False)
 
     def state(self, state=None):
@@ -49,6 +151,8 @@ class Machine(threading.Thread):
         # inject instruments on handlers
         self.executor.__start__()
 
+        self.runner.start()
+
         while self.state() != State.SHUTDOWN:
 
             if self.state() == State.OFF:
@@ -56,7 +160,16 @@ class Machine(threading.Thread):
                 self.sleep()
 
             if self.state() == State.START:
+
+                # don't reschedule under a running program, it isn't
+                # finished yet and would come up again
+                if self.runner.busy():
+                    log.debug("[start] waiting current program to finish...")
+                    self.sleep()
+                    continue
+
                 log.debug("[start] database changed, rescheduling...")
+                self.nextProgram = None
                 self.scheduler.reschedule(self)
                 self.state(State.IDLE)
 
@@ -65,12 +178,21 @@ class Machine(threading.Thread):
                 log.debug("[idle] looking for something to do...")
 
                 # find something to do
-                program = self.scheduler.next()
+                program = self.nextProgram or self.scheduler.next()
 
                 if program:
+                    wait = self._timeToSlew(program)
+
+                    if wait > 0:
+                        log.debug("[idle] waiting %.1f s until MJD %f to start slewing" % (wait, program.slewAt))
+                        self.nextProgram = program
+                        self.sleep(wait)
+                        continue
+
                     log.debug("[idle] there is something to do, processing...")
                     log.debug("[idle] program slew start %s",program.slewAt)
                     log.debug("[idle] program exposure start %s",program.exposeAt)
+                    self.nextProgram = None
                     self.state(State.BUSY)
                     self.currentProgram = program
                     self._process(program)
@@ -82,90 +204,98 @@ class Machine(threading.Thread):
                 self.state(State.OFF)
 
             elif self.state() == State.BUSY:
-                log.debug("[busy] waiting tasks to finish..")
-                self.sleep()
+                if self.runner.busy():
+                    log.debug("[busy] waiting tasks to finish..")
+                    self.sleep()
+                elif self.runner.aborted:
+                    self.state(State.OFF)
+                else:
+                    self.state(State.IDLE)
 
             elif self.state() == State.STOP:
                 log.debug("[stop] trying to stop current program")
+                self.nextProgram = None
                 self.executor.stop()
                 self.state(State.OFF)
 
             elif self.state() == State.SHUTDOWN:
                 log.debug("[shutdown] trying to stop current program")
+                self.nextProgram = None
                 self.executor.stop()
                 log.debug("[shutdown] should die soon.")
                 break
 
+        self.runner.stop()
+
         log.debug('[shutdown] thread ending...')
 
-    def sleep(self):
+    def sleep(self, timeout=None):
+        # wakeups while we were awake aren't lost, we just don't sleep
         self.__wakeUpCall.acquire()
-        log.debug("Sleeping")
-        self.__wakeUpCall.wait()
-        self.__wakeUpCall.release()
+        try:
+            if not self.__awake:
+                log.debug("Sleeping")
+                self.__wakeUpCall.wait(timeout)
+            self.__awake = False
+        finally:
+            self.__wakeUpCall.release()
 
     def wakeup(self):
         self.__wakeUpCall.acquire()
-        log.debug("Waking up")
-        self.__wakeUpCall.notifyAll()
-        self.__wakeUpCall.release()
+        try:
+            log.debug("Waking up")
+            self.__awake = True
+            self.__wakeUpCall.notifyAll()
+        finally:
+            self.__wakeUpCall.release()
 
     def restartAllPrograms(self):
         session = Session()
-
-        programs = session.query(Program).all()
-        for program in programs:
-            program.finished = False
-
+        session.query(Program).update({Program.finished: False,
+                                       Program.updatedAt: time.time()},
+                                      synchronize_session=False)
         session.commit()
 
-    def _process(self, program):
-
-        def process ():
-
-            # session to be used by executor and handlers
-            session = Session()
-
-            task = session.merge(program)
+    def getStats(self):
+        """
+        Number of programs dispatched and how late (in seconds) they
+        started compared to their slewAt (programs without one don't
+        count).
+        """
+        self.__statsLock.acquire()
+        try:
+            return {"dispatched": self.dispatched,
+                    "lagged": self.lagged,
+                    "lastLag": self.lastLag,
+                    "maxLag": self.maxLag,
+                    "meanLag": self.totalLag / self.lagged if self.lagged else None}
+        finally:
+            self.__statsLock.release()
 
-            log.debug("[start] %s" % str(task))
+    def _timeToSlew(self, program):
+        if not program.slewAt:
+            return 0
+        return (program.slewAt - self.site.MJD()) * 86.4e3
 
-            site=Site()
-            nowmjd=site.MJD()
-            log.debug("[start] Current MJD is %f",nowmjd)
-            if program.slewAt:
-                waittime=(program.slewAt-nowmjd)*86.4e3
-                if waittime>0.0:
-                    log.debug("[start] Waiting until MJD %f to start slewing",program.slewAt)
-                    log.debug("[start] Will wait for %f seconds",waittime)
-                    time.sleep(waittime)
-                else:
-                    log.debug("[start] Specified slew start MJD %s has already passed; proceeding without waiting",program.slewAt)
-            else:
-               log.debug("[start] No slew time specified, so no waiting")
-            log.debug("[start] Current MJD is %f",site.MJD())
-            log.debug("[start] Proceeding since MJD %f should have passed",program.slewAt)
-            self.controller.programBegin(program)
+    def _process(self, program):
 
-            try:
-                self.executor.execute(task)
-                log.debug("[finish] %s" % str(task))
-                self.scheduler.done(task)
-                self.controller.programComplete(program, SchedulerStatus.OK)
-                self.state(State.IDLE)
-            except ProgramExecutionException, e:
-                self.scheduler.done(task, error=e)
-                self.controller.programComplete(program, SchedulerStatus.ERROR, str(e))
-                self.state(State.IDLE)
-                log.debug("[error] %s (%s)" % (str(task), str(e)))
-            except ProgramExecutionAborted, e:
-                self.scheduler.done(task, error=e)
-                self.controller.programComplete(program, SchedulerStatus.ABORTED, "Aborted by user.")
-                self.state(State.OFF)
-                log.debug("[aborted by user] %s" % str(task))
+        lag = None
+        if program.slewAt:
+            lag = -self._timeToSlew(program)
+            log.info("[start] %s starting %.3f s after its slew time (MJD %f)" % (str(program), lag, program.slewAt))
+        else:
+            log.debug("[start] No slew time specified, so no waiting")
 
-            session.commit()
+        self.__statsLock.acquire()
+        try:
+            self.dispatched += 1
+            if lag is not None:
+                self.lagged += 1
+                self.lastLag = lag
+                if self.maxLag is None or lag > self.maxLag:
+                    self.maxLag = lag
+                self.totalLag += lag
+        finally:
+            self.__statsLock.release()
 
-        t = threading.Thread(target=process)
-        t.setDaemon(False)
-        t.start()
+        self.runner.runProgram(program)
@@ -1,12 +1,37 @@
 from chimera.core.constants import DEFAULT_PROGRAM_DATABASE
 
+from chimera.util.position import Position, Epoch
+
 from sqlalchemy import (Column, String, Integer, DateTime, Boolean, ForeignKey,
-                        Float, PickleType, MetaData, create_engine)
+                        Float, PickleType, MetaData, Index, create_engine, inspect,
+                        event, select, func)
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relation, backref
+from sqlalchemy.orm import sessionmaker, relation, backref, class_mapper, object_mapper
+
+import cPickle
+import math
+import time
 
 engine = create_engine('sqlite:///%s' % DEFAULT_PROGRAM_DATABASE, echo=False)
 print '-- engine created with sqlite:///%s' % DEFAULT_PROGRAM_DATABASE
+
+
+def setPragmas(connection, record):
+    """
+    SQLite settings for the program database (a 'connect' event
+    listener).
+    """
+    # WAL lets the scheduler read while programs are being imported,
+    # and with it NORMAL sync is still safe (and a lot faster)
+    cursor = connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-16000")
+    cursor.close()
+
+event.listen(engine, "connect", setPragmas)
+
 metaData = MetaData()
 metaData.bind = engine
 
@@ -53,9 +78,15 @@ class Program(Base):
     finished  = Column(Boolean, default=False)
     slewAt = Column(Float, default=0.0)
     exposeAt = Column(Float, default=0.0)
+
+    # time.time() of the last change, schedulers use it to pick up
+    # only what changed since they last looked
+    updatedAt = Column(Float, default=time.time, onupdate=time.time, index=True)
     
     actions   = relation("Action", backref=backref("program", order_by="Action.id"),
-                         cascade="all, delete, delete-orphan")
+                         cascade="all, delete, delete-orphan", order_by="Action.id")
+
+    __table_args__ = (Index("ix_program_runnable", "finished", "priority"),)
 
     def __str__ (self):
         return "#%d %s pi:%s #actions: %d" % (self.id, self.name,
@@ -64,12 +95,15 @@ class Program(Base):
 class Action(Base):
 
     id         = Column(Integer, primary_key=True)
-    program_id = Column(Integer, ForeignKey("program.id"))
+    program_id = Column(Integer, ForeignKey("program.id"), index=True)
     action_type = Column('type', String(100))
 
 
     __tablename__ = "action"
-    __mapper_args__ = {'polymorphic_on': action_type}
+    # load every kind of action in the same query (instead of one more
+    # query per action to get its own columns)
+    __mapper_args__ = {'polymorphic_on': action_type,
+                       'with_polymorphic': '*'}
     
 class AutoFocus(Action):
     __tablename__ = "action_focus"
@@ -101,15 +135,74 @@ class PointVerify(Action):
         elif self.here is True:
             return "pointing verification: current field"
 
+# sky buckets for Point.targetBucket, BUCKET_SIZE degrees on a side
+BUCKET_SIZE = 10
+BUCKETS_RA = 360 / BUCKET_SIZE
+
+# Point.targetEpoch values (NOW is 0)
+EPOCHS = {Epoch.J2000: 2000.0, Epoch.B1950: 1950.0, Epoch.NOW: 0.0}
+
+def skyBucket(ra, dec):
+    """
+    Sky bucket of (ra in hours, dec in degrees).
+    """
+    decBand = min(int((dec + 90.) // BUCKET_SIZE), 180 / BUCKET_SIZE - 1)
+    return decBand * BUCKETS_RA + int(((ra * 15.) % 360.) // BUCKET_SIZE)
+
+def skyBuckets(ra, dec, radius):
+    """
+    Buckets which may have points within radius (degrees) of (ra in
+    hours, dec in degrees), to be used as
+    Point.targetBucket.in_(skyBuckets(...)).
+    """
+    first = max(int((dec - radius + 90.) // BUCKET_SIZE), 0)
+    last = min(int((dec + radius + 90.) // BUCKET_SIZE), 180 / BUCKET_SIZE - 1)
+
+    # ra spread grows towards the poles
+    maxDec = min(abs(dec) + radius, 90.)
+    if maxDec >= 89.999:
+        raBins = range(BUCKETS_RA)
+    else:
+        spread = radius / math.cos(math.radians(maxDec))
+        if spread >= 180:
+            raBins = range(BUCKETS_RA)
+        else:
+            lower = int(((ra * 15. - spread) % 360.) // BUCKET_SIZE)
+            n = int(math.ceil(2 * spread / BUCKET_SIZE)) + 1
+            raBins = sorted(set([(lower + i) % BUCKETS_RA for i in range(min(n, BUCKETS_RA))]))
+
+    return [band * BUCKETS_RA + raBin for band in range(first, last + 1) for raBin in raBins]
+
 class Point(Action):
     __tablename__ = "action_point"
     __mapper_args__ = {'polymorphic_identity': 'Point'}
 
     id          = Column(Integer, ForeignKey('action.id'), primary_key=True)
-    targetRaDec = Column(PickleType, default=None)
+    targetRa    = Column(Float, default=None)  # hours
+    targetDec   = Column(Float, default=None)  # degrees
+    targetEpoch = Column(Float, default=None)  # see EPOCHS
+    targetBucket = Column(Integer, default=None, index=True)
     targetAltAz = Column(PickleType, default=None)
     targetName  = Column(String, default=None)
 
+    def _getTargetRaDec (self):
+        if self.targetRa is None:
+            return None
+        epoch = [e for e, value in EPOCHS.items() if value == self.targetEpoch] or [Epoch.J2000]
+        return Position.fromRaDec(self.targetRa, self.targetDec, epoch[0])
+
+    def _setTargetRaDec (self, position):
+        if position is None:
+            self.targetRa = self.targetDec = self.targetEpoch = self.targetBucket = None
+            return
+        self.targetRa = float(position.ra.H)
+        self.targetDec = float(position.dec.D)
+        self.targetEpoch = EPOCHS.get(position.epoch, 2000.0)
+        self.targetBucket = skyBucket(self.targetRa, self.targetDec)
+
+    # stored as plain columns, which can be indexed and queried
+    targetRaDec = property(_getTargetRaDec, _setTargetRaDec)
+
     def __str__ (self):
         if self.targetRaDec is not None:
             return "point: (ra,dec) %s" % self.targetRaDec
@@ -141,7 +234,144 @@ class Expose(Action):
         return "expose: exptime=%d frames=%d type=%s" % (self.exptime, self.frames, self.imageType)
 
 ###
-    
+
+def _columns(mapper, table):
+    # (attribute, column name, default) of the mapper on table
+    columns = []
+    for prop in mapper.column_attrs:
+        for column in prop.columns:
+            if column.table is not table:
+                continue
+            default = None
+            if column.default is not None:
+                if column.default.is_callable:
+                    default = column.default.arg
+                else:
+                    default = (lambda arg: lambda ctx: arg)(column.default.arg)
+            columns.append((prop.key, column.name, default))
+
+    if mapper.polymorphic_on is not None and mapper.polymorphic_on.table is table:
+        identity = mapper.polymorphic_identity
+        columns.append((None, mapper.polymorphic_on.name, lambda ctx: identity))
+
+    return columns
+
+def _row(obj, columns, **values):
+    # new objects only have what was set on them in __dict__
+    state = obj.__dict__
+    row = {}
+    for key, name, default in columns:
+        value = state.get(key) if key else None
+        if value is None and default is not None:
+            value = default(None)
+        row[name] = value
+    row.update(values)
+    return row
+
+def addPrograms(programs, session=None):
+    """
+    Add (new) programs and their actions with one multi-row insert per
+    table, instead of one insert per object as session.add_all
+    does. Meant for big imports. The programs are not added to the
+    session. If no session is given, the programs are committed right
+    away, otherwise the caller commits.
+    """
+    commit = session is None
+    if commit:
+        session = Session()
+
+    connection = session.connection()
+
+    # ids go on from the last ones, so take the write lock before
+    # reading them: SQLite only locks on the first write of a
+    # transaction, and a concurrent import could pick the same ids
+    # (a write that touches nothing is enough, and unlike BEGIN
+    # IMMEDIATE works within the caller's transaction too)
+    connection.execute(Program.__table__.delete().where(Program.__table__.c.id == None))
+
+    programId = connection.execute(select([func.max(Program.__table__.c.id)])).scalar() or 0
+    actionId = connection.execute(select([func.max(Action.__table__.c.id)])).scalar() or 0
+
+    rows = {}
+    columns = {}
+
+    programColumns = _columns(class_mapper(Program), Program.__table__)
+
+    for program in programs:
+        programId += 1
+        rows.setdefault(Program.__table__, []).append(
+            _row(program, programColumns, id=programId))
+
+        for action in program.actions:
+            actionId += 1
+            mapper = object_mapper(action)
+            for table in mapper.tables:
+                if (mapper, table) not in columns:
+                    columns[(mapper, table)] = _columns(mapper, table)
+                rows.setdefault(table, []).append(
+                    _row(action, columns[(mapper, table)], id=actionId, program_id=programId))
+
+    for table in metaData.sorted_tables:
+        if table in rows:
+            connection.execute(table.insert(), rows[table])
+
+    if commit:
+        session.commit()
+
+    return len(programs)
+
+def removePrograms(session=None):
+    """
+    Remove all programs (and their actions).
+    """
+    commit = session is None
+    if commit:
+        session = Session()
+
+    tables = set([Program.__table__, Action.__table__])
+    for mapper in class_mapper(Action).self_and_descendants:
+        tables.update(mapper.tables)
+
+    for table in reversed(metaData.sorted_tables):
+        if table in tables:
+            session.execute(table.delete())
+
+    if commit:
+        session.commit()
+
+def _upgrade(engine):
+    # create_all doesn't touch existing tables, add what older
+    # databases don't have
+    inspector = inspect(engine)
+
+    if "updatedAt" not in [column["name"] for column in inspector.get_columns("program")]:
+        engine.execute("ALTER TABLE program ADD COLUMN updatedAt FLOAT")
+        engine.execute("UPDATE program SET updatedAt = ?", time.time())
+
+    # positions used to be pickled
+    columns = [column["name"] for column in inspector.get_columns("action_point")]
+    if "targetRa" not in columns:
+        for column in ("targetRa FLOAT", "targetDec FLOAT", "targetEpoch FLOAT", "targetBucket INTEGER"):
+            engine.execute("ALTER TABLE action_point ADD COLUMN %s" % column)
+
+        if "targetRaDec" in columns:
+            point = Point()
+            rows = engine.execute("SELECT id, targetRaDec FROM action_point WHERE targetRaDec IS NOT NULL").fetchall()
+            updates = []
+            for id, pickled in rows:
+                point.targetRaDec = cPickle.loads(str(pickled))
+                updates.append((point.targetRa, point.targetDec, point.targetEpoch, point.targetBucket, id))
+            if updates:
+                engine.execute("UPDATE action_point SET targetRa = ?, targetDec = ?, targetEpoch = ?, targetBucket = ? "
+                               "WHERE id = ?", updates)
+
+    for table in (Program.__table__, Action.__table__, Point.__table__):
+        indexes = [index["name"] for index in inspector.get_indexes(table.name)]
+        for index in table.indexes:
+            if index.name not in indexes:
+                index.create(bind=engine)
+
 #metaData.drop_all(engine)
 metaData.create_all(engine)
+_upgrade(engine)
 
@@ -2,9 +2,10 @@
 from chimera.controllers.scheduler.ischeduler import IScheduler
 from chimera.controllers.scheduler.model import Session, Program
 
-from sqlalchemy import desc
+from sqlalchemy.orm import subqueryload
 
 import logging
+import time
 
 log = logging.getLogger(__name__)
 
@@ -13,17 +14,24 @@ from Queue import Queue
 
 class SequentialScheduler (IScheduler):
 
+    # programs changed this close (in seconds) to our last look at the
+    # database are read again, in case they were committed after it
+    snapshotSlack = 5.0
+
     def __init__ (self):
         self.rq = None
         self.machine = None
 
+        # unfinished programs (by id) as of our last look at the database
+        self.programs = {}
+        self.snapshot = None
+
     def reschedule (self, machine):
 
         self.machine = machine
         self.rq = Queue(-1)
 
-        session = Session()
-        programs = session.query(Program).order_by(desc(Program.priority)).filter(Program.finished == False).all()
+        programs = self.runnable()
 
         if not programs:
             return
@@ -35,6 +43,47 @@ class SequentialScheduler (IScheduler):
 
         machine.wakeup()
 
+    def runnable (self):
+        """
+        Unfinished programs, highest priority first. Only programs
+        changed since the last call are read from the database (with
+        their actions, in the same go).
+        """
+        session = Session()
+        now = time.time()
+
+        query = session.query(Program).options(subqueryload(Program.actions))
+
+        if self.snapshot is None:
+            self.programs = {}
+            changed = query.filter(Program.finished == False).all()
+        else:
+            ids = set([id for (id,) in session.query(Program.id).filter(Program.finished == False)])
+
+            # finished or deleted by somebody else
+            for id in self.programs.keys():
+                if id not in ids:
+                    del self.programs[id]
+
+            changed = query.filter(Program.updatedAt >= self.snapshot - self.snapshotSlack).all()
+
+            # added without updatedAt (by hand, for example)
+            missing = list(ids.difference(self.programs.keys()).difference([program.id for program in changed]))
+            for i in range(0, len(missing), 500):
+                changed += query.filter(Program.id.in_(missing[i:i + 500])).all()
+
+        for program in changed:
+            if program.finished:
+                self.programs.pop(program.id, None)
+            else:
+                self.programs[program.id] = program
+
+        self.snapshot = now
+
+        log.debug("%d programs read from the database" % len(changed))
+
+        return sorted(self.programs.values(), key=lambda program: (-(program.priority or 0), program.id))
+
     def next (self):
         if not self.rq.empty():
             return self.rq.get()
@@ -48,6 +97,7 @@ class SequentialScheduler (IScheduler):
             log.exception(error)
         else:
             task.finished = True
+            self.programs.pop(task.id, None)
 
         self.rq.task_done()
         self.machine.wakeup()
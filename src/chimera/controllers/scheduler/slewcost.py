@@ -0,0 +1,280 @@
+
+from chimera.controllers.scheduler.sequential import SequentialScheduler
+from chimera.controllers.scheduler.model import Point
+
+import numpy as np
+
+import logging
+
+log = logging.getLogger(__name__)
+
+from Queue import Queue
+
+
+def slewTimes(ra, dec, lst, lat, telescopeSpeed=2.0, domeSpeed=3.0, settleTime=2.0):
+    """
+    Estimated time (in seconds) to go from each target to every other
+    one, as a (targets x targets) matrix. The telescope moves along the
+    great circle while the dome follows in azimuth, whichever takes
+    longer sets the time. RA and LST in hours, everything else in
+    degrees.
+    """
+    ra = np.radians(np.asarray(ra, dtype=np.float) * 15.)
+    dec = np.radians(np.asarray(dec, dtype=np.float))
+    lat = np.radians(lat)
+
+    cosd = np.sin(dec)[:, np.newaxis] * np.sin(dec)[np.newaxis, :] + \
+        np.cos(dec)[:, np.newaxis] * np.cos(dec)[np.newaxis, :] * \
+        np.cos(ra[:, np.newaxis] - ra[np.newaxis, :])
+    distance = np.degrees(np.arccos(np.clip(cosd, -1., 1.)))
+
+    ha = np.radians(lst * 15.) - ra
+    az = np.degrees(np.arctan2(-np.cos(dec) * np.sin(ha),
+                               np.sin(dec) * np.cos(lat) -
+                               np.cos(dec) * np.sin(lat) * np.cos(ha)))
+    rotation = np.abs(az[:, np.newaxis] - az[np.newaxis, :]) % 360.
+    rotation = np.minimum(rotation, 360. - rotation)
+
+    times = np.maximum(distance / telescopeSpeed, rotation / domeSpeed) + settleTime
+    np.fill_diagonal(times, 0.)
+
+    return times
+
+
+def overhead(times, route, start=None):
+    """
+    Total slew time of a route (start is where the telescope is).
+    """
+    path = ([start] if start is not None else []) + list(route)
+    return sum([times[a, b] for a, b in zip(path[:-1], path[1:])])
+
+
+def greedy(times, nodes, start=None, fixed=()):
+    """
+    Nearest neighbour route through nodes. Nodes in fixed (time
+    windows) are visited in the given order, the others go wherever
+    they are cheaper.
+    """
+    free = [node for node in nodes if node not in fixed]
+    fixed = list(fixed)
+
+    route = []
+    current = start
+
+    while free or fixed:
+        candidates = free + fixed[:1]
+
+        if current is None:
+            node = candidates[0]
+        else:
+            node = candidates[int(np.argmin(times[current, candidates]))]
+
+        if fixed and node == fixed[0]:
+            fixed.pop(0)
+        else:
+            free.remove(node)
+
+        route.append(node)
+        current = node
+
+    return route
+
+
+def twoOpt(times, route, start=None, fixed=(), maxPasses=20):
+    """
+    Improve a route reversing pieces of it while that makes it
+    shorter. Reversals which would swap two fixed nodes are not tried.
+    """
+    n = len(route)
+    if n < 3:
+        return list(route)
+
+    # a node which costs nothing to get to or to leave, used as the
+    # start (if we don't know where the telescope is) and the end
+    free = len(times)
+    T = np.zeros((free + 1, free + 1))
+    T[:free, :free] = times
+
+    path = np.array([start if start is not None else free] + list(route) + [free])
+
+    fixed = set(fixed)
+    isFixed = np.array([node in fixed for node in path], dtype=np.int)
+    nFixed = np.cumsum(isFixed)
+
+    for p in range(maxPasses):
+
+        improved = False
+
+        for i in range(1, n):
+
+            # reverse path[i..j], for every j at once
+            a, b = path[i - 1], path[i]
+            c, d = path[i + 1:n + 1], path[i + 2:n + 2]
+
+            delta = T[a, c] + T[b, d] - T[a, b] - T[c, d]
+            delta[nFixed[i + 1:n + 1] - nFixed[i - 1] > 1] = 0
+
+            j = int(np.argmin(delta))
+            if delta[j] < -1e-6:
+                j += i + 1
+                path[i:j + 1] = path[i:j + 1][::-1].copy()
+                isFixed[i:j + 1] = isFixed[i:j + 1][::-1].copy()
+                nFixed = np.cumsum(isFixed)
+                improved = True
+
+        if not improved:
+            break
+
+    return [int(node) for node in path[1:-1]]
+
+
+def plan(times, priorities, windows=None, start=None, lookahead=True):
+    """
+    Order targets to minimize slew overhead. Higher priorities always
+    go first, targets with a time window (window > 0) keep their
+    chronological order. Returns the indexes in observing order.
+    """
+    priorities = np.asarray(priorities)
+    if windows is None:
+        windows = np.zeros(len(priorities))
+    windows = np.asarray(windows)
+
+    order = []
+    current = start
+
+    for priority in sorted(set(priorities.tolist()), reverse=True):
+        nodes = [int(node) for node in np.flatnonzero(priorities == priority)]
+        fixed = sorted([node for node in nodes if windows[node] > 0],
+                       key=lambda node: windows[node])
+
+        route = greedy(times, nodes, current, fixed)
+        if lookahead:
+            route = twoOpt(times, route, current, fixed)
+
+        order += route
+        current = route[-1]
+
+    return order
+
+
+class SlewCostScheduler (SequentialScheduler):
+
+    """
+    Runs programs in the order which costs less time slewing the
+    telescope and the dome, without breaking priorities (higher
+    priorities still go first) and the order of programs with a slewAt
+    time.
+
+    Programs without an (ra, dec) to point to go first in their
+    priority group, as they would in the sequential scheduler.
+    """
+
+    def __init__ (self):
+        SequentialScheduler.__init__(self)
+
+        # used when we can't ask the instruments
+        self.telescopeSpeed = 2.0
+        self.domeSpeed = 3.0
+        self.settleTime = 2.0
+        self.latitude = -23.0
+        self.lst = 0.0
+
+        self.start = None
+        self.lookahead = True
+
+        self.overhead = 0.0
+
+    def reschedule (self, machine):
+
+        self.machine = machine
+        self.rq = Queue(-1)
+
+        programs = self.runnable()
+
+        if not programs:
+            return
+
+        log.debug("rescheduling, found %d runnable programs" % len(list(programs)))
+
+        self._updateModel(machine)
+
+        for program in self.order(programs):
+            self.rq.put(program)
+
+        machine.wakeup()
+
+    def order (self, programs):
+
+        positions = [self._position(program) for program in programs]
+
+        unknown = [program for program, position in zip(programs, positions) if position is None]
+        known = [(program, position) for program, position in zip(programs, positions) if position is not None]
+
+        if not known:
+            return programs
+
+        ra = [position[0] for program, position in known]
+        dec = [position[1] for program, position in known]
+
+        start = None
+        if self.start is not None:
+            ra.append(self.start[0])
+            dec.append(self.start[1])
+            start = len(known)
+
+        times = slewTimes(ra, dec, self.lst, self.latitude,
+                          self.telescopeSpeed, self.domeSpeed, self.settleTime)
+
+        route = plan(times,
+                     [program.priority for program, position in known],
+                     [program.slewAt or 0 for program, position in known],
+                     start, self.lookahead)
+
+        self.overhead = overhead(times, route, start)
+        log.debug("estimated slew overhead: %.1f s" % self.overhead)
+
+        ordered = []
+        for priority in sorted(set([program.priority for program in programs]), reverse=True):
+            ordered += [program for program in unknown if program.priority == priority]
+            ordered += [known[i][0] for i in route if known[i][0].priority == priority]
+
+        return ordered
+
+    def _position (self, program):
+        # (ra in hours, dec in degrees) of the first pointing
+        for action in program.actions:
+            if isinstance(action, Point):
+                if action.targetRa is None:
+                    return None
+                return (action.targetRa, action.targetDec)
+        return None
+
+    def _updateModel (self, machine):
+
+        controller = getattr(machine, "controller", None)
+        if controller is None:
+            return
+
+        try:
+            site = controller.getManager().getProxy(controller["site"])
+            self.latitude = float(site["latitude"].D)
+            self.lst = site.LST_inRads() * 12. / np.pi
+        except Exception, e:
+            log.warning("Unable to get site information (%s), using previous values." % e)
+
+        try:
+            telescope = controller.getManager().getProxy(controller["telescope"])
+            self.telescopeSpeed = telescope["slew_speed"]
+            self.settleTime = telescope["stabilization_time"]
+
+            position = telescope.getTelemetry().raDec
+            self.start = (float(position.ra.H), float(position.dec.D))
+        except Exception, e:
+            log.warning("Unable to get telescope information (%s), using previous values." % e)
+            self.start = None
+
+        try:
+            dome = controller.getManager().getProxy(controller["dome"])
+            self.domeSpeed = dome["slew_speed"]
+        except Exception, e:
+            log.warning("Unable to get dome information (%s), using previous values." % e)
@@ -4,6 +4,7 @@ import os
 import ConfigParser
 
 import numpy as np
+import ephem
 
 from chimera.core.chimeraobject import ChimeraObject
 from chimera.core.cli import ChimeraCLI, action
@@ -28,6 +29,69 @@ except ImportError:
 
 cfgpath = os.path.dirname(__file__)
 
+####################################################################################################################################
+#
+# Vectorized versions of the skycalc functions used to plan the night. They work on whole arrays of targets and times at once.
+# RA and LST are in hours, everything else in degrees.
+#
+
+def altitudes(ra, dec, lst, lat):
+	'''
+	Altitude of every target at every local sidereal time, as a (targets x times) matrix. Same as _skysub.altit for each pair.
+	'''
+	ha  = np.radians((np.asarray(lst, dtype=np.float)[np.newaxis,:] - np.asarray(ra, dtype=np.float)[:,np.newaxis])*15.)
+	dec = np.radians(np.asarray(dec, dtype=np.float))[:,np.newaxis]
+	lat = np.radians(lat)
+
+	return np.degrees(np.arcsin(np.sin(dec)*np.sin(lat) + np.cos(dec)*np.cos(lat)*np.cos(ha)))
+
+def airmasses(alt):
+	'''
+	Same as _skysub.true_airmass(_skysub.secant_z(alt)) for an array of altitudes. Below the horizon gives 99.
+	'''
+	alt = np.asarray(alt, dtype=np.float)
+
+	sinalt = np.sin(np.radians(alt))
+	secz = np.clip(1./np.where(sinalt == 0, 0.01, sinalt), -100., 100.)
+
+	x = secz - 1.
+	am = secz - ((1.351167e-3*x + 3.033104e-3)*x + 2.879465e-3)*x
+	am[am < 0] = 99.
+
+	return am
+
+def angularDistances(ra1, dec1, ra2, dec2):
+	'''
+	Angular distance between positions (arrays are broadcasted against each other).
+	'''
+	ra1, ra2 = np.radians(np.asarray(ra1)*15.), np.radians(np.asarray(ra2)*15.)
+	dec1, dec2 = np.radians(dec1), np.radians(dec2)
+
+	cosd = np.sin(dec1)*np.sin(dec2) + np.cos(dec1)*np.cos(dec2)*np.cos(ra1 - ra2)
+
+	return np.degrees(np.arccos(np.clip(cosd, -1., 1.)))
+
+def moonPositions(jds):
+	'''
+	Geocentric RA, Dec of the Moon at each julian date.
+	'''
+	moon = ephem.Moon()
+	ra, dec = np.zeros(len(jds)), np.zeros(len(jds))
+
+	for i,jd in enumerate(jds):
+		# ephem dates count from 1899/12/31 12:00 (JD 2415020)
+		moon.compute(ephem.Date(jd - 2415020.))
+		ra[i], dec[i] = np.degrees(moon.a_ra)/15., np.degrees(moon.a_dec)
+
+	return ra, dec
+
+def targetScores(alt, moon, moonMinDist):
+	'''
+	Altitudes to pick targets by, -inf (never picked) where a target is below the horizon or closer than moonMinDist
+	degrees to the Moon.
+	'''
+	return np.where((np.asarray(alt) <= 0.) | (np.asarray(moon) < moonMinDist), -np.inf, alt)
+
 ####################################################################################################################################
 
 class TAO (ChimeraObject):
@@ -94,6 +158,16 @@ class TAO (ChimeraObject):
 
 		self.stdMaxAirmass = float(config.get('TargetsInfo','stdMaxAirmass'))
 
+		# Targets closer than moonMinDist (degrees) to the Moon are not selected. When picking science targets, slewWeight
+		# (degrees of altitude per degree of slew) favours targets close to the previous one.
+		self.moonMinDist = 30.
+		if config.has_option('TargetsInfo','moonMinDist'):
+			self.moonMinDist = float(config.get('TargetsInfo','moonMinDist'))
+
+		self.slewWeight = 0.1
+		if config.has_option('TargetsInfo','slewWeight'):
+			self.slewWeight = float(config.get('TargetsInfo','slewWeight'))
+
 		#
 		# These are time bins, which breaks the night in timely intervals. Bins is the time at the begining of the bin
 		# and Mask is percent full. 
@@ -157,41 +231,54 @@ class TAO (ChimeraObject):
 		'''
 		
 		session = Session()
-		
-		# [To be done] Reject objects that are close to the moon
+
+		# Select objects from database that where not observed and where not scheduled yet, all at once. Every bin is
+		# then filled from the (targets x bins) altitude matrix.
+		# In the future may include targets that where observed a number of nights ago.
+		targets = session.query(Targets).filter(Targets.observed == False).filter(Targets.scheduled == False).filter(Targets.type == self.sciFlag).all()
+
+		if not targets:
+			log.warning('No science targets available.')
+			return 0
+
+		ra, dec, alt, moon = self.visibility(targets)
+
+		# Highest target wins, as long as it is up and not too close to the moon. Targets close to the previous pointing take
+		# less time to point, so the distance to it is subtracted from the altitude (weighted by slewWeight).
+		score = targetScores(alt, moon, self.moonMinDist)
+		available = np.ones(len(targets), dtype=np.bool)
+		previous = None
 
 		for tbin,time in enumerate(self.obsTimeBins):
 
 			if self.obsTimeMask[tbin] < 1.0:
-				# Select objects from database that where not observed and where not scheduled yet
-				# In the future may include targets that where observed a number of nights ago.
-				# This is still incomplete. We should also consider the distance from the previous pointing to the next!
-				# Since a target can have a higher airmass but be farther away from a neaby target that will take less time
-				# to point.
-				# one way of selecting targets that are close together and have good airmass is to select regions that are close
-				# to the current location. it can start as searching an area with r1 ~ 10 x the FoV and, if there are no regions
-				# to to x2 that and then x4 that. If still there are no targets, than search for the higher in the sky.
-				targets = session.query(Targets).filter(Targets.observed == False).filter(Targets.scheduled == False).filter(Targets.type == self.sciFlag)
-			
-				lst = _skysub.lst(time,self.sitelong) #*360./24.
-				alt = np.array([_skysub.altit(target.targetDec,lst - target.targetRa,self.sitelat)[0] for target in targets])
-				stg = alt.argmax()
+
+				binScore = np.where(available, score[:,tbin], -np.inf)
+
+				if previous is not None and self.slewWeight:
+					binScore = binScore - self.slewWeight*angularDistances(ra[previous], dec[previous], ra, dec)
+
+				stg = binScore.argmax()
+
+				if not np.isfinite(binScore[stg]):
+					log.warning('No target available for bin %3i @mjd=%.3f.'%(tbin,time-2400000.5))
+					continue
 
 				log.info('Selecting %s'%(targets[stg]))
 				
 				# Marking target as schedule
-				tst = session.query(Targets).filter(Targets.id == targets[stg].id)
+				targets[stg].scheduled = True
+				self.addObservation(targets[stg],time,session)
+
+				available[stg] = False
+				previous = stg
 
-				for t in tst:
-					t.scheduled = True
-					session.commit()
-					self.addObservation(t,time)
-				
 				self.obsTimeMask[tbin] = 1.0
 			else:
 				log.debug('Bin %3i @mjd=%.3f already filled up with observations. Skipping...'%(tbin,time-2400000.5))
-				
-		#print i
+
+		session.commit()
+
 		return 0 #targets
 
 	####################################################################################################################################
@@ -208,12 +295,13 @@ class TAO (ChimeraObject):
 		
 		# First of all, standard stars can be obsered multiple times in sucessive nights. I will mark all
 		# stars an unscheduled.
-		targets = session.query(Targets).filter(Targets.scheduled == True).filter(Targets.type == self.stdFlag)
+		targets = session.query(Targets).filter(Targets.type == self.stdFlag).all()
 		for target in targets:
 			target.scheduled = False
-			session.commit()
-		
-		# [To be done] Reject objects that are close to the moon
+
+		if not targets:
+			log.warning('No standard stars available.')
+			return 0
 
 		# Selecting standard stars is not only searching for the higher in that time but select stars than can be observed at 3
 		# or more (nairmass) different airmasses. It is also important to select stars with different colors (but this will be
@@ -223,56 +311,43 @@ class TAO (ChimeraObject):
 			log.warning('Requesting more stars/observations than it will be possible to schedule. Decreasing number of requests to fit in the night.')
 			nstars = len(self.obsTimeBins)/nairmass
 
-		obsStandars = np.zeros(len(self.obsTimeBins))-1 # first selection of observable standards
+		ra, dec, alt, moon = self.visibility(targets)
+		airmass = airmasses(alt)
+
+		score = targetScores(alt, moon, self.moonMinDist)
+		available = np.ones(len(targets), dtype=np.bool)
+
+		obsStandars = np.zeros(len(self.obsTimeBins),dtype=np.int)-1 # first selection of observable standards (index in targets)
 
 		for tbin,time in enumerate(self.obsTimeBins):
 
 			if self.obsTimeMask[tbin] < 1.0:
-				# 1 - Select objects from database that where not scheduled yet (standard stars may be repited)
-				#     that fits our observing night
-				targets = session.query(Targets).filter(Targets.scheduled == 0).filter(Targets.type == self.stdFlag)
-			
-				lst = _skysub.lst(time,self.sitelong) #*360./24.
-				alt = np.array([_skysub.altit(target.targetDec,lst - target.targetRa,self.sitelat)[0] for target in targets])
-				stg = alt.argmax()
+				# 1 - Select the highest star not selected yet that fits our observing night
+				binScore = np.where(available, score[:,tbin], -np.inf)
+				stg = binScore.argmax()
+
+				if not np.isfinite(binScore[stg]):
+					continue
 
 				log.info('Selecting %s'%(targets[stg]))
-				
-				# Marking target as schedule
-				tst = session.query(Targets).filter(Targets.id == targets[stg].id)
 
-				for t in tst:
-					t.scheduled = True
-					session.commit()
-					obsStandars[tbin] = t.id
+				available[stg] = False
+				obsStandars[tbin] = stg
 				
 			else:
 				log.info('Bin already filled up with observations. Skipping...')
 
 		if len(obsStandars[obsStandars >= 0]) < nstars:
 			log.warning('Could not find %i suitable standard stars in catalog. Only %i where found.'%(nstars,len(obsStandars[obsStandars >= 0])))
+
 		#
-		# Unmarking potential targets as scheduled
-		#
-		for id in obsStandars[obsStandars >= 0]:
-			target = session.query(Targets).filter(Targets.id == id)
-			for t in target:
-				t.scheduled = False
-				session.commit()
-				
-			tbin+=1
-		#
-		# Preparing a grid of altitudes for each target for each observing window
+		# Grid of airmasses for each selected target (one per time bin) for each observing window
 		#
 		amGrid = np.zeros(len(obsStandars)*len(obsStandars)).reshape(len(obsStandars),len(obsStandars))
 
-		for i in np.arange(len(obsStandars))[obsStandars >= 0]:
-			target = session.query(Targets).filter(Targets.id == obsStandars[i])[0]
-			for j in range(len(obsStandars)):
-				lst = _skysub.lst(self.obsTimeBins[j],self.sitelong)
-				amGrid[i][j] = _skysub.true_airmass(_skysub.secant_z(_skysub.altit(target.targetDec,lst - target.targetRa,self.sitelat)[0]))
-				if amGrid[i][j] < 0:
-					amGrid [i][j] = 99.
+		selected = obsStandars >= 0
+		amGrid[selected] = airmass[obsStandars[selected]]
+
 		#
 		# Build a grid mask that specifies the position in time each target should be observed. This means that, when
 		# selecting a single target we ocuppy more than one, non consecutive, position in the night. This grid shows where are these
@@ -315,7 +390,7 @@ class TAO (ChimeraObject):
 		# Finally, requesting observations
 
 		for id in reqId[reqId >= 0]:
-			target = session.query(Targets).filter(Targets.id == obsStandars[id])[0]
+			target = targets[obsStandars[id]]
 			secz = amGrid[id][obsMask[id]]
 			seczreq = np.zeros(nairmass,dtype=np.bool)
 			amObs = np.linspace(amGrid[id].min(),self.stdMaxAirmass,nairmass) # requested aimasses
@@ -325,17 +400,37 @@ class TAO (ChimeraObject):
 					log.info('Requesting observations of %s @airmass=%4.2f @mjd=%.3f...'%(target.name,secz[i],obstime-2400000.5))
 					seczreq[sindex] = True
 					target.scheduled = True
-					session.commit()
-					self.addObservation(target,obstime)
+					self.addObservation(target,obstime,session)
 					self.obsTimeMask[obsMask[id]] = 1.0
 			#print self.obsTimeBins[obsMask[id]]
 			#print
 
+		session.commit()
+
 		#print i
 		return 0 #targets
 
 	####################################################################################################################################
 
+	def visibility(self, targets):
+		'''
+		Altitude and distance to the Moon (in degrees) of each target at each time bin, as (targets x bins) matrices, computed
+		in a single pass. Returns (ra, dec, alt, moon).
+		'''
+
+		ra  = np.array([target.targetRa for target in targets], dtype=np.float)
+		dec = np.array([target.targetDec for target in targets], dtype=np.float)
+
+		lst = np.array([_skysub.lst(time,self.sitelong) for time in self.obsTimeBins])
+		alt = altitudes(ra, dec, lst, self.sitelat)
+
+		moonRa, moonDec = moonPositions(self.obsTimeBins)
+		moon = angularDistances(ra[:,np.newaxis], dec[:,np.newaxis], moonRa[np.newaxis,:], moonDec[np.newaxis,:])
+
+		return ra, dec, alt, moon
+
+	####################################################################################################################################
+
 	def targets(self):
 		'''
 		After selecting targets, you can generate a list of potential targets to run the scheduler.
@@ -433,9 +528,15 @@ class TAO (ChimeraObject):
 
 	####################################################################################################################################
 
-	def addObservation(self,target,obstime):
-	
-		session = Session()
+	def addObservation(self,target,obstime,session=None):
+		'''
+		Add a program to observe target at obstime. If a session is given, the program is only added to it (the caller
+		commits), otherwise it is committed right away.
+		'''
+
+		commit = session is None
+		if commit:
+			session = Session()
 		
 		lineRe = re.compile('(?P<coord>(?P<ra>[\d:-]+)\s+(?P<dec>\+?[\d:-]+)\s+(?P<epoch>[\dnowNOWJjBb\.]+)\s+)?(?P<imagetype>[\w]+)'
                             '\s+(?P<objname>\'([^\\n\'\\\\]|\\\\.)*\'|"([^\\n"\\\\]|\\\\.)*"|([^ \\n"\\\\]|\\\\.)*)\s+(?P<exposures>[\w\d\s:\*\(\),]*)')
@@ -544,5 +645,7 @@ class TAO (ChimeraObject):
 			programs.append(program)
 
 		session.add_all(programs)
-		session.commit()
+
+		if commit:
+			session.commit()
 
@@ -131,7 +131,7 @@ class Stellarium(ChimeraObject):
 
     def control(self):
         self.server.sendPosition(
-            self.telescope.getPositionRaDec(), error=self.error)
+            self.telescope.getTelemetry().raDec, error=self.error)
         self.error = False
         return True
 
@@ -0,0 +1,116 @@
+
+import bz2
+import os
+import shutil
+import tempfile
+import threading
+
+import numpy as N
+
+from astropy.io import fits
+
+from chimera.controllers.imageserver.compressionpool import CompressionPool
+from chimera.controllers.imageserver.imageserver import ImageServer
+from chimera.util.image import Image
+
+
+class TestCompressionPool (object):
+
+    def setup (self):
+        self.dir = tempfile.mkdtemp()
+        self.done = []
+
+    def teardown (self):
+        shutil.rmtree(self.dir)
+
+    def path (self, name):
+        return os.path.join(self.dir, name)
+
+    def test_backpressure (self):
+
+        pool = CompressionPool(workers=1, queueSize=1,
+                               done=lambda *result: self.done.append(result))
+
+        # the worker blocks reading the fifo until we write to it
+        fifo = self.path("slow.fits")
+        os.mkfifo(fifo)
+
+        quick = self.path("quick.fits")
+        open(quick, "wb").write("quick" * 1000)
+
+        try:
+            assert pool.submit("slow", fifo)
+
+            second = threading.Thread(target=pool.submit, args=("quick", quick))
+            second.setDaemon(True)
+            second.start()
+            second.join(0.3)
+
+            # no room for the second job until the first is done
+            assert second.isAlive()
+            assert pool.getStats() == {"pending": 1, "completed": 0, "failed": 0}
+
+            writer = open(fifo, "wb")
+            writer.write("slow" * 1000)
+            writer.close()
+
+            second.join(5)
+            assert not second.isAlive()
+        finally:
+            pool.close()
+
+        assert pool.getStats() == {"pending": 0, "completed": 2, "failed": 0}
+        assert sorted(self.done) == [("quick", quick + ".bz2", None),
+                                     ("slow", fifo + ".bz2", None)]
+
+        assert bz2.BZ2File(fifo + ".bz2").read() == "slow" * 1000
+        assert not os.path.exists(fifo) and not os.path.exists(quick)
+
+    def test_errors (self):
+
+        pool = CompressionPool(workers=1, queueSize=1,
+                               done=lambda *result: self.done.append(result))
+        try:
+            pool.submit("nothing", self.path("nothing.fits"))
+            # a slot still comes back after a failure
+            pool.submit("bad", self.path("bad.fits"), "lzma")
+        finally:
+            pool.close()
+
+        assert pool.getStats() == {"pending": 0, "completed": 0, "failed": 2}
+        assert [key for key, compressed, error in self.done] == ["nothing", "bad"]
+        assert [compressed for key, compressed, error in self.done] == [None, None]
+        assert self.done[1][2].startswith("ValueError")
+
+    def test_imageserver (self):
+
+        server = ImageServer()
+        server.compressor = CompressionPool(1, 1, server._compressed)
+
+        images = {}
+        data = N.random.normal(1000, 10, (64, 64))
+
+        for format in ("bz2", "rice"):
+            image = Image.create(data, filename=self.path("%s.fits" % format))
+            image.close()
+            server.imagesByID[image.GUID()] = image
+            server.imagesByPath[image.filename()] = image
+            images[format] = image
+
+        try:
+            for format, image in images.items():
+                assert server.compress(image.GUID(), format)
+            assert not server.compress("no such image")
+        finally:
+            server.compressor.close()
+
+        for format, ext in (("bz2", ".bz2"), ("rice", ".fz")):
+            image = images[format]
+            compressed = image.filename() + ext
+
+            assert image.compressedFilename() == compressed
+            assert server.getImageByPath(compressed) is image
+            assert server.getImageByPath(image.filename()) is image
+            assert os.path.exists(compressed) and not os.path.exists(image.filename())
+
+        assert fits.getdata(images["rice"].compressedFilename(), 1).shape == (64, 64)
@@ -0,0 +1,184 @@
+
+from chimera.controllers.scheduler.executor import ProgramExecutor
+from chimera.controllers.scheduler.handlers import PointHandler, ExposeHandler
+from chimera.controllers.scheduler.model import Program, Point, Expose
+from chimera.controllers.scheduler.status import SchedulerStatus
+
+from chimera.core.exceptions import ProgramExecutionAborted, ProgramExecutionException
+from chimera.interfaces.dome import Mode
+
+from chimera.util.position import Position
+
+from nose.tools import assert_raises
+
+import threading
+import time
+
+
+class FakeInstrument (object):
+
+    # shared by the copies each branch makes
+    calls = []
+    abort = threading.Event()
+
+    def move (self, name, seconds):
+        FakeInstrument.calls.append((time.time(), name))
+        FakeInstrument.abort.wait(seconds)
+
+
+class FakeTelescope (FakeInstrument):
+
+    def slewToRaDec (self, position):
+        self.move("slew", 0.5)
+
+    def abortSlew (self):
+        FakeInstrument.abort.set()
+
+
+class FakeDome (FakeInstrument):
+
+    def openSlit (self):
+        self.move("slit", 0.3)
+
+    def getMode (self):
+        return Mode.Stand
+
+    def abortSlew (self):
+        pass
+
+
+class FakeFilterWheel (FakeInstrument):
+
+    def setFilter (self, filter):
+        if filter == "X":
+            raise ValueError("no such filter")
+        self.move("filter %s" % filter, 0.4)
+
+
+class FakeCamera (FakeInstrument):
+
+    def expose (self, request):
+        self.move("expose", 0.1)
+
+    def abortExposure (self):
+        FakeInstrument.abort.set()
+
+
+class FakeController (object):
+
+    def __init__ (self):
+        self.events = []
+
+    def actionBegin (self, action, message):
+        self.events.append(("begin", str(action)))
+
+    def actionComplete (self, action, status, message=None):
+        self.events.append(("complete", str(action), status))
+
+
+class TestExecutor (object):
+
+    def setup (self):
+        PointHandler.telescope = FakeTelescope()
+        PointHandler.dome = FakeDome()
+        PointHandler.site = None
+        ExposeHandler.filterwheel = FakeFilterWheel()
+        ExposeHandler.camera = FakeCamera()
+
+        FakeInstrument.calls[:] = []
+        FakeInstrument.abort.clear()
+
+    def teardown (self):
+        for handler, instrument in [(PointHandler, "telescope"), (PointHandler, "dome"),
+                                    (PointHandler, "site"), (ExposeHandler, "filterwheel"),
+                                    (ExposeHandler, "camera")]:
+            delattr(handler, instrument)
+
+    def program (self, filters="VR"):
+        program = Program(name="test")
+        program.actions.append(Point(targetRaDec=Position.fromRaDec("10:00:00", "-30:00:00")))
+        for filter in filters:
+            program.actions.append(Expose(filter=filter, exptime=1, frames=1, shutter="OPEN"))
+        return program
+
+    def run (self, parallel):
+        executor = ProgramExecutor(FakeController())
+        executor.parallel = parallel
+
+        t0 = time.time()
+        executor.execute(self.program())
+        return executor, time.time() - t0
+
+    def test_parallel (self):
+
+        serial, serialTime = self.run(parallel=False)
+        serialCalls = [name for t, name in FakeInstrument.calls]
+
+        FakeInstrument.calls[:] = []
+        parallel, parallelTime = self.run(parallel=True)
+        parallelCalls = [name for t, name in FakeInstrument.calls]
+
+        print
+        print "one after another: %.2f s, in parallel: %.2f s" % (serialTime, parallelTime)
+
+        assert serialCalls == ["slew", "slit", "filter V", "expose", "filter R", "expose"]
+
+        # same things done, in the same order on each instrument
+        assert sorted(parallelCalls) == sorted(serialCalls)
+        assert [c for c in parallelCalls if c.startswith("filter")] == ["filter V", "filter R"]
+
+        # nothing moves while exposing
+        assert parallelCalls.index("expose") > parallelCalls.index("slew")
+        assert parallelCalls.index("expose") > parallelCalls.index("filter V")
+        assert parallelCalls.index("filter R") > parallelCalls.index("expose")
+
+        # slew, slit and the first filter together: all started before
+        # the quickest of them (the 0.3 s slit) was done
+        starts = dict([(name, t) for t, name in FakeInstrument.calls])
+        assert max(starts["slew"], starts["slit"], starts["filter V"]) - \
+            min(starts["slew"], starts["slit"], starts["filter V"]) < 0.3
+
+        # the last setup waited for its (only) move
+        assert parallel.lastSetup.keys() == ["filterwheel"]
+        assert 0.4 <= parallel.lastSetup["filterwheel"] <= parallel.lastSetupTime < 5
+
+        # the slowest move instead of all of them (1.8 s against 1.1 s)
+        assert parallelTime < serialTime
+
+        # events still one action at a time
+        events = parallel.controller.events
+        assert [e[0] for e in events] == ["begin", "complete"] * 3
+        assert [e[2] for e in events if e[0] == "complete"] == [SchedulerStatus.OK] * 3
+
+    def test_abort (self):
+
+        executor = ProgramExecutor(FakeController())
+        errors = []
+
+        def execute():
+            try:
+                executor.execute(self.program())
+            except ProgramExecutionAborted, e:
+                errors.append(e)
+
+        t = threading.Thread(target=execute)
+        t.start()
+
+        time.sleep(0.1)
+        executor.stop()
+        t.join(2)
+
+        assert not t.isAlive()
+        assert len(errors) == 1
+
+        # didn't wait for the slew, nor exposed
+        assert "expose" not in [name for t, name in FakeInstrument.calls]
+        assert executor.controller.events[-1][2] == SchedulerStatus.ABORTED
+
+    def test_branch_error (self):
+
+        executor = ProgramExecutor(FakeController())
+        assert_raises(ProgramExecutionException, executor.execute, self.program("X"))
+
+        # the slew was cancelled too
+        assert FakeInstrument.abort.isSet()
@@ -0,0 +1,161 @@
+
+import pickle
+import threading
+import time
+
+from chimera.controllers.imageserver.imagerequest import ImageRequest
+
+
+class Source (object):
+
+    """
+    Stands in for a Pyro proxy: slow to pickle, and pickles the
+    request it is asked about, as a remote getMetadata would.
+    """
+
+    def __init__ (self, location):
+        self.location = location
+
+    def __getstate__ (self):
+        time.sleep(0.01)
+        return self.__dict__.copy()
+
+    def getMetadata (self, request):
+        pickle.dumps(request)
+        return [("SOURCE", self.location, "")]
+
+
+class Slow (Source):
+
+    """
+    Answers only when let go, with the value it has by then.
+    """
+
+    def __init__ (self, location):
+        Source.__init__(self, location)
+        self.gate = threading.Event()
+        self.value = 0
+
+    def getMetadata (self, request):
+        self.gate.wait(10)
+        return [("SLOW", self.value, "")]
+
+
+class Broken (Source):
+
+    def getMetadata (self, request):
+        raise IOError("no answer")
+
+
+class Manager (object):
+
+    def __init__ (self, sources):
+        self.sources = sources
+
+    def getProxy (self, location):
+        return self.sources[location]
+
+
+class TestImageRequest (object):
+
+    def test_concurrent_metadata (self):
+
+        locations = ["/Source/s%d" % i for i in range(20)]
+        manager = Manager(dict([(location, Source(location)) for location in locations]))
+
+        request = ImageRequest()
+        # the same source twice is asked (and listed) once
+        request.metadataPost = locations + locations[:1]
+
+        # the second frame has a cache and times to change meanwhile
+        for frame in range(2):
+            request.headers = []
+            request.endExposure(manager)
+
+            assert [value for key, value, comment in request.headers] == locations
+            assert len(request.metadataTimes) == 20
+            assert None not in request.metadataTimes.values()
+
+        # what we send doesn't carry the bookkeeping (or the proxies)
+        sent = pickle.loads(pickle.dumps(request))
+        assert sent._proxies == {} and sent._lastMetadata == {}
+        assert sent.metadataTimes == {}
+        assert sent.headers == request.headers
+
+    def metadata (self, sources, useCachedMetadata=False):
+        request = ImageRequest()
+        request.metadataPost = [source.location for source in sources]
+        request.metadataTimeout = 0.2
+        request.useCachedMetadata = useCachedMetadata
+        manager = Manager(dict([(source.location, source) for source in sources]))
+
+        def frame ():
+            request.headers = []
+            request.endExposure(manager)
+            return request.headers
+
+        return request, frame
+
+    def test_timeout (self):
+
+        slow = Slow("/Source/slow")
+        request, frame = self.metadata([Source("/Source/fast"), slow])
+
+        try:
+            assert frame() == [("SOURCE", "/Source/fast", ""),
+                               ("COMMENT", "/Source/slow metadata timed out, not available", "")]
+            assert request.metadataTimes["/Source/slow"] is None
+            assert request.metadataTimes["/Source/fast"] is not None
+        finally:
+            slow.gate.set()
+
+    def test_error (self):
+
+        request, frame = self.metadata([Broken("/Source/broken")], useCachedMetadata=True)
+
+        # nothing cached yet to fall back on
+        assert frame() == [("COMMENT", "/Source/broken metadata failed, not available", "")]
+        # it did answer, just not with metadata
+        assert request.metadataTimes["/Source/broken"] is not None
+
+    def test_cached (self):
+
+        slow = Slow("/Source/slow")
+        request, frame = self.metadata([slow], useCachedMetadata=True)
+
+        slow.gate.set()
+        assert frame() == [("SLOW", 0, "")]
+
+        # stuck on the next frame: last frame's values, and a note
+        slow.gate.clear()
+        slow.value = 1
+        try:
+            assert frame() == [("SLOW", 0, ""),
+                               ("COMMENT", "/Source/slow metadata timed out, using previous values", "")]
+            assert request.metadataTimes["/Source/slow"] is None
+        finally:
+            slow.gate.set()
+
+    def test_late_answer (self):
+
+        slow = Slow("/Source/slow")
+        request, frame = self.metadata([slow], useCachedMetadata=True)
+
+        try:
+            assert frame() == [("COMMENT", "/Source/slow metadata timed out, not available", "")]
+
+            # answers after the frame is gone...
+            slow.value = 1
+            slow.gate.set()
+            fetcher = request._pending["/Source/slow"]
+            fetcher.join(5)
+            assert not fetcher.isAlive()
+
+            # ...and is what the next frame falls back on
+            slow.gate.clear()
+            slow.value = 2
+            assert frame() == [("SLOW", 1, ""),
+                               ("COMMENT", "/Source/slow metadata timed out, using previous values", "")]
+            assert request._lastMetadata["/Source/slow"] == [("SLOW", 1, "")]
+        finally:
+            slow.gate.set()
@@ -0,0 +1,230 @@
+
+import bz2
+import httplib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+
+from chimera.controllers.imageserver.imageserverhttp import (ThreadingHTTPServer,
+                                                             ImageServerHTTPHandler)
+
+
+class Image (object):
+
+    def __init__ (self, id, filename, compressed=None):
+        self.id = id
+        self._filename = filename
+        self._compressed = compressed or filename
+
+    def GUID (self):
+        return self.id
+
+    def filename (self):
+        return self._filename
+
+    def compressedFilename (self):
+        return self._compressed
+
+
+class Ctrl (object):
+
+    log = logging.getLogger(__name__)
+
+    def __init__ (self):
+        self.imagesByPath = {}
+        self.imagesByID = {}
+
+    def register (self, image):
+        self.imagesByPath[image.filename()] = image
+        self.imagesByID[image.GUID()] = image
+        # as ImageServer does once an image is compressed
+        self.imagesByPath[image.compressedFilename()] = image
+
+    def getImageByID (self, id):
+        return self.imagesByID.get(id)
+
+
+class TestImageServerHTTP (object):
+
+    def setup (self):
+        self.dir = tempfile.mkdtemp()
+
+        self.data = "".join([chr(i % 256) for i in range(1000)])
+        self.path = os.path.join(self.dir, "image.fits")
+        open(self.path, "wb").write(self.data)
+
+        self.ctrl = Ctrl()
+        self.ctrl.register(Image("plain", self.path))
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), ImageServerHTTPHandler)
+        self.server.ctrl = self.ctrl
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       kwargs={"poll_interval": 0.05})
+        self.thread.setDaemon(True)
+        self.thread.start()
+
+    def teardown (self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.dir)
+
+    def get (self, path, headers={}, method="GET"):
+        conn = httplib.HTTPConnection("127.0.0.1", self.server.server_address[1], timeout=5)
+        try:
+            conn.request(method, path, headers=headers)
+            response = conn.getresponse()
+            return response, response.read()
+        finally:
+            conn.close()
+
+    def test_range (self):
+
+        response, body = self.get("/image/plain")
+        assert response.status == 200 and body == self.data
+        assert response.getheader("Accept-Ranges") == "bytes"
+
+        # suffix
+        response, body = self.get("/image/plain", {"Range": "bytes=-100"})
+        assert response.status == 206 and body == self.data[-100:]
+        assert response.getheader("Content-Range") == "bytes 900-999/1000"
+
+        # open-ended
+        response, body = self.get("/image/plain", {"Range": "bytes=990-"})
+        assert response.status == 206 and body == self.data[990:]
+        assert response.getheader("Content-Range") == "bytes 990-999/1000"
+
+        # past the end, clamped
+        response, body = self.get("/image/plain", {"Range": "bytes=10-5000"})
+        assert response.status == 206 and body == self.data[10:]
+
+        # unsatisfiable
+        response, body = self.get("/image/plain", {"Range": "bytes=1000-"})
+        assert response.status == 416 and body == ""
+        assert response.getheader("Content-Range") == "bytes */1000"
+
+        # malformed and multiple ranges are ignored
+        for ranges in ("bytes=a-b", "bytes=-", "lines=1-2", "bytes=0-1,5-6"):
+            response, body = self.get("/image/plain", {"Range": ranges})
+            assert response.status == 200 and body == self.data
+
+        # a stale If-Range gets the whole file
+        response, body = self.get("/image/plain", {"Range": "bytes=0-9",
+                                                   "If-Range": '"stale"'})
+        assert response.status == 200 and body == self.data
+
+    def test_not_modified (self):
+
+        response, body = self.get("/image/plain")
+        etag = response.getheader("ETag")
+        modified = response.getheader("Last-Modified")
+
+        for headers in ({"If-None-Match": etag},
+                        {"If-None-Match": '"other", %s' % etag},
+                        {"If-None-Match": "*"},
+                        {"If-Modified-Since": modified}):
+            response, body = self.get("/image/plain", headers)
+            assert response.status == 304 and body == ""
+            assert response.getheader("ETag") == etag
+
+        # If-None-Match wins over If-Modified-Since
+        response, body = self.get("/image/plain", {"If-None-Match": '"other"',
+                                                   "If-Modified-Since": modified})
+        assert response.status == 200 and body == self.data
+
+        response, body = self.get("/image/plain",
+                                  {"If-Modified-Since": "Thu, 01 Jan 1970 00:00:00 GMT"})
+        assert response.status == 200 and body == self.data
+
+    def test_negotiate (self):
+
+        compressed = self.path + ".bz2"
+        open(compressed, "wb").write(bz2.compress(self.data))
+        self.ctrl.register(Image("both", self.path, compressed))
+
+        response, body = self.get("/image/both", {"Accept-Encoding": "gzip, bzip2;q=0.5"})
+        assert response.status == 200
+        assert response.getheader("Content-Encoding") == "bzip2"
+        assert response.getheader("Content-Type") == "image/fits"
+        assert bz2.decompress(body) == self.data
+
+        # plain file when the client doesn't take it
+        response, body = self.get("/image/both", {"Accept-Encoding": "gzip"})
+        assert response.getheader("Content-Encoding") is None
+        assert body == self.data
+
+        # only the compressed file left
+        os.unlink(self.path)
+        response, body = self.get("/image/both")
+        assert response.status == 200
+        assert response.getheader("Content-Encoding") is None
+        assert response.getheader("Content-Type") == "application/x-bzip2"
+        assert bz2.decompress(body) == self.data
+
+        os.unlink(compressed)
+        response, body = self.get("/image/both")
+        assert response.status == 404
+
+    def test_head (self):
+
+        response, body = self.get("/image/plain", method="HEAD")
+        assert response.status == 200 and body == ""
+        assert response.getheader("Content-Length") == "1000"
+
+        response, body = self.get("/image/plain", {"Range": "bytes=0-9"}, method="HEAD")
+        assert response.status == 206 and body == ""
+        assert response.getheader("Content-Length") == "10"
+
+        response, body = self.get("/image/nothere", method="HEAD")
+        assert response.status == 404 and body == ""
+
+        response, body = self.get("/list", method="HEAD")
+        assert response.status == 200 and body == ""
+        assert int(response.getheader("Content-Length")) > 0
+
+    def test_list (self):
+
+        self.ctrl.imagesByPath = {}
+        self.ctrl.imagesByID = {}
+        for i in range(25):
+            path = "/images/%02d.fits" % i
+            self.ctrl.register(Image("id%02d" % i, path, i % 2 and path + ".bz2" or None))
+
+        def page (query):
+            response, body = self.get("/list?" + query)
+            assert response.status == 200
+            assert response.getheader("Content-Type") == "application/json"
+            return json.loads(body)
+
+        result = page("offset=0&limit=10")
+        assert result["total"] == 25 and result["offset"] == 0 and result["limit"] == 10
+        assert [image["id"] for image in result["images"]] == ["id%02d" % i for i in range(10)]
+        assert result["images"][0]["url"] == "/image/id00"
+
+        # last, partial page and past the end
+        assert [image["id"] for image in page("offset=20&limit=10")["images"]] == \
+            ["id%02d" % i for i in range(20, 25)]
+        assert page("offset=25&limit=10")["images"] == []
+
+        # bad and out of range arguments
+        result = page("offset=x&limit=0")
+        assert result["offset"] == 0 and result["limit"] == 100
+        assert len(result["images"]) == 25
+        # compressed images are listed once
+        assert sorted(set([image["id"] for image in result["images"]])) == \
+            ["id%02d" % i for i in range(25)]
+        assert page("limit=100000")["limit"] == 1000
+
+        # html pages link to their neighbours
+        response, body = self.get("/?offset=0&limit=10")
+        assert "previous" not in body and 'href="/?offset=10&limit=10">next' in body
+
+        response, body = self.get("/?offset=10&limit=10")
+        assert 'href="/?offset=0&limit=10">previous' in body
+        assert 'href="/?offset=20&limit=10">next' in body
+
+        response, body = self.get("/?offset=20&limit=10")
+        assert "previous" in body and "next" not in body
+        assert body.count("<tr>") == 1 + 5
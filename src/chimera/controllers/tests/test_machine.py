@@ -0,0 +1,181 @@
+
+from chimera.controllers.scheduler.machine import Machine
+from chimera.controllers.scheduler.states import State
+from chimera.controllers.scheduler.sequential import SequentialScheduler
+from chimera.controllers.scheduler.status import SchedulerStatus
+
+from chimera.core.site import Site
+
+import logging
+import threading
+import time
+
+
+class FakeProgram (object):
+
+    ids = 0
+
+    def __init__ (self, name, slewAt=0.0):
+        FakeProgram.ids += 1
+        self.id = FakeProgram.ids
+        self.name = name
+        self.slewAt = slewAt
+        self.exposeAt = 0.0
+        self.finished = False
+
+    def __str__ (self):
+        return self.name
+
+
+class FakeScheduler (SequentialScheduler):
+
+    def __init__ (self, programs):
+        SequentialScheduler.__init__(self)
+        self.fakePrograms = programs
+        self.done_ = []
+
+    def runnable (self):
+        programs = [program for program in self.fakePrograms if not program.finished]
+        # as if read from the database
+        self.programs = dict([(program.id, program) for program in programs])
+        return programs
+
+    def done (self, task, error=None):
+        SequentialScheduler.done(self, task, error)
+        self.done_.append(task)
+
+
+class FakeExecutor (object):
+
+    def __init__ (self):
+        self.executed = []
+        self.threads = set()
+
+    def __start__ (self):
+        pass
+
+    def execute (self, program):
+        self.executed.append((time.time(), program))
+        self.threads.add(threading.currentThread().getName())
+
+    def stop (self):
+        pass
+
+
+class FakeController (object):
+
+    def __init__ (self):
+        self.states = []
+        self.completed = []
+
+    def stateChanged (self, new, old):
+        self.states.append(new)
+
+    def programBegin (self, program):
+        pass
+
+    def programComplete (self, program, status, message=None):
+        self.completed.append((str(program), status))
+
+
+class Errors (logging.Handler):
+
+    def __init__ (self):
+        logging.Handler.__init__(self, logging.ERROR)
+        self.records = []
+
+    def emit (self, record):
+        self.records.append(record)
+
+
+class TestMachine (object):
+
+    def setup (self):
+        # Session().merge(FakeProgram) wouldn't work
+        import chimera.controllers.scheduler.machine as machine
+
+        class FakeSession (object):
+            def merge (self, program, load=True): return program
+            def commit (self): pass
+
+        self._session = machine.Session
+        machine.Session = FakeSession
+
+        self.errors = Errors()
+        logging.getLogger("chimera.controllers.scheduler").addHandler(self.errors)
+
+    def teardown (self):
+        import chimera.controllers.scheduler.machine as machine
+        machine.Session = self._session
+
+        logging.getLogger("chimera.controllers.scheduler").removeHandler(self.errors)
+
+    def machine (self, programs):
+        m = Machine(FakeScheduler(programs), FakeExecutor(), FakeController())
+        m.start()
+        while m.state() != State.OFF:
+            time.sleep(0.01)
+        return m
+
+    def wait (self, m, state, timeout=5):
+        t0 = time.time()
+        while m.state() != state and time.time() - t0 < timeout:
+            time.sleep(0.01)
+        return m.state() == state
+
+    def test_timed_wakeup (self):
+
+        now = Site().MJD()
+        programs = [FakeProgram("now"),
+                    FakeProgram("later", now + 1.0 / 86400.),
+                    FakeProgram("again")]
+
+        m = self.machine(programs)
+        t0 = time.time()
+        m.state(State.START)
+
+        assert self.wait(m, State.OFF)
+        m.state(State.SHUTDOWN)
+        m.join()
+
+        executed = [str(program) for t, program in m.executor.executed]
+        assert executed == ["now", "later", "again"]
+
+        # each one finished and reported, without errors
+        assert m.scheduler.done_ == programs
+        assert m.scheduler.programs == {}
+        assert m.controller.completed == [(name, SchedulerStatus.OK) for name in executed]
+        assert self.errors.records == []
+
+        # all of them on the same thread
+        assert len(m.executor.threads) == 1
+
+        stats = m.getStats()
+        print
+        print "lag: %.3f s" % stats["lastLag"]
+        assert stats["dispatched"] == 3
+        assert stats["lagged"] == 1
+        assert 0 <= stats["lastLag"] < 2
+        assert m.executor.executed[1][0] - t0 >= 0.9
+
+    def test_stop_while_waiting (self):
+
+        now = Site().MJD()
+        m = self.machine([FakeProgram("tomorrow", now + 1)])
+
+        m.state(State.START)
+        time.sleep(0.5)
+        assert m.state() == State.IDLE
+
+        # the wait (a day long) is interrupted
+        t0 = time.time()
+        m.state(State.STOP)
+        assert self.wait(m, State.OFF)
+        assert time.time() - t0 < 5
+
+        m.state(State.SHUTDOWN)
+        m.join(1)
+
+        assert not m.isAlive()
+        assert m.executor.executed == []
+        assert m.scheduler.done_ == [] and self.errors.records == []
@@ -0,0 +1,147 @@
+
+from chimera.controllers.scheduler.model import (metaData, Session, Program, Point, Expose,
+                                                 addPrograms, removePrograms, setPragmas,
+                                                 skyBucket, skyBuckets)
+
+from chimera.util.position import Position
+
+from sqlalchemy import create_engine, event
+
+import numpy as np
+
+import tempfile
+import threading
+import shutil
+import os
+import time
+
+
+class TestImport (object):
+
+    N = 5000
+
+    def setup (self):
+        self.dir = tempfile.mkdtemp()
+
+    def teardown (self):
+        from chimera.controllers.scheduler.model import engine
+        Session.configure(bind=engine)
+        shutil.rmtree(self.dir)
+
+    def database (self, name, pragmas=True):
+        engine = create_engine("sqlite:///%s" % os.path.join(self.dir, name))
+        if pragmas:
+            event.listen(engine, "connect", setPragmas)
+        metaData.create_all(engine)
+        Session.configure(bind=engine)
+        return engine
+
+    def programs (self):
+        # what chimera-sched makes of a survey file, one program per line
+        rand = np.random.RandomState(0)
+        programs = []
+        for i in range(self.N):
+            program = Program(name="survey-%05d" % i, priority=i % 3)
+            program.actions.append(Point(targetRaDec=Position.fromRaDec(rand.uniform(0, 24),
+                                                                        rand.uniform(-90, 30))))
+            for filter in "BVR":
+                program.actions.append(Expose(filter=filter, exptime=60, frames=1,
+                                              shutter="OPEN", imageType="OBJECT",
+                                              objectName=program.name))
+            programs.append(program)
+        return programs
+
+    def test_import (self):
+
+        print
+
+        self.database("orm.db", pragmas=False)
+        session = Session()
+        t0 = time.time()
+        session.add_all(self.programs())
+        session.commit()
+        orm = time.time() - t0
+        print "session.add_all: %d programs in %.2f s" % (self.N, orm)
+
+        self.database("bulk.db")
+        programs = self.programs()
+        t0 = time.time()
+        assert addPrograms(programs) == self.N
+        bulk = time.time() - t0
+        print "addPrograms    : %d programs in %.2f s" % (self.N, bulk)
+
+        assert bulk < orm
+
+        # and they read back the same
+        session = Session()
+        assert session.query(Program).count() == self.N
+        assert session.query(Point).count() == self.N
+        assert session.query(Expose).count() == 3 * self.N
+
+        program = session.query(Program).filter(Program.name == "survey-00042").one()
+        original = programs[42]
+        assert [str(action) for action in program.actions] == [str(action) for action in original.actions]
+        assert program.updatedAt is not None and program.finished == False
+        assert program.actions[0].targetBucket == skyBucket(original.actions[0].targetRa,
+                                                            original.actions[0].targetDec)
+
+        # appending keeps going from the last ids
+        addPrograms(self.programs()[:10])
+        assert session.query(Program).count() == self.N + 10
+
+        removePrograms()
+        assert session.query(Program).count() == 0
+        assert session.query(Point).count() == 0
+
+    def test_concurrent (self):
+
+        self.database("concurrent.db")
+
+        programs = self.programs()[:200]
+        errors = []
+
+        def add (programs):
+            try:
+                addPrograms(programs)
+            except Exception, e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=add, args=(programs[i::4],)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # nobody picked ids someone else had
+        assert errors == []
+        session = Session()
+        assert session.query(Program).count() == 200
+        assert session.query(Expose).count() == 3 * 200
+        assert sorted([program.name for program in session.query(Program)]) == \
+            sorted([program.name for program in programs])
+
+    def test_buckets (self):
+
+        self.database("buckets.db")
+
+        rand = np.random.RandomState(1)
+        ra, dec = rand.uniform(0, 24, 2000), rand.uniform(-90, 90, 2000)
+
+        addPrograms([Program(name="%d" % i, actions=[Point(targetRaDec=Position.fromRaDec(r, d))])
+                     for i, (r, d) in enumerate(zip(ra, dec))])
+
+        session = Session()
+
+        for center in [(0.1, 0), (12, -85), (6, 60), (23.9, 10)]:
+            radius = 8
+            near = session.query(Point).filter(Point.targetBucket.in_(skyBuckets(center[0], center[1], radius))).all()
+
+            r1, d1 = np.radians(ra * 15), np.radians(dec)
+            r2, d2 = np.radians(center[0] * 15), np.radians(center[1])
+            distance = np.degrees(np.arccos(np.clip(np.sin(d1) * np.sin(d2) +
+                                                    np.cos(d1) * np.cos(d2) * np.cos(r1 - r2), -1, 1)))
+
+            # every point within the radius is in the buckets
+            found = set([point.program_id for point in near])
+            for i in np.flatnonzero(distance < radius):
+                assert i + 1 in found
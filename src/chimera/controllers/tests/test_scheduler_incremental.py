@@ -0,0 +1,137 @@
+
+from chimera.controllers.scheduler.sequential import SequentialScheduler
+from chimera.controllers.scheduler.circular import CircularScheduler
+from chimera.controllers.scheduler.model import (metaData, Session, Program, Action,
+                                                 Point, Expose)
+
+from sqlalchemy import create_engine, event
+
+import tempfile
+import shutil
+import os
+import time
+
+
+class FakeMachine (object):
+
+    def wakeup (self):
+        pass
+
+
+class TestIncrementalReschedule (object):
+
+    N = 5000
+
+    def setup (self):
+        self.dir = tempfile.mkdtemp()
+        self.engine = create_engine("sqlite:///%s" % os.path.join(self.dir, "scheduler.db"))
+        metaData.create_all(self.engine)
+        Session.configure(bind=self.engine)
+
+        self.queries = 0
+
+        def count(*args):
+            self.queries += 1
+
+        event.listen(self.engine, "before_cursor_execute", count)
+
+        # bulk insert, as a survey import would (some time ago)
+        now = time.time() - 3600
+        self.engine.execute(Program.__table__.insert(),
+                            [{"id": i + 1, "name": "program-%d" % i, "priority": i % 3,
+                              "finished": False, "updatedAt": now} for i in range(self.N)])
+        self.engine.execute(Action.__table__.insert(),
+                            [{"id": i + 1, "program_id": i + 1, "type": "Point"} for i in range(self.N)] +
+                            [{"id": self.N + i + 1, "program_id": i + 1, "type": "Expose"} for i in range(self.N)])
+        self.engine.execute(Point.__table__.insert(),
+                            [{"id": i + 1, "targetRa": i % 24, "targetDec": -30.0,
+                              "targetEpoch": 2000.0} for i in range(self.N)])
+        self.engine.execute(Expose.__table__.insert(),
+                            [{"id": self.N + i + 1, "exptime": 10} for i in range(self.N)])
+
+    def teardown (self):
+        from chimera.controllers.scheduler.model import engine
+        Session.configure(bind=engine)
+        self.engine.dispose()
+        shutil.rmtree(self.dir)
+
+    def drain (self, scheduler):
+        programs = []
+        while not scheduler.rq.empty():
+            programs.append(scheduler.rq.get())
+        return programs
+
+    def test_reschedule (self):
+
+        scheduler = SequentialScheduler()
+
+        t0 = time.time()
+        self.queries = 0
+        scheduler.reschedule(FakeMachine())
+        full, fullQueries = time.time() - t0, self.queries
+
+        programs = self.drain(scheduler)
+        assert len(programs) == self.N
+        assert [p.priority for p in programs] == sorted([p.priority for p in programs], reverse=True)
+
+        # actions came with them, no more queries to go through them
+        self.queries = 0
+        for program in programs:
+            for action in program.actions:
+                str(action)
+        assert self.queries == 0
+
+        # and the machine runs them as they are
+        session = Session()
+        task = session.merge(programs[0], load=False)
+        for action in task.actions:
+            str(action)
+        assert self.queries == 0
+        session.close()
+
+        # somebody changes things
+        session = Session()
+        session.add(Program(name="new", priority=10, actions=[Expose(exptime=1)]))
+        session.query(Program).get(1).priority = 5
+        session.query(Program).get(2).finished = True
+        session.delete(session.query(Program).get(3))
+        session.commit()
+
+        t0 = time.time()
+        self.queries = 0
+        scheduler.reschedule(FakeMachine())
+        incremental, incrementalQueries = time.time() - t0, self.queries
+
+        programs = self.drain(scheduler)
+        ids = [p.id for p in programs]
+
+        assert len(programs) == self.N - 1
+        assert programs[0].name == "new" and programs[1].id == 1
+        assert 2 not in ids and 3 not in ids
+
+        # same as starting over
+        assert ids == [p.id for p in SequentialScheduler().runnable()]
+
+        print
+        print "full reschedule of %d programs: %.3f s (%d queries)" % (self.N, full, fullQueries)
+        print "incremental reschedule        : %.3f s (%d queries)" % (incremental, incrementalQueries)
+
+        assert incremental < full
+
+    def test_circular_restart (self):
+
+        scheduler = CircularScheduler()
+        scheduler.reschedule(FakeMachine())
+
+        session = Session()
+        session.query(Program).update({Program.finished: True}, synchronize_session=False)
+        session.commit()
+
+        scheduler.rq.queue.clear()
+
+        t0 = time.time()
+        assert scheduler.next() is not None
+        print
+        print "circular restart of %d programs: %.3f s" % (self.N, time.time() - t0)
+
+        assert scheduler.rq.qsize() == self.N - 1
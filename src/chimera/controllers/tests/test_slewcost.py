@@ -0,0 +1,92 @@
+
+from chimera.controllers.scheduler.slewcost import (SlewCostScheduler, slewTimes,
+                                                    overhead, plan)
+from chimera.controllers.scheduler.model import Program, Point, Expose
+
+from chimera.util.position import Position
+
+import numpy as np
+import time
+
+
+class TestSlewCost (object):
+
+    def programs (self, n, seed=42):
+
+        rand = np.random.RandomState(seed)
+
+        programs = []
+        for i in range(n):
+            program = Program(name="target-%d" % i, priority=int(rand.randint(0, 3)),
+                              slewAt=0.0)
+            program.actions = [Point(targetRaDec=Position.fromRaDec(rand.uniform(0, 24),
+                                                                    rand.uniform(-80, 20))),
+                               Expose(exptime=10)]
+            programs.append(program)
+
+        # a couple of them with fixed times
+        programs[5].slewAt = 55002.0
+        programs[7].slewAt = 55001.0
+        programs[7].priority = programs[5].priority
+
+        return programs
+
+    def test_plan_constraints (self):
+
+        rand = np.random.RandomState(1)
+        ra, dec = rand.uniform(0, 24, 50), rand.uniform(-80, 20, 50)
+        priorities = rand.randint(0, 3, 50)
+        windows = np.zeros(50)
+        windows[[3, 10, 20]] = [3, 2, 1]
+        priorities[[3, 10, 20]] = 1
+
+        times = slewTimes(ra, dec, 6.0, -23.0)
+
+        assert times.shape == (50, 50)
+        assert np.allclose(times, times.T)
+        assert np.all(np.diag(times) == 0)
+
+        order = plan(times, priorities, windows)
+
+        assert sorted(order) == range(50)
+        assert list(priorities[order]) == sorted(priorities, reverse=True)
+        assert [i for i in order if windows[i]] == [20, 10, 3]
+
+    def test_benchmark (self):
+
+        # fake telescope: 2 deg/s, dome 3 deg/s, 2 s to settle, pointing to the zenith
+        scheduler = SlewCostScheduler()
+        scheduler.lst = 6.0
+        scheduler.latitude = -23.0
+        scheduler.start = (6.0, -23.0)
+
+        programs = self.programs(200)
+
+        # what the sequential scheduler would do (by priority only)
+        sequential = sorted(programs, key=lambda program: -program.priority)
+
+        def cost(ordered):
+            ra = [program.actions[0].targetRaDec.ra.H for program in ordered] + [scheduler.start[0]]
+            dec = [program.actions[0].targetRaDec.dec.D for program in ordered] + [scheduler.start[1]]
+            times = slewTimes(ra, dec, scheduler.lst, scheduler.latitude)
+            return overhead(times, range(len(ordered)), len(ordered))
+
+        t0 = time.time()
+        scheduler.lookahead = False
+        nearest = scheduler.order(programs)
+        t1 = time.time()
+        scheduler.lookahead = True
+        optimized = scheduler.order(programs)
+        t2 = time.time()
+
+        print
+        print "sequential: %7.1f s of slews" % cost(sequential)
+        print "greedy    : %7.1f s of slews (planned in %.3f s)" % (cost(nearest), t1 - t0)
+        print "2-opt     : %7.1f s of slews (planned in %.3f s)" % (cost(optimized), t2 - t1)
+
+        assert abs(cost(optimized) - scheduler.overhead) < 1e-6
+        assert cost(optimized) <= cost(nearest) < cost(sequential)
+
+        assert sorted(optimized) == sorted(programs)
+        assert [p.priority for p in optimized] == [p.priority for p in sequential]
+        assert optimized.index(programs[7]) < optimized.index(programs[5])
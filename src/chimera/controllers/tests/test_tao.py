@@ -0,0 +1,107 @@
+
+from chimera.controllers.scheduler.tao import (altitudes, airmasses, angularDistances,
+                                               moonPositions, targetScores)
+
+from chimera.core.site import Site
+from chimera.util.position import Position
+
+import numpy as np
+import ephem
+
+
+class TestTAO (object):
+
+    def setup (self):
+        self.site = Site()
+        self.dates = [ephem.Date("2015/3/1 %02d:00" % hour) for hour in (0, 3, 6, 9)]
+        self.lst = [self.site.LST_inRads(date) for date in self.dates]
+
+        # RA in hours, Dec in degrees
+        self.ra = np.array([0.5, 5.5, 10.25, 18.0, 23.9])
+        self.dec = np.array([-80.0, -30.2, 0.0, 15.5, 60.0])
+
+    def test_altitudes (self):
+
+        alt = altitudes(self.ra, self.dec, np.degrees(self.lst) / 15., self.site["latitude"].D)
+
+        assert alt.shape == (5, 4)
+
+        for i in range(5):
+            for j in range(4):
+                position = Position.fromRaDec(self.ra[i], self.dec[i])
+                expected = self.site.raDecToAltAz(position, self.lst[j]).alt.D
+                assert abs(alt[i, j] - expected) < 1e-6, (i, j, alt[i, j], expected)
+
+    def test_airmasses (self):
+
+        alt = np.array([90., 60., 30., 10., 0., -10.])
+        am = airmasses(alt)
+
+        assert abs(am[0] - 1.0) < 1e-9
+        # close to the plane parallel secant high up, a bit under it low
+        for i in range(3):
+            assert abs(am[i] - 1. / np.sin(np.radians(alt[i]))) < 0.01
+        assert 5.4 < am[3] < 1. / np.sin(np.radians(10.))
+        assert np.all(np.diff(am[:4]) > 0)
+        # below (and at) the horizon
+        assert np.all(am[4:] == 99.)
+
+        # same shape in, same shape out
+        assert airmasses(alt.reshape(2, 3)).shape == (2, 3)
+
+    def test_angularDistances (self):
+
+        distances = angularDistances(self.ra[:, np.newaxis], self.dec[:, np.newaxis],
+                                     self.ra[np.newaxis, :], self.dec[np.newaxis, :])
+
+        assert distances.shape == (5, 5)
+        assert np.allclose(distances, distances.T)
+        assert np.allclose(np.diag(distances), 0, atol=1e-5)
+
+        for i in range(5):
+            for j in range(5):
+                expected = Position.fromRaDec(self.ra[i], self.dec[i]).angsep(
+                    Position.fromRaDec(self.ra[j], self.dec[j])).D
+                assert abs(distances[i, j] - expected) < 1e-6, (i, j, distances[i, j], expected)
+
+    def test_moonPositions (self):
+
+        jds = np.array([ephem.julian_date(date) for date in self.dates])
+        moonRa, moonDec = moonPositions(jds)
+
+        for j, date in enumerate(self.dates):
+            vectorized = angularDistances(self.ra, self.dec, moonRa[j], moonDec[j])
+            # Site's is topocentric: within the Moon's parallax (< 1 deg)
+            scalar = self.site.moonSeparationArray(self.ra * 15., self.dec, date)
+            assert np.all(np.abs(vectorized - scalar) < 1.1), (vectorized, scalar)
+
+    def test_masks (self):
+
+        date = self.dates[1]
+        lst = np.degrees(self.lst[1]) / 15.
+        lat = self.site["latitude"].D
+
+        moonRa, moonDec = moonPositions(np.array([ephem.julian_date(date)]))
+
+        # the Moon itself, 10 deg from it, the zenith and the nadir
+        ra = np.array([moonRa[0], moonRa[0], lst, (lst + 12) % 24])
+        dec = np.array([moonDec[0], moonDec[0] + 10., lat, -lat])
+
+        alt = altitudes(ra, dec, [lst], lat)
+        moon = angularDistances(ra[:, np.newaxis], dec[:, np.newaxis],
+                                moonRa[np.newaxis, :], moonDec[np.newaxis, :])
+
+        assert moon[2, 0] > 30. and alt[3, 0] < 0.
+
+        score = targetScores(alt, moon, 30.)
+        assert score.shape == (4, 1)
+        assert list(np.isfinite(score[:, 0])) == [False, False, True, False]
+        assert abs(score[2, 0] - 90.) < 1e-6
+
+        # without a moon constraint only the altitude mask is left
+        score = targetScores(alt, moon, 0.)
+        assert list(np.isfinite(score[:, 0])) == list(alt[:, 0] > 0)
+
+        # nothing left to pick
+        score = targetScores(alt[[0, 1, 3]], moon[[0, 1, 3]], 30.)
+        assert not np.isfinite(score.max())
@@ -60,7 +60,7 @@ class XEphem (ChimeraObject):
         tel = self._getTel()
         tel.slewComplete += self.getProxy()._updateSlewPosition
 
-        self._updateSlewPosition(tel.getPositionRaDec())
+        self._updateSlewPosition(tel.getTelemetry().raDec)
 
         # From man(7) fifo: The FIFO must be opened on both ends
         #(reading and writing) before data can be passed.  Normally,
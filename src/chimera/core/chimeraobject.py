@@ -23,14 +23,17 @@ from chimera.core.metaobject import MetaObject
 from chimera.core.remoteobject import RemoteObject
 
 from chimera.core.config import Config
+from chimera.core.proxy import ManagerProxy
 from chimera.core.eventsproxy import EventsProxy
 
 from chimera.core.state import State
 from chimera.core.location import Location
+from chimera.core.lockprofile import profiler, callerName
 
 from chimera.core.constants import EVENTS_ATTRIBUTE_NAME
 from chimera.core.constants import METHODS_ATTRIBUTE_NAME
 from chimera.core.constants import CONFIG_PROXY_NAME
+from chimera.core.constants import EVENTS_PROXY_NAME
 from chimera.core.constants import INSTANCE_MONITOR_ATTRIBUTE_NAME
 from chimera.core.constants import RWLOCK_ATTRIBUTE_NAME
 
@@ -76,6 +79,17 @@ class ChimeraObject (RemoteObject, ILifeCycle):
         self._Hz = 2
         self._loop_abort = threading.Event()
 
+        # set by the Manager when control() runs on its LoopScheduler
+        self._controlLoop = None
+
+        # per-thread manager proxies (see getManager)
+        self._managers = threading.local()
+
+        # whether each (nested) hold of the monitor was profiled, so
+        # it is released the same way even if profiling was toggled
+        # meanwhile. Only the thread holding the monitor touches it.
+        self._monitorHolds = []
+
     # config implementation
     def __getitem__(self, item):
         # any thread can read if none writing at the time
@@ -108,16 +122,34 @@ class ChimeraObject (RemoteObject, ILifeCycle):
 
     # locking
     def __enter__(self):
-        return getattr(self, INSTANCE_MONITOR_ATTRIBUTE_NAME).__enter__()
+        return self.acquire()
 
     def __exit__(self, *args):
-        return getattr(self, INSTANCE_MONITOR_ATTRIBUTE_NAME).__exit__(*args)
+        self.release()
 
     def acquire(self, blocking=True):
-        return getattr(self, INSTANCE_MONITOR_ATTRIBUTE_NAME).acquire(blocking)
+        monitor = getattr(self, INSTANCE_MONITOR_ATTRIBUTE_NAME)
+
+        if profiler.enabled and blocking:
+            # our caller's name as the method holding the monitor
+            profiler.acquire(monitor, str(self.__location__) or self.__class__.__name__,
+                             callerName())
+            profiled = True
+        elif monitor.acquire(blocking):
+            profiled = False
+        else:
+            return False
+
+        self._monitorHolds.append(profiled)
+        return True
 
     def release(self):
-        return getattr(self, INSTANCE_MONITOR_ATTRIBUTE_NAME).release()
+        monitor = getattr(self, INSTANCE_MONITOR_ATTRIBUTE_NAME)
+
+        # an empty list: not held, let the monitor complain
+        if self._monitorHolds and self._monitorHolds.pop():
+            return profiler.release(monitor)
+        return monitor.release()
 
     def wait(self, timeout=None):
         return getattr(self, INSTANCE_MONITOR_ATTRIBUTE_NAME).wait(timeout)
@@ -138,6 +170,14 @@ class ChimeraObject (RemoteObject, ILifeCycle):
     def __get_config__(self):
         return getattr(self, CONFIG_PROXY_NAME).items()
 
+    def __get_event_stats__(self):
+        return getattr(self, EVENTS_PROXY_NAME).getStats()
+
+    def __get_loop_stats__(self):
+        if self._controlLoop:
+            return self._controlLoop.getStats()
+        return {}
+
     # ILifeCycle implementation
     def __start__(self):
         return True
@@ -151,39 +191,44 @@ class ChimeraObject (RemoteObject, ILifeCycle):
     def setHz(self, freq):
         tmpHz = self.getHz()
         self._Hz = freq
+        if self._controlLoop:
+            self._controlLoop.reschedule()
         return tmpHz
 
+    def wakeUp(self):
+        """
+        Run control() now instead of at the next tick (objects with
+        getHz() <= 0 only run when woken).
+        """
+        if self._controlLoop:
+            self._controlLoop.wakeUp()
+
     def __main__(self):
+        # the Manager runs control() on its LoopScheduler unless a
+        # subclass overrides __main__, this is for running it by hand
 
         self._loop_abort.clear()
-        timeslice = 0.5
-
-        runCondition = True
 
-        while runCondition:
+        deadline = time.time()
 
-            runCondition = self.control()
+        while self.control():
 
             if self._loop_abort.isSet():
                 return True
 
-            # FIXME: better idle loop
-            # we can't sleep for the whole time because
-            # if object set a long sleep time and Manager decides to
-            # shutdown, we must be alseep to receive his message and
-            # return.
-            timeToWakeUp = 1.0 / self.getHz()
-            sleeped = 0
-            while sleeped < timeToWakeUp:
-                time.sleep(timeslice)
-                if self._loop_abort.isSet():
-                    return True
-                sleeped += timeslice
+            # in phase, and __abort_loop__ wakes us
+            deadline += 1.0 / self.getHz()
+            self._loop_abort.wait(max(deadline - time.time(), 0))
+
+            if self._loop_abort.isSet():
+                return True
 
         return True
 
     def __abort_loop__(self):
         self._loop_abort.set()
+        if self._controlLoop:
+            self._controlLoop.cancel()
 
     def control(self):
         return False
@@ -209,7 +254,15 @@ class ChimeraObject (RemoteObject, ILifeCycle):
 
     def getManager(self):
         if self.getDaemon():
-            return self.getDaemon().getProxyForObj(self.getDaemon().getManager())
+            # one manager proxy per thread, so its connection and proxy
+            # cache are kept between calls (see ManagerProxy)
+            manager = getattr(self._managers, "manager", None)
+            if manager is None:
+                daemon = self.getDaemon()
+                manager = ManagerProxy(
+                    uri=daemon.getProxyForObj(daemon.getManager()).URI)
+                self._managers.manager = manager
+            return manager
 
     def getProxy(self):
         # just to put everthing together (no need to change the base
@@ -28,6 +28,9 @@ MANAGER_DEFAULT_PORT = 7666
 
 MANAGER_LOCATION = '/Manager/manager'
 
+# seconds before a cached proxy is checked again (see Manager.getProxy)
+PROXY_CACHE_TTL = 30
+
 # annotations
 EVENT_ATTRIBUTE_NAME = '__event__'
 LOCK_ATTRIBUTE_NAME = '__lock__'
@@ -40,6 +43,9 @@ CONFIG_PROXY_NAME = '__config_proxy__'
 INSTANCE_MONITOR_ATTRIBUTE_NAME = '__instance_monitor__'
 RWLOCK_ATTRIBUTE_NAME = '__rwlock__'
 
+# per-instance cache of bound method dispatchers
+DISPATCHERS_ATTRIBUTE_NAME = '__dispatchers__'
+
 # reflection
 CONFIG_ATTRIBUTE_NAME = '__config__'
 EVENTS_ATTRIBUTE_NAME = '__events__'
@@ -65,3 +71,7 @@ SYSTEM_CONFIG_LOG_NAME = os.path.join(SYSTEM_CONFIG_DIRECTORY, 'chimera.log')
 
 DEFAULT_PROGRAM_DATABASE = os.path.join(
     SYSTEM_CONFIG_DIRECTORY, 'scheduler.db')
+
+# converted catalogs (see chimera.util.catalogs.local)
+DEFAULT_CATALOGS_DIRECTORY = os.path.join(
+    SYSTEM_CONFIG_DIRECTORY, 'catalogs')
@@ -0,0 +1,396 @@
+#! /usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+# chimera - observatory automation system
+# Copyright (C) 2006-2007  P. Henrique Silva <henrique@astro.ufsc.br>
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.
+
+from chimera.core.wait import StateWaiter
+
+import heapq
+import logging
+import math
+import threading
+import time
+import Queue
+
+log = logging.getLogger(__name__)
+
+
+__all__ = ['ControlLoop', 'LoopScheduler']
+
+
+DEFAULT_MAX_WORKERS = 8
+
+
+class ControlLoop (object):
+
+    """
+    The control() loop of one object, run by a L{LoopScheduler}.
+
+    control() runs at getHz() times a second, on deadlines kept in
+    phase (a slow run doesn't push the following ones), until it
+    returns False or the loop is cancelled. wakeUp() runs it at once;
+    with getHz() <= 0 that is the only way it runs.
+
+    Looks like the thread it replaces to the Manager: isAlive() and
+    join().
+    """
+
+    def __init__(self, scheduler, instance, name):
+        self.scheduler = scheduler
+        self.instance = instance
+        self.name = name
+
+        # scheduler state, under scheduler's lock
+        self.deadline = None
+        self.token = 0
+        self.running = False
+        self.woken = False
+        self.cancelled = False
+
+        self._done = threading.Event()
+
+        # metrics
+        self.runs = 0
+        self.wakeUps = 0
+        self.overruns = 0
+        self.jitter = 0.0
+        self.maxJitter = 0.0
+        self.duration = 0.0
+        self.maxDuration = 0.0
+        self.lastRun = None
+
+    def __repr__(self):
+        return "<ControlLoop %s>" % self.name
+
+    def period(self):
+        hz = self.instance.getHz()
+        if not hz or hz <= 0:
+            return None
+        return 1.0 / hz
+
+    def isAlive(self):
+        return not self._done.isSet()
+
+    def join(self, timeout=None):
+        self._done.wait(timeout)
+
+    def cancel(self):
+        self.scheduler.cancel(self)
+
+    def wakeUp(self):
+        self.scheduler.wakeUp(self)
+
+    def reschedule(self):
+        self.scheduler.reschedule(self)
+
+    def getStats(self):
+        """
+        Runs, missed deadlines (overruns), how late runs started
+        (jitter) and how long they took (duration), in seconds.
+        """
+        return {"hz": self.instance.getHz(),
+                "runs": self.runs,
+                "wakeUps": self.wakeUps,
+                "overruns": self.overruns,
+                "jitter": self.jitter / (self.runs or 1),
+                "maxJitter": self.maxJitter,
+                "duration": self.duration / (self.runs or 1),
+                "maxDuration": self.maxDuration,
+                "lastRun": self.lastRun,
+                "alive": self.isAlive()}
+
+
+class LoopScheduler (object):
+
+    """
+    Runs the control() loops of all objects of a Manager: a heap of
+    next deadlines, one dispatcher thread sleeping until the earliest,
+    and a pool of workers calling control().
+
+    Workers are started as needed, up to maxWorkers, so a few loops
+    blocked on slow hardware don't hold the others. A loop never runs
+    on two workers at once.
+    """
+
+    def __init__(self, maxWorkers=DEFAULT_MAX_WORKERS):
+        self.maxWorkers = maxWorkers
+
+        self._heap = []
+        self._loops = []
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._waiter = StateWaiter(maxPoll=60.0)
+        self._version = 0
+        self._dying = False
+
+        self._ready = Queue.Queue()
+        self._workers = []
+        self._idle = 0
+        self._queued = 0
+
+        self._dispatcher = threading.Thread(target=self._dispatch, name="control loops")
+        self._dispatcher.setDaemon(True)
+        self._dispatcher.start()
+
+    def schedule(self, instance, name=None):
+        """
+        Start running instance's control() loop, first run right away.
+        """
+        loop = ControlLoop(self, instance, name or repr(instance))
+
+        self._lock.acquire()
+        try:
+            self._loops.append(loop)
+            self._push(loop, time.time())
+        finally:
+            self._lock.release()
+
+        self._changed()
+        return loop
+
+    def cancel(self, loop):
+        """
+        Stop loop. A control() already running finishes (see
+        ControlLoop.join), nothing else runs after it.
+        """
+        self._lock.acquire()
+        try:
+            loop.cancelled = True
+            loop.token += 1
+            self._version += 1
+            if not loop.running:
+                self._finish(loop)
+        finally:
+            self._lock.release()
+
+        self._changed()
+
+    def wakeUp(self, loop):
+        self._lock.acquire()
+        try:
+            if loop.cancelled or not loop.isAlive():
+                return
+            loop.wakeUps += 1
+            if loop.running:
+                # again as soon as this run ends
+                loop.woken = True
+            else:
+                self._push(loop, time.time())
+        finally:
+            self._lock.release()
+
+        self._changed()
+
+    def reschedule(self, loop):
+        """
+        Rate changed, next run one new period after the last.
+        """
+        self._lock.acquire()
+        try:
+            if loop.cancelled or loop.running:
+                return
+
+            period = loop.period()
+            if period is None:
+                loop.token += 1
+                self._version += 1
+                return
+
+            self._push(loop, (loop.lastRun or time.time()) + period)
+        finally:
+            self._lock.release()
+
+        self._changed()
+
+    def stop(self):
+        self._lock.acquire()
+        try:
+            loops = list(self._loops)
+        finally:
+            self._lock.release()
+
+        for loop in loops:
+            self.cancel(loop)
+
+        self._dying = True
+        self._changed()
+
+        for worker in self._workers:
+            self._ready.put(None)
+
+        if self._dispatcher is not threading.currentThread():
+            self._dispatcher.join()
+
+    def getStats(self):
+        self._lock.acquire()
+        try:
+            loops = list(self._loops)
+        finally:
+            self._lock.release()
+
+        return dict([(loop.name, loop.getStats()) for loop in loops])
+
+    def threads(self):
+        return 1 + len(self._workers)
+
+    # under _lock
+    def _push(self, loop, deadline):
+        loop.token += 1
+        loop.deadline = deadline
+        self._seq += 1
+        self._version += 1
+        heapq.heappush(self._heap, (deadline, self._seq, loop.token, loop))
+
+    def _finish(self, loop):
+        if loop in self._loops:
+            self._loops.remove(loop)
+        loop._done.set()
+
+    def _changed(self):
+        self._waiter.changed()
+
+    def _dispatch(self):
+
+        while not self._dying:
+
+            now = time.time()
+            ready = []
+
+            self._lock.acquire()
+            try:
+                while self._heap and self._heap[0][0] <= now:
+                    deadline, seq, token, loop = heapq.heappop(self._heap)
+                    # rescheduled or cancelled since
+                    if token != loop.token or loop.cancelled:
+                        continue
+                    loop.running = True
+                    ready.append(loop)
+
+                next = self._heap[0][0] if self._heap else None
+                version = self._version
+            finally:
+                self._lock.release()
+
+            for loop in ready:
+                self._run(loop)
+
+            if ready:
+                continue
+
+            # until the earliest deadline or anything changes
+            timeout = None if next is None else max(next - time.time(), 0)
+            self._waiter.wait(lambda: self._dying or self._version != version,
+                              timeout=timeout)
+
+    def _run(self, loop):
+        self._lock.acquire()
+        try:
+            self._queued += 1
+            if self._queued > self._idle and len(self._workers) < self.maxWorkers:
+                worker = threading.Thread(target=self._work,
+                                          name="control loop worker %d" % (len(self._workers) + 1))
+                worker.setDaemon(True)
+                self._workers.append(worker)
+                self._idle += 1
+                worker.start()
+        finally:
+            self._lock.release()
+
+        self._ready.put(loop)
+
+    def _work(self):
+
+        while True:
+            loop = self._ready.get()
+            if loop is None:
+                return
+
+            self._lock.acquire()
+            try:
+                self._queued -= 1
+                self._idle -= 1
+            finally:
+                self._lock.release()
+
+            try:
+                self._control(loop)
+            finally:
+                self._lock.acquire()
+                try:
+                    self._idle += 1
+                finally:
+                    self._lock.release()
+
+    def _control(self, loop):
+
+        # cancelled while queued for a worker
+        self._lock.acquire()
+        try:
+            if loop.cancelled:
+                loop.running = False
+                self._finish(loop)
+                return
+        finally:
+            self._lock.release()
+
+        start = time.time()
+        late = max(start - loop.deadline, 0.0)
+
+        again = False
+        try:
+            again = loop.instance.control()
+        except Exception:
+            log.exception("Error running %s control, loop stopped." % loop.name)
+
+        end = time.time()
+        duration = end - start
+
+        loop.runs += 1
+        loop.lastRun = start
+        loop.jitter += late
+        loop.maxJitter = max(loop.maxJitter, late)
+        loop.duration += duration
+        loop.maxDuration = max(loop.maxDuration, duration)
+
+        self._lock.acquire()
+        try:
+            loop.running = False
+
+            if not again or loop.cancelled:
+                self._finish(loop)
+                return
+
+            period = loop.period()
+
+            if loop.woken:
+                loop.woken = False
+                self._push(loop, end)
+            elif period is not None:
+                # next tick in phase with this one, skipping (and
+                # counting) the ones we ran over
+                deadline = loop.deadline + period
+                if deadline < end:
+                    missed = int(math.ceil((end - deadline) / period))
+                    loop.overruns += missed
+                    deadline += missed * period
+                self._push(loop, deadline)
+        finally:
+            self._lock.release()
+
+        self._changed()
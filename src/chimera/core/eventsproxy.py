@@ -20,35 +20,298 @@
 # 02110-1301, USA.
 
 from chimera.core.proxy import Proxy
+from chimera.util.enum import Enum
 
 import logging
 #import chimera.core.log
 
 import Pyro.errors
 
+import threading
 import traceback
+import time
 import sys
 
+from collections import deque
+
 log = logging.getLogger(__name__)
 
 
-__all__ = ['EventsProxy']
+__all__ = ['EventsProxy',
+           'ConnectionPool',
+           'SubscriberQueue',
+           'OverflowPolicy']
+
+
+# what to do when a subscriber queue is full:
+#  BLOCK: publisher waits until the subscriber catches up
+#  DROP_OLDEST: oldest queued event is discarded
+#  COALESCE_LATEST: a queued event of the same topic is replaced by the
+#                   new one (good for position/temperature-like events)
+OverflowPolicy = Enum("BLOCK", "DROP_OLDEST", "COALESCE_LATEST")
+
+DEFAULT_QUEUE_SIZE = 100
+
+
+class ConnectionPool (object):
+
+    """
+    Keeps one persistent Proxy per subscriber URI, so publishing an
+    event reuses an already open socket instead of connecting (and
+    leaving a TIME_WAIT socket behind) for every handler.
+
+    Connections idle for more than keepalive seconds are pinged before
+    being reused; dead connections are dropped and reopened on demand.
+    """
+
+    def __init__(self, keepalive=30.0):
+        self.keepalive = keepalive
+
+        # str(uri) -> [proxy, lastUsed]
+        self._conns = {}
+        self._lock = threading.Lock()
+
+        self.opened = 0
+        self.reused = 0
+
+    def get(self, uri):
+
+        key = str(uri)
+
+        self._lock.acquire()
+        try:
+            entry = self._conns.get(key)
+
+            if entry is None:
+                entry = [Proxy(uri=uri), 0]
+                self._conns[key] = entry
+                self.opened += 1
+            else:
+                self.reused += 1
+
+            proxy, lastUsed = entry
+            entry[1] = time.time()
+        finally:
+            self._lock.release()
+
+        # health check: after a long silence the other side may be gone
+        if lastUsed and (time.time() - lastUsed) > self.keepalive:
+            if not proxy.ping():
+                self.discard(uri)
+                return self.get(uri)
+
+        return proxy
+
+    def discard(self, uri):
+
+        self._lock.acquire()
+        try:
+            entry = self._conns.pop(str(uri), None)
+        finally:
+            self._lock.release()
+
+        if entry:
+            entry[0]._release()
+
+    def clear(self):
+
+        self._lock.acquire()
+        try:
+            entries = self._conns.values()
+            self._conns = {}
+        finally:
+            self._lock.release()
+
+        for proxy, lastUsed in entries:
+            proxy._release()
+
+    def __contains__(self, uri):
+        return str(uri) in self._conns
+
+    def __len__(self):
+        return len(self._conns)
+
+
+class SubscriberQueue (threading.Thread):
+
+    """
+    Bounded queue of pending events for a single subscriber, with its
+    own delivery thread. A slow or dead subscriber only delays its own
+    queue, never the publisher or other subscribers.
+    """
+
+    def __init__(self, events, uri, size=DEFAULT_QUEUE_SIZE):
+        threading.Thread.__init__(self, name="events for %s" % uri)
+        self.setDaemon(True)
+
+        self.events = events
+        self.uri = uri
+        self.size = size
+
+        self._queue = deque()
+        self._cond = threading.Condition(threading.Lock())
+        self._dying = False
+
+        # metrics
+        self.delivered = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.maxDepth = 0
+        self.latency = 0.0
+        self.maxLatency = 0.0
+
+    def put(self, topic, handler, args, kwargs, policy=OverflowPolicy.BLOCK):
+
+        item = [topic, handler, args, kwargs, time.time()]
+
+        self._cond.acquire()
+        try:
+            if policy == OverflowPolicy.COALESCE_LATEST:
+                for queued in self._queue:
+                    if queued[0] == topic and queued[1] == handler:
+                        # new payload, but waiting since it was first queued
+                        queued[2:4] = item[2:4]
+                        self.coalesced += 1
+                        return True
+
+            while len(self._queue) >= self.size and not self._dying:
+                if policy == OverflowPolicy.BLOCK:
+                    self._cond.wait()
+                else:
+                    self._queue.popleft()
+                    self.dropped += 1
+
+            if self._dying:
+                return False
+
+            self._queue.append(item)
+            self.maxDepth = max(self.maxDepth, len(self._queue))
+            self._cond.notifyAll()
+
+            return True
+        finally:
+            self._cond.release()
+
+    def stop(self):
+        self._cond.acquire()
+        try:
+            self._dying = True
+            self._queue.clear()
+            self._cond.notifyAll()
+        finally:
+            self._cond.release()
+
+    def run(self):
+
+        while True:
+
+            self._cond.acquire()
+            try:
+                while not self._queue and not self._dying:
+                    self._cond.wait()
+
+                if self._dying:
+                    return
+
+                topic, handler, args, kwargs, queued = self._queue.popleft()
+                self._cond.notifyAll()
+            finally:
+                self._cond.release()
+
+            self.events._dispatch(topic, handler, args, kwargs)
+
+            latency = time.time() - queued
+            self.delivered += 1
+            self.latency += latency
+            self.maxLatency = max(self.maxLatency, latency)
+
+    def getStats(self):
+        return {"depth": len(self._queue),
+                "maxDepth": self.maxDepth,
+                "delivered": self.delivered,
+                "dropped": self.dropped,
+                "coalesced": self.coalesced,
+                "latency": self.latency / (self.delivered or 1),
+                "maxLatency": self.maxLatency}
 
 
 class EventsProxy:
 
     def __init__(self):
         self.handlers = {}
+        self.pool = ConnectionPool()
+
+        # asynchronous dispatch (off by default, see setAsync)
+        self.asynchronous = False
+        self.queueSize = DEFAULT_QUEUE_SIZE
+        self.policy = OverflowPolicy.BLOCK
+        self.policies = {}
+        self.queues = {}
+
+        self._lock = threading.RLock()
+
+    def setAsync(self, asynchronous=True, size=DEFAULT_QUEUE_SIZE,
+                 policy=OverflowPolicy.BLOCK):
+        """
+        Deliver events from per-subscriber queues, each one served by
+        its own thread, so publish returns as soon as the event is
+        queued. size bounds each queue and policy tells what to do when
+        it is full (see L{OverflowPolicy}); setPolicy overrides it for
+        a single topic.
+        """
+        self._lock.acquire()
+        try:
+            self.asynchronous = asynchronous
+            self.queueSize = size
+            self.policy = policy
+
+            if not asynchronous:
+                self._stopQueues()
+        finally:
+            self._lock.release()
+
+        return True
+
+    def setPolicy(self, topic, policy):
+        self.policies[topic] = policy
+        return True
+
+    def getStats(self):
+        """
+        Queue depth, drops and delivery latency (in seconds) of each
+        subscriber queue, keyed by subscriber URI.
+        """
+        self._lock.acquire()
+        try:
+            queues = self.queues.items()
+        finally:
+            self._lock.release()
+
+        return dict([(uri, queue.getStats()) for uri, queue in queues])
+
+    def close(self):
+        self._lock.acquire()
+        try:
+            self._stopQueues()
+        finally:
+            self._lock.release()
+
+        self.pool.clear()
+        return True
 
     def subscribe(self, handler):
 
         topic = handler["topic"]
 
-        if topic not in self.handlers:
-            self.handlers[topic] = []
+        self._lock.acquire()
+        try:
+            if topic not in self.handlers:
+                self.handlers[topic] = []
 
-        if handler["handler"] not in self.handlers[topic]:
-            self.handlers[topic].append(handler["handler"])
+            if handler["handler"] not in self.handlers[topic]:
+                self.handlers[topic].append(handler["handler"])
+        finally:
+            self._lock.release()
 
         return True
 
@@ -56,60 +319,126 @@ class EventsProxy:
 
         topic = handler["topic"]
 
-        if not topic in self.handlers:
-            return True
+        self._lock.acquire()
+        try:
+            if not topic in self.handlers:
+                return True
 
-        if handler["handler"] not in self.handlers[topic]:
-            return True
+            if handler["handler"] not in self.handlers[topic]:
+                return True
 
-        self.handlers[topic].remove(handler["handler"])
+            self.handlers[topic].remove(handler["handler"])
+            self._releaseIfUnused(handler["handler"]["proxy"])
+        finally:
+            self._lock.release()
 
         return True
 
     def publish(self, topic, *args, **kwargs):
 
-        if topic not in self.handlers:
+        self._lock.acquire()
+        try:
+            if topic not in self.handlers:
+                return True
+
+            # work on a copy, subscriptions may change while we publish
+            handlers = list(self.handlers[topic])
+
+            queues = None
+            if self.asynchronous:
+                queues = [self._getQueue(handler["proxy"])
+                          for handler in handlers]
+        finally:
+            self._lock.release()
+
+        if queues is None:
+            for handler in handlers:
+                self._dispatch(topic, handler, args, kwargs)
             return True
 
-        excluded = []
+        policy = self.policies.get(topic, self.policy)
 
-        for handler in self.handlers[topic]:
+        for handler, queue in zip(handlers, queues):
+            queue.put(topic, handler, args, kwargs, policy)
 
-            # FIXME: reuse connections? if not, TIME_WAIT sockets start to slow
-            # down things
-            proxy = Proxy(uri=handler["proxy"])
+        return True
 
-            try:
-                dispatcher = getattr(proxy, handler["method"])
-                # proxy._setOneway ([handler["method"]]) should be faster but
-                # results say no!
-                dispatcher(*args, **kwargs)
-            except AttributeError, e:
-                tb_size = len(traceback.extract_tb(sys.exc_info()[2]))
-                if tb_size == 1:
-                    log.debug("Invalid proxy method ('%s %s') for '%s' handler." %
-                              (handler["proxy"], handler["method"], topic))
-                else:
-                    log.debug(
-                        "Handler (%s) raised an exception. Removing from subscribers list." % proxy)
-                    log.exception(e)
+    def _dispatch(self, topic, handler, args, kwargs):
 
-                excluded.append(handler)
-                continue
-            except Pyro.errors.ProtocolError, e:
-                log.debug(
-                    "Unreachable handler (%s). Removing from subscribers list." % proxy)
-                excluded.append(handler)
-                continue
-            except Exception, e:
+        try:
+            self._deliver(handler, *args, **kwargs)
+            return True
+        except AttributeError, e:
+            tb_size = len(traceback.extract_tb(sys.exc_info()[2]))
+            if tb_size == 1:
+                log.debug("Invalid proxy method ('%s %s') for '%s' handler." %
+                          (handler["proxy"], handler["method"], topic))
+            else:
                 log.debug(
-                    "Handler (%s) raised an exception. Removing from subscribers list." % proxy)
+                    "Handler (%s) raised an exception. Removing from subscribers list." % handler["proxy"])
                 log.exception(e)
-                excluded.append(handler)
-                continue
+        except Pyro.errors.ProtocolError, e:
+            log.debug(
+                "Unreachable handler (%s). Removing from subscribers list." % handler["proxy"])
+        except Exception, e:
+            log.debug(
+                "Handler (%s) raised an exception. Removing from subscribers list." % handler["proxy"])
+            log.exception(e)
 
         # remove unreacheable
-        for handler in excluded:
-            self.handlers[topic].remove(handler)
-
-        return True
+        self._lock.acquire()
+        try:
+            if handler in self.handlers.get(topic, []):
+                self.handlers[topic].remove(handler)
+            self._releaseIfUnused(handler["proxy"])
+        finally:
+            self._lock.release()
+
+        return False
+
+    def _deliver(self, handler, *args, **kwargs):
+
+        proxy = self.pool.get(handler["proxy"])
+
+        try:
+            # proxy._setOneway ([handler["method"]]) should be faster but
+            # results say no!
+            return getattr(proxy, handler["method"])(*args, **kwargs)
+        except Pyro.errors.TimeoutError:
+            raise
+        except Pyro.errors.ConnectionClosedError:
+            # pooled connection went stale (subscriber's manager
+            # restarted?), try once again with a fresh one before
+            # giving up on this handler.
+            self.pool.discard(handler["proxy"])
+            proxy = self.pool.get(handler["proxy"])
+            return getattr(proxy, handler["method"])(*args, **kwargs)
+
+    def _getQueue(self, uri):
+
+        key = str(uri)
+
+        if key not in self.queues:
+            queue = SubscriberQueue(self, uri, self.queueSize)
+            queue.start()
+            self.queues[key] = queue
+
+        return self.queues[key]
+
+    def _stopQueues(self):
+        for queue in self.queues.values():
+            queue.stop()
+        self.queues = {}
+
+    def _releaseIfUnused(self, uri):
+
+        for handlers in self.handlers.values():
+            for handler in handlers:
+                if str(handler["proxy"]) == str(uri):
+                    return
+
+        self.pool.discard(uri)
+
+        queue = self.queues.pop(str(uri), None)
+        if queue:
+            queue.stop()
@@ -0,0 +1,222 @@
+#! /usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+# chimera - observatory automation system
+# Copyright (C) 2006-2007  P. Henrique Silva <henrique@astro.ufsc.br>
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.
+
+import bisect
+import os
+import sys
+import threading
+import time
+
+
+__all__ = ['LockProfiler', 'profiler', 'BUCKETS', 'callerName']
+
+
+# histogram buckets (upper bounds in seconds, the last one is open)
+BOUNDS = [1e-5, 1e-4, 1e-3, 1e-2, 1e-1, 1.0, 10.0]
+BUCKETS = ["<10us", "<100us", "<1ms", "<10ms", "<100ms", "<1s", "<10s", ">=10s"]
+
+
+# frames of these modules are skipped looking for who called acquire
+_PLUMBING = ("chimeraobject", "methodwrapper")
+
+
+def callerName():
+    """
+    Name of the function that called ChimeraObject.acquire (or used
+    'with'), not counting our own plumbing.
+    """
+    frame = sys._getframe(1)
+    while frame is not None:
+        module = os.path.splitext(os.path.basename(frame.f_code.co_filename))[0]
+        if module not in _PLUMBING:
+            return frame.f_code.co_name
+        frame = frame.f_back
+    return "?"
+
+
+class LockStats (object):
+
+    def __init__(self):
+        self.calls = 0
+        self.contended = 0
+        self.wait = 0.0
+        self.maxWait = 0.0
+        self.hold = 0.0
+        self.maxHold = 0.0
+        self.waitHist = [0] * len(BUCKETS)
+        self.holdHist = [0] * len(BUCKETS)
+        # holder method -> [times, seconds waited]
+        self.blockedBy = {}
+
+    def getStats(self):
+        return {"calls": self.calls,
+                "contended": self.contended,
+                "wait": self.wait,
+                "maxWait": self.maxWait,
+                "hold": self.hold,
+                "maxHold": self.maxHold,
+                "waitHist": list(self.waitHist),
+                "holdHist": list(self.holdHist),
+                "blockedBy": dict([(holder, tuple(blocked))
+                                   for holder, blocked in self.blockedBy.items()])}
+
+
+class LockProfiler (object):
+
+    """
+    Records, for every object and method, how long calls waited for
+    the instance monitor, how long they held it and who held it while
+    they waited. Off by default: LockWrapperDispatcher and
+    ChimeraObject.acquire only come here when enabled is set, so
+    disabled it costs one attribute check per call.
+
+    Stats are keyed by object location and method; nested (reentrant)
+    calls count as calls but only the outermost one holds the
+    monitor. Remember that the monitor is shared by all instances of a
+    class.
+
+    >>> profiler.enable()
+    >>> profiler.topContenders(5)
+    [('/FakeTelescope/fake', 'getRa', 'slewToRaDec', 3, 12.1), ...]
+    """
+
+    def __init__(self):
+        self.enabled = False
+
+        self._lock = threading.Lock()
+        # (object, method) -> LockStats
+        self._stats = {}
+        # id(monitor) -> [object, method, thread, since, depth]
+        self._holders = {}
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        self._lock.acquire()
+        try:
+            self._stats = {}
+        finally:
+            self._lock.release()
+
+    def acquire(self, monitor, name, method):
+
+        start = time.time()
+        holder = None
+
+        if not monitor.acquire(False):
+            # taken, remember by whom before we queue for it
+            current = self._holders.get(id(monitor))
+            if current is not None:
+                holder = current[1]
+                if current[0] != name:
+                    # another instance of the same class
+                    holder = "%s %s" % (current[0], current[1])
+            monitor.acquire()
+
+        now = time.time()
+        waited = now - start
+        thread = threading.currentThread()
+
+        self._lock.acquire()
+        try:
+            stats = self._get(name, method)
+            stats.calls += 1
+            stats.wait += waited
+            stats.maxWait = max(stats.maxWait, waited)
+            stats.waitHist[bisect.bisect(BOUNDS, waited)] += 1
+
+            if holder is not None:
+                stats.contended += 1
+                blocked = stats.blockedBy.setdefault(holder, [0, 0.0])
+                blocked[0] += 1
+                blocked[1] += waited
+
+            current = self._holders.get(id(monitor))
+            if current is not None and current[2] is thread:
+                current[4] += 1
+            else:
+                self._holders[id(monitor)] = [name, method, thread, now, 1]
+        finally:
+            self._lock.release()
+
+    def release(self, monitor):
+
+        self._lock.acquire()
+        try:
+            current = self._holders.get(id(monitor))
+            if current is not None and current[2] is threading.currentThread():
+                current[4] -= 1
+                if not current[4]:
+                    del self._holders[id(monitor)]
+
+                    held = time.time() - current[3]
+                    stats = self._get(current[0], current[1])
+                    stats.hold += held
+                    stats.maxHold = max(stats.maxHold, held)
+                    stats.holdHist[bisect.bisect(BOUNDS, held)] += 1
+        finally:
+            self._lock.release()
+
+        monitor.release()
+
+    def _get(self, name, method):
+        stats = self._stats.get((name, method))
+        if stats is None:
+            stats = self._stats[(name, method)] = LockStats()
+        return stats
+
+    def getStats(self):
+        """
+        {object: {method: stats}}, times in seconds, histograms counted
+        in L{BUCKETS}.
+        """
+        self._lock.acquire()
+        try:
+            ret = {}
+            for (name, method), stats in self._stats.items():
+                ret.setdefault(name, {})[method] = stats.getStats()
+            return ret
+        finally:
+            self._lock.release()
+
+    def topContenders(self, n=10):
+        """
+        The n worst (object, waiting method, holder method, times,
+        seconds waited), most time waited first.
+        """
+        self._lock.acquire()
+        try:
+            contenders = [(name, method, holder, blocked[0], blocked[1])
+                          for (name, method), stats in self._stats.items()
+                          for holder, blocked in stats.blockedBy.items()]
+        finally:
+            self._lock.release()
+
+        contenders.sort(key=lambda contender: contender[4], reverse=True)
+        return contenders[:n]
+
+
+# one for the process, monitors are class wide anyway
+profiler = LockProfiler()
@@ -21,10 +21,10 @@
 
 
 import logging
-import time
 
 from chimera.core.methodwrapper import MethodWrapper, MethodWrapperDispatcher
 
+from chimera.core.lockprofile import profiler
 from chimera.core.constants import INSTANCE_MONITOR_ATTRIBUTE_NAME
 
 log = logging.getLogger(__name__)
@@ -55,17 +55,24 @@ class LockWrapperDispatcher (MethodWrapperDispatcher):
 
         lock = getattr(self.instance, INSTANCE_MONITOR_ATTRIBUTE_NAME)
 
-        #t0 = time.time()
-        #log.debug("[trying to acquire monitor] %s %s" % (self.instance, self.func.__name__))
+        if profiler.enabled:
+            return self._profiledCall(lock, *args, **kwargs)
+
         lock.acquire()
-        #log.debug("[acquired monitor] %s %s after %f" % (self.instance, self.func.__name__, time.time()-t0))
 
         ret = None
 
         try:
             ret = self.func(*args, **kwargs)
         finally:
-            #log.debug("[release monitor] %s %s" % (self.instance, self.func.__name__))
             lock.release()
 
         return ret
+
+    def _profiledCall(self, lock, *args, **kwargs):
+        profiler.acquire(lock, str(getattr(self.instance, "__location__", "")) or
+                         self.instance.__class__.__name__, self.func.__name__)
+        try:
+            return self.func(*args, **kwargs)
+        finally:
+            profiler.release(lock)
@@ -25,6 +25,8 @@ from chimera.core.resources import ResourcesManager
 from chimera.core.location import Location
 
 from chimera.core.chimeraobject import ChimeraObject
+from chimera.core.controlloop import LoopScheduler
+from chimera.core.lockprofile import profiler
 from chimera.core.remoteobject import RemoteObject
 from chimera.core.proxy import Proxy
 from chimera.core.util import getManagerURI
@@ -42,6 +44,7 @@ from chimera.core.path import ChimeraPath
 #import chimera.core.log
 
 from chimera.core.constants import MANAGER_DEFAULT_HOST, MANAGER_DEFAULT_PORT, MANAGER_LOCATION
+from chimera.core.constants import EVENTS_PROXY_NAME, PROXY_CACHE_TTL
 
 try:
     import Pyro.core
@@ -130,12 +133,21 @@ class Manager (RemoteObject):
         self.resources = ResourcesManager()
         self.classLoader = ClassLoader()
 
+        # getProxy cache: location -> [uri, validated, generation, local].
+        # Every add/remove/start/stop bumps the generation, so local
+        # entries never outlive the object they point to.
+        self._proxyCache = {}
+        self._proxyGeneration = 0
+
         # identity
         self.setGUID(MANAGER_LOCATION)
 
         # shutdown event
         self.died = threading.Event()
 
+        # control() loops of all our objects (see start)
+        self.loops = LoopScheduler()
+
         # our daemon server
         self.adapter = ManagerAdapter(self, host, port)
         self.adapterThread = threading.Thread(target=self.adapter.requestLoop)
@@ -253,6 +265,13 @@ class Manager (RemoteObject):
             location = Location(
                 location, host=host or self.getHostname(), port=port or self.getPort())
 
+        key = (location.host, location.port, location.cls, location.name)
+        generation = self._proxyGeneration
+
+        uri = self._getCachedURI(key, lazy)
+        if uri:
+            return Proxy(uri=uri)
+
         # who manages this location?
         if self._belongsToMe(location):
 
@@ -266,6 +285,7 @@ class Manager (RemoteObject):
                 return p
             else:
                 p.ping()
+                self._setCachedURI(key, ret.uri, generation, local=True)
                 return p
         else:
 
@@ -291,8 +311,51 @@ class Manager (RemoteObject):
                     raise ObjectNotFoundException("Couldn't find an object at the"
                                                   " given location %s" % location)
                 else:
+                    self._setCachedURI(key, proxy.URI, generation, local=False)
                     return proxy
 
+    def _getCachedURI(self, key, lazy):
+
+        entry = self._proxyCache.get(key)
+
+        if not entry:
+            return None
+
+        uri, validated, generation, local = entry
+
+        if generation != self._proxyGeneration:
+            self._proxyCache.pop(key, None)
+            return None
+
+        # local objects are tracked by the generation, remote ones are
+        # pinged again from time to time
+        if local or lazy or time.time() - validated < PROXY_CACHE_TTL:
+            return uri
+
+        if Proxy(uri=uri).ping():
+            entry[1] = time.time()
+            return uri
+
+        self._proxyCache.pop(key, None)
+        return None
+
+    def _setCachedURI(self, key, uri, generation, local):
+        # don't cache lookups that raced with an add/remove/start/stop
+        if generation == self._proxyGeneration:
+            self._proxyCache[key] = [uri, time.time(), generation, local]
+
+    def getProxyGeneration(self):
+        """
+        Bumped on every add/remove/start/stop, proxies cached by
+        clients (see L{ManagerProxy}) from an older generation may
+        point to objects that are gone.
+        """
+        return self._proxyGeneration
+
+    def _invalidateProxies(self):
+        self._proxyGeneration += 1
+        self._proxyCache.clear()
+
     def _belongsToMe(self, location):
         meHost = self.getHostname()
         meName = socket.gethostbyname(meHost)
@@ -344,6 +407,8 @@ class Manager (RemoteObject):
                 except ChimeraException:
                     pass
             finally:
+                self.loops.stop()
+
                 # kill our adapter
                 self.adapter.shutdown(disconnect=True)
 
@@ -407,6 +472,7 @@ class Manager (RemoteObject):
             # getByClass feature.
             cls = self.classLoader.loadClass(location.cls, path)
             self.resources.add(location, cls(), None)
+            self._invalidateProxies()
             return True
 
         # get the class
@@ -477,6 +543,7 @@ class Manager (RemoteObject):
         uri = self.adapter.connect(
             obj, index=str(Location(cls=location.cls, name=next)))
         self.resources.add(location, obj, uri)
+        self._invalidateProxies()
 
         if start:
             self.start(location)
@@ -506,6 +573,7 @@ class Manager (RemoteObject):
         resource = self.resources.get(location)
         self.adapter.disconnect(resource.instance)
         self.resources.remove(location)
+        self._invalidateProxies()
 
         return True
 
@@ -530,6 +598,7 @@ class Manager (RemoteObject):
         log.info("Starting %s." % location)
 
         resource = self.resources.get(location)
+        self._invalidateProxies()
 
         if resource.instance.getState() == State.RUNNING:
             return True
@@ -543,13 +612,21 @@ class Manager (RemoteObject):
 
         try:
             # FIXME: thread exception handling
-            # ok, now schedule object main in a new thread
             log.info("Running %s. __main___." % location)
 
-            loop = threading.Thread(target=resource.instance.__main__)
-            loop.setName(str(resource.location) + ".__main__")
-            loop.setDaemon(True)
-            loop.start()
+            instance = resource.instance
+
+            if self._ownMain(instance):
+                # object main in a new thread
+                loop = threading.Thread(target=instance.__main__)
+                loop.setName(str(resource.location) + ".__main__")
+                loop.setDaemon(True)
+                loop.start()
+            else:
+                # just the control() loop, on our scheduler
+                instance._loop_abort.clear()
+                loop = self.loops.schedule(instance, str(resource.location))
+                instance._controlLoop = loop
 
             resource.instance.__setstate__(State.RUNNING)
             resource.created = time.time()
@@ -584,6 +661,7 @@ class Manager (RemoteObject):
         log.info("Stopping %s." % location)
 
         resource = self.resources.get(location)
+        self._invalidateProxies()
 
         try:
 
@@ -600,6 +678,10 @@ class Manager (RemoteObject):
                 resource.instance.__stop__()
                 resource.instance.__setstate__(State.STOPPED)
 
+            # release event delivery threads and subscriber connections
+            if hasattr(resource.instance, EVENTS_PROXY_NAME):
+                getattr(resource.instance, EVENTS_PROXY_NAME).close()
+
             return True
 
         except Exception:
@@ -609,6 +691,35 @@ class Manager (RemoteObject):
             raise ChimeraObjectException(
                 "Error running %s __stop__ method." % location)
 
+    def _ownMain(self, instance):
+        return getattr(type(instance).__main__, "im_func", None) is not ChimeraObject.__main__.im_func
+
+    def getLoopStats(self):
+        """
+        Runs, overruns and jitter of every running control() loop (see
+        L{ControlLoop.getStats}), keyed by location.
+        """
+        return self.loops.getStats()
+
+    # lock profiling (see L{LockProfiler})
+    def setLockProfiling(self, enabled=True):
+        """
+        Start (or stop) recording monitor waits and holds of all
+        objects of this process.
+        """
+        profiler.enable(enabled)
+        return True
+
+    def getLockStats(self):
+        return profiler.getStats()
+
+    def getLockContenders(self, n=10):
+        return profiler.topContenders(n)
+
+    def resetLockStats(self):
+        profiler.reset()
+        return True
+
     def getGUID(self):
         return self.objectGUID
 
@@ -19,6 +19,8 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
 # 02110-1301, USA.
 
+from chimera.core.constants import DISPATCHERS_ATTRIBUTE_NAME
+
 import logging
 
 #import chimera.core.log
@@ -38,33 +40,37 @@ class MethodWrapper (object):
         # our wrapped function
         self.func = func
 
-        # will be bounded by the descriptor get
-        self.cls = None
-        self.instance = None
-
         self.specials = specials or {}
         self.dispatcher = dispatcher or MethodWrapperDispatcher
 
         # like a real duck!
         self.__name__ = func.func_name
 
-    # resolver our specials dispatchers
-    def __getattr__(self, attr):
-
-        if attr in self.specials:
-            return self.specials[attr](self, self.instance, self.cls)
-
-        raise AttributeError()
-
     # MOST important here: descriptor to bind our dispatcher to an instance
     # and a class
     def __get__(self, instance, cls=None):
 
-        # bind ourself to pass to our specials
-        self.cls = cls
-        self.instance = instance
-
-        return self.dispatcher(self, instance, cls)
+        if instance is None:
+            return self.dispatcher(self, instance, cls)
+
+        # bound dispatchers are created only once per instance and kept on
+        # the instance itself (keyed by wrapper, so super() calls and
+        # overrides don't clash), nothing is stored on the wrapper, which
+        # is shared by every instance of the class.
+        try:
+            dispatchers = instance.__dict__[DISPATCHERS_ATTRIBUTE_NAME]
+        except KeyError:
+            dispatchers = instance.__dict__.setdefault(
+                DISPATCHERS_ATTRIBUTE_NAME, {})
+        except AttributeError:
+            # no __dict__, no cache
+            return self.dispatcher(self, instance, cls)
+
+        try:
+            return dispatchers[self]
+        except KeyError:
+            return dispatchers.setdefault(self,
+                                          self.dispatcher(self, instance, cls))
 
 
 class MethodWrapperDispatcher (object):
@@ -76,13 +82,25 @@ class MethodWrapperDispatcher (object):
         self.instance = instance
         self.cls = cls
 
-        # go duck, go!
-        self.bound_name = "<bound method %s.%s.begin of %s>" % (self.cls.__name__,
-                                                                self.func.func_name,
-                                                                repr(self.instance))
+    # go duck, go! (names are only built when asked for)
+    bound_name = property(lambda self: "<bound method %s.%s.begin of %s>" %
+                          (self.cls.__name__,
+                           self.func.func_name,
+                           repr(self.instance)))
+
+    unbound_name = property(lambda self: "<unbound method %s.%s>" %
+                            (self.cls.__name__,
+                             self.func.func_name))
+
+    # resolve our wrapper specials dispatchers
+    def __getattr__(self, attr):
+
+        wrapper = self.__dict__.get("wrapper")
+
+        if wrapper is not None and attr in wrapper.specials:
+            return wrapper.specials[attr](wrapper, self.instance, self.cls)
 
-        self.unbound_name = "<unbound method %s.%s>" % (
-            self.cls.__name__, self.func.func_name)
+        raise AttributeError(attr)
 
     def __repr__(self):
         if self.instance:
@@ -26,15 +26,19 @@ except ImportError, e:
     raise RuntimeError("You must have Pyro version >= 3.6 installed.")
 
 from chimera.core.constants import MANAGER_DEFAULT_HOST, MANAGER_DEFAULT_PORT
-from chimera.core.constants import EVENTS_PROXY_NAME
+from chimera.core.constants import EVENTS_PROXY_NAME, PROXY_CACHE_TTL
 from chimera.core.location import Location
 
 #import chimera.core.log
 import logging
+import time
+
+from types import StringType
 
 
 __all__ = ['Proxy',
-           'ProxyMethod']
+           'ProxyMethod',
+           'ManagerProxy']
 
 
 log = logging.getLogger(__name__)
@@ -88,6 +92,59 @@ class Proxy (Pyro.core.DynamicProxy):
         return "[proxy for %s]" % self.URI
 
 
+class ManagerProxy (Proxy):
+
+    """
+    Proxy to a Manager which remembers the proxies returned by
+    getProxy, so code asking the manager for the same objects again and
+    again (on every exposure, for example) reuses the proxy, and its
+    already open connection, instead of a new connection each time.
+
+    Every lookup still asks the manager for its proxy generation (bumped
+    on every add/remove/start/stop), cached proxies from an older
+    generation are looked up again, so removed or restarted objects are
+    never served from here. Within a generation, cached proxies are
+    pinged again after PROXY_CACHE_TTL seconds (lazy ones are just
+    looked up again). Like any other Proxy, this one (and its cache)
+    shouldn't be shared between threads, ChimeraObject.getManager gives
+    each thread its own.
+    """
+
+    def getProxy(self, location, name='0', host=None, port=None, lazy=False):
+
+        # not a plain attribute, as it would be lost when pickling
+        cache = self.__dict__.setdefault("_proxies", {})
+
+        if isinstance(location, (StringType, Location)):
+            key = (str(location), name, host, port, lazy)
+        else:
+            key = (getattr(location, "__name__", location), name, host, port, lazy)
+
+        # before the lookup, so a change during it invalidates the entry
+        generation = ProxyMethod(self, "getProxyGeneration")()
+
+        entry = cache.get(key)
+
+        if entry:
+            proxy, validated, cached = entry
+
+            if cached == generation:
+
+                if time.time() - validated < PROXY_CACHE_TTL:
+                    return proxy
+
+                if not lazy and proxy.ping():
+                    entry[1] = time.time()
+                    return proxy
+
+            del cache[key]
+
+        proxy = ProxyMethod(self, "getProxy")(location, name, host, port, lazy)
+        cache[key] = [proxy, time.time(), generation]
+
+        return proxy
+
+
 class ProxyMethod (object):
 
     def __init__(self, proxy, method):
@@ -25,6 +25,7 @@ from chimera.core.exceptions import InvalidLocationException, \
     ObjectNotFoundException, \
     ChimeraException
 
+import threading
 import time
 import sys
 
@@ -39,14 +40,21 @@ class Resource (object):
         self._loop = None
         self._uri = None
 
+        # ResourcesManager which indexes us (to keep creation order)
+        self._owner = None
+
+    def _setCreated(self, value):
+        self._created = value
+        if self._owner is not None:
+            self._owner._reindex(self)
+
     location = property(lambda self: self._location,
                         lambda self, value: setattr(self, '_location', value))
     instance = property(lambda self: self._instance,
                         lambda self, value: setattr(self, '_instance', value))
     bases = property(
         lambda self: self._bases, lambda self, value: setattr(self, '_bases', value))
-    created = property(lambda self: self._created,
-                       lambda self, value: setattr(self, '_created', value))
+    created = property(lambda self: self._created, _setCreated)
     loop = property(
         lambda self: self._loop, lambda self, value: setattr(self, '_loop', value))
     uri = property(
@@ -61,32 +69,53 @@ class ResourcesManager (object):
     def __init__(self):
         self._res = {}
 
-    def add(self, location, instance, uri, loop=None):
-
-        location = self._validLocation(location)
+        # indexes, all lists kept in creation order:
+        # (lower cased class, name) -> entry
+        self._names = {}
+        # location class -> entries
+        self._byClass = {}
+        # location class and every base class name -> entries
+        self._byBase = {}
 
-        if location in self:
-            raise InvalidLocationException(
-                "Location already on the resource pool.")
+        self._lock = threading.RLock()
 
-        entry = Resource()
-        entry.location = location
-        entry.instance = instance
-        if entry.instance is not None:
-            entry.bases = [b.__name__ for b in type(entry.instance).mro()]
-        entry.loop = loop
-        entry.uri = uri
+    def add(self, location, instance, uri, loop=None):
 
-        self._res[location] = entry
+        location = self._validLocation(location)
 
-        # get the number of instances of this specific class, counting this one
-        # and not including parents (minus 1 to start couting at 0)
-        return len(self.getByClass(location.cls, checkBases=False)) - 1
+        self._lock.acquire()
+        try:
+            if location in self:
+                raise InvalidLocationException(
+                    "Location already on the resource pool.")
+
+            entry = Resource()
+            entry.location = location
+            entry.instance = instance
+            if entry.instance is not None:
+                entry.bases = [b.__name__ for b in type(entry.instance).mro()]
+            entry.loop = loop
+            entry.uri = uri
+
+            self._res[location] = entry
+            self._index(entry)
+
+            # get the number of instances of this specific class, counting this one
+            # and not including parents (minus 1 to start couting at 0)
+            return len(self._byClass[location.cls]) - 1
+        finally:
+            self._lock.release()
 
     def remove(self, location):
-        entry = self.get(location)
-        del self._res[entry.location]
-        return True
+
+        self._lock.acquire()
+        try:
+            entry = self.get(location)
+            del self._res[entry.location]
+            self._unindex(entry)
+            return True
+        finally:
+            self._lock.release()
 
     def get(self, item):
 
@@ -103,47 +132,82 @@ class ResourcesManager (object):
 
     def getByClass(self, cls, checkBases=True):
 
-        toRet = []
-
-        for k, v in self.items():
-
-            if not checkBases:
-                if k.cls == cls:
-                    toRet.append(self._res[k])
-            else:
-                # return if class or any base matches
-                if cls == k.cls or cls in v.bases:
-                    toRet.append(self._res[k])
-
-        toRet.sort(key=lambda entry: entry.created)
-        return toRet
+        if checkBases:
+            # return if class or any base matches
+            return list(self._byBase.get(cls, []))
+        else:
+            return list(self._byClass.get(cls, []))
 
     def _get(self, item):
 
         location = self._validLocation(item)
-        locations = [x.location for x in self.getByClass(location.cls)]
 
-        if location in locations:
-            ret = filter(lambda x: x == location, self.keys())
-            return self._res[ret[0]]
-        else:
+        try:
+            return self._names[(location.cls.lower(), location.name)]
+        except KeyError:
             raise ObjectNotFoundException("Couldn't find %s." % location)
 
     def _getByIndex(self, item, index):
 
         location = self._validLocation(item)
 
-        insts = self.getByClass(location.cls)
+        insts = self._byBase.get(location.cls)
 
         if insts:
             try:
-                return self._res[insts[index].location]
+                return insts[index]
             except IndexError:
                 raise ObjectNotFoundException(
                     "Couldn't find %s instance #%d." % (location, index))
         else:
             raise ObjectNotFoundException("Couldn't find %s." % location)
 
+    # indexes
+
+    def _index(self, entry):
+
+        location = entry.location
+
+        self._names[(location.cls.lower(), location.name)] = entry
+        self._insort(self._byClass.setdefault(location.cls, []), entry)
+
+        for name in set([location.cls] + entry.bases):
+            self._insort(self._byBase.setdefault(name, []), entry)
+
+        entry._owner = self
+
+    def _unindex(self, entry):
+
+        location = entry.location
+        entry._owner = None
+
+        del self._names[(location.cls.lower(), location.name)]
+
+        self._byClass[location.cls].remove(entry)
+        if not self._byClass[location.cls]:
+            del self._byClass[location.cls]
+
+        for name in set([location.cls] + entry.bases):
+            self._byBase[name].remove(entry)
+            if not self._byBase[name]:
+                del self._byBase[name]
+
+    def _reindex(self, entry):
+        # creation time changed (Manager does that on start)
+        self._lock.acquire()
+        try:
+            self._unindex(entry)
+            self._index(entry)
+        finally:
+            self._lock.release()
+
+    def _insort(self, entries, entry):
+        # new entries are usually the newest ones, so look from the end
+        i = len(entries)
+        while i > 0 and entries[i - 1].created > entry.created:
+            i -= 1
+        entries.insert(i, entry)
+
     def _validLocation(self, item):
 
         ret = item
@@ -167,7 +231,7 @@ class ResourcesManager (object):
 
         item = self._validLocation(item)
 
-        if item in self.keys():
+        if (item.cls.lower(), item.name) in self._names:
             return True
         else:
             # is this a numbered instance?
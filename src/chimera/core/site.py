@@ -29,6 +29,7 @@ from dateutil import tz
 import ephem
 
 import datetime as dt
+import threading
 
 import numpy as np
 
@@ -83,18 +84,71 @@ class Site (ChimeraObject):
         self._sun = ephem.Sun()
         self._moon = ephem.Moon()
 
+        # observer for the configured location, (location, observer)
+        self._observer = (None, None)
+
+        # rise/set events, (previous, next) as ephem dates, see _event
+        self._events = {}
+        self._eventsLock = threading.Lock()
+
     def __main__(self):
         pass
 
     def _getEphem(self, date=None):
-        site = ephem.Observer()
-        site.lat = self["latitude"].strfcoord('%(d)d:%(m)d:%(s).2f')
-        site.long = self["longitude"].strfcoord('%(d)d:%(m)d:%(s).2f')
-        site.elev = self['altitude']
+        location = (self["latitude"], self["longitude"], self["altitude"])
+
+        cached, observer = self._observer
+        if cached != location:
+            observer = ephem.Observer()
+            observer.lat = self["latitude"].strfcoord('%(d)d:%(m)d:%(s).2f')
+            observer.long = self["longitude"].strfcoord('%(d)d:%(m)d:%(s).2f')
+            observer.elev = self['altitude']
+            observer.epoch = '2000/1/1 00:00:00'
+            self._observer = (location, observer)
+            self._events = {}
+
+        # callers change it (date, horizon...), so everyone gets a copy
+        site = observer.copy()
         site.date = date or self.ut()
-        site.epoch = '2000/1/1 00:00:00'
         return site
 
+    def _event(self, body, rising, date, horizon=None):
+        """
+        Next rising (or setting) of body ("sun" or "moon") after date.
+        The answer is the same for any date between the previous event
+        and this one, so it is only computed once per night.
+        """
+        site = self._getEphem(date)
+        if horizon:
+            site.elev = 0
+            site.horizon = horizon
+
+        key = (body, rising, horizon)
+        t = float(site.date)
+
+        self._eventsLock.acquire()
+        try:
+            previous, next = self._events.get(key, (None, None))
+            if previous is not None and previous < t < next:
+                return ephem.Date(next)
+        finally:
+            self._eventsLock.release()
+
+        obj = {"sun": ephem.Sun, "moon": ephem.Moon}[body]()
+
+        if rising:
+            next, previous = site.next_rising(obj), site.previous_rising(obj)
+        else:
+            next, previous = site.next_setting(obj), site.previous_setting(obj)
+
+        self._eventsLock.acquire()
+        try:
+            self._events[key] = (float(previous), float(next))
+        finally:
+            self._eventsLock.release()
+
+        return next
+
     def _Date2local(self, Date):
         # convert Date to a non-naive datetime with TZ set to UTC
         time_tuple = Date.tuple()
@@ -158,42 +212,28 @@ class Site (ChimeraObject):
 
     def sunrise(self, date=None):
         date = date or self.localtime()
-        site = self._getEphem(date)
-        return self._Date2local(site.next_rising(self._sun))
+        return self._Date2local(self._event("sun", True, date))
 
     def sunset(self, date=None):
         date = date or self.localtime()
-        site = self._getEphem(date)
-        return self._Date2local(site.next_setting(self._sun))
+        return self._Date2local(self._event("sun", False, date))
 
     def sunset_twilight_begin(self, date=None):
         # http://aa.usno.navy.mil/faq/docs/RST_defs.php
         date = date or self.localtime()
-        site = self._getEphem(date)
-        site.elev = 0
-        site.horizon = '-12:00:00'
-        return self._Date2local(site.next_setting(self._sun))
+        return self._Date2local(self._event("sun", False, date, '-12:00:00'))
 
     def sunset_twilight_end(self, date=None):
         date = date or self.localtime()
-        site = self._getEphem(date)
-        site.elev = 0
-        site.horizon = '-18:00:00'
-        return self._Date2local(site.next_setting(self._sun))
+        return self._Date2local(self._event("sun", False, date, '-18:00:00'))
 
     def sunrise_twilight_begin(self, date=None):
         date = date or self.localtime()
-        site = self._getEphem(date)
-        site.elev = 0
-        site.horizon = '-18:00:00'
-        return self._Date2local(site.next_rising(self._sun))
+        return self._Date2local(self._event("sun", True, date, '-18:00:00'))
 
     def sunrise_twilight_end(self, date=None):
         date = date or self.localtime()
-        site = self._getEphem(date)
-        site.elev = 0
-        site.horizon = '-12:00:00'
-        return self._Date2local(site.next_rising(self._sun))
+        return self._Date2local(self._event("sun", True, date, '-12:00:00'))
 
     def sunpos(self, date=None):
         date = date or self.localtime()
@@ -204,13 +244,11 @@ class Site (ChimeraObject):
 
     def moonrise(self, date=None):
         date = date or self.localtime()
-        site = self._getEphem(date)
-        return self._Date2local(site.next_rising(self._moon))
+        return self._Date2local(self._event("moon", True, date))
 
     def moonset(self, date=None):
         date = date or self.localtime()
-        site = self._getEphem(date)
-        return self._Date2local(site.next_setting(self._moon))
+        return self._Date2local(self._event("moon", False, date))
 
     def moonpos(self, date=None):
         date = date or self.localtime()
@@ -241,6 +279,74 @@ class Site (ChimeraObject):
 
         return Position.altAzToRaDec(altAz, self['latitude'], lst_inRads)
 
+    # Batch versions of the above, one call for many times/targets
+    # instead of one (remote) call for each. Angles in degrees unless
+    # said otherwise.
+
+    def LSTArray(self, mjd):
+        """
+        Local apparent sidereal time (in radians) for an array of MJDs
+        (UT). Same as LST_inRads for each of them (within a tenth of
+        second of time).
+        """
+        d = np.asarray(mjd, dtype=np.float) - 51544.5
+
+        # mean sidereal time at Greenwich (hours), see
+        # http://aa.usno.navy.mil/faq/docs/GAST.php
+        gmst = 18.697374558 + 24.06570982441908 * d
+
+        # equation of the equinoxes (nutation in longitude, main terms)
+        omega = np.radians(125.04 - 0.052954 * d)
+        l = np.radians(280.47 + 0.98565 * d)
+        eps = np.radians(23.4393 - 0.0000004 * d)
+        eqeq = (-0.000319 * np.sin(omega) - 0.000024 * np.sin(2 * l)) * np.cos(eps)
+
+        lst = np.radians((gmst + eqeq) * 15.0) + self["longitude"].R
+        return np.mod(lst, 2 * np.pi)
+
+    def raDecToAltAzArray(self, ra, dec, lst_inRads=None):
+        """
+        Alt/Az of N targets (RA/Dec in degrees). With an array of M
+        sidereal times (see LSTArray) returns (N x M) matrices, one
+        column per time.
+
+        @returns: (alt, az), azimuth from North through East.
+        """
+        if lst_inRads is None:
+            lst_inRads = self.LST_inRads()
+
+        ra = np.radians(np.asarray(ra, dtype=np.float))
+        dec = np.radians(np.asarray(dec, dtype=np.float))
+        lst = np.asarray(lst_inRads, dtype=np.float)
+
+        if lst.ndim:
+            ra, dec = ra[:, np.newaxis], dec[:, np.newaxis]
+
+        lat = self["latitude"].R
+        ha = lst - ra
+
+        sinAlt = np.sin(dec) * np.sin(lat) + np.cos(dec) * np.cos(lat) * np.cos(ha)
+        alt = np.arcsin(np.clip(sinAlt, -1, 1))
+        az = np.arctan2(-np.cos(dec) * np.sin(ha),
+                        np.sin(dec) * np.cos(lat) - np.cos(dec) * np.sin(lat) * np.cos(ha))
+
+        return np.degrees(alt), np.mod(np.degrees(az), 360.0)
+
+    def moonSeparationArray(self, ra, dec, date=None):
+        """
+        Distance from the Moon (as seen from here, J2000) to N targets
+        (RA/Dec in degrees).
+        """
+        moon = ephem.Moon()
+        moon.compute(self._getEphem(date or self.ut()))
+
+        ra = np.radians(np.asarray(ra, dtype=np.float))
+        dec = np.radians(np.asarray(dec, dtype=np.float))
+        moonRa, moonDec = float(moon.a_ra), float(moon.a_dec)
+
+        cosSep = np.sin(dec) * np.sin(moonDec) + np.cos(dec) * np.cos(moonDec) * np.cos(ra - moonRa)
+        return np.degrees(np.arccos(np.clip(cosSep, -1, 1)))
+
     def getMetadata(self, request):
         return [
             ('SITE', self['name'], 'Site name (in config)'),
@@ -3,6 +3,7 @@
 from chimera.core.chimeraobject import ChimeraObject
 from chimera.core.methodwrapper import MethodWrapper
 from chimera.core.event         import event
+from chimera.core.lock          import lock
 from chimera.core.state         import State
 from chimera.core.config        import OptionConversionException
 from chimera.core.exceptions    import InvalidLocationException
@@ -10,6 +11,9 @@ from chimera.core.constants     import CONFIG_ATTRIBUTE_NAME
 
 from nose.tools import assert_raises
 
+import threading
+import time
+
 class TestChimeraObject (object):
 
     # FIXME: use fixtures to put each test on their own method (unit tests in small units!)
@@ -99,6 +103,74 @@ class TestChimeraObject (object):
 
         assert t.doFoo(1, 2, 3) == True
 
+    def test_method_wrapper_cache (self):
+
+        class Base (ChimeraObject):
+            def doFoo (self):
+                return "base"
+
+        class Derived (Base):
+            def doFoo (self):
+                return "derived+" + super(Derived, self).doFoo()
+
+        d1 = Derived()
+        d2 = Derived()
+
+        # bound dispatchers are built once per instance...
+        assert d1.doFoo is d1.doFoo
+        assert d1.doFoo is not d2.doFoo
+
+        # ... and each one stays bound to its own instance, even when
+        # bound from different threads
+        results = []
+        def run (obj):
+            for i in range(100):
+                results.append(obj.doFoo.instance is obj)
+
+        threads = [threading.Thread(target=run, args=(obj,)) for obj in (d1, d2)*4]
+        for t in threads: t.start()
+        for t in threads: t.join()
+        assert all(results)
+
+        # super() calls get their own dispatcher
+        assert d1.doFoo() == "derived+base"
+        assert d1.doFoo() == "derived+base"
+
+        assert repr(d1.doFoo).startswith("<bound method Derived.doFoo")
+        assert repr(Derived.doFoo) == "<unbound method Derived.doFoo>"
+
+    def test_method_call_performance (self):
+
+        class Plain (object):
+            def doFoo (self):
+                return 42
+
+        class Wrapped (ChimeraObject):
+            def doFoo (self):
+                return 42
+
+            @lock
+            def doLocked (self):
+                return 42
+
+        n = 100000
+
+        def bench (f):
+            t0 = time.time()
+            for i in xrange(n):
+                f()
+            return (time.time() - t0) / n * 1e6
+
+        plain = Plain()
+        wrapped = Wrapped()
+
+        print
+        print "#"*25
+        print "# plain  : %.3f us/call" % bench(lambda: plain.doFoo())
+        print "# wrapped: %.3f us/call" % bench(lambda: wrapped.doFoo())
+        print "# locked : %.3f us/call" % bench(lambda: wrapped.doLocked())
+        print "#"*25
+
 
     def test_config (self):
 
@@ -0,0 +1,191 @@
+
+import threading
+import time
+
+from chimera.core.manager       import Manager
+from chimera.core.chimeraobject import ChimeraObject
+from chimera.core.controlloop   import LoopScheduler
+
+
+class Ticker (ChimeraObject):
+
+    def __init__ (self):
+        ChimeraObject.__init__(self)
+
+        self.ticks = []
+        self.work = 0.0
+        self.times = None
+
+    def control (self):
+        self.ticks.append(time.time())
+        if self.work:
+            time.sleep(self.work)
+        return self.times is None or len(self.ticks) < self.times
+
+
+class Broken (ChimeraObject):
+
+    def control (self):
+        raise ValueError("oops")
+
+
+class Blocker (object):
+
+    def __init__ (self):
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.runs = 0
+
+    def getHz (self):
+        return 10
+
+    def control (self):
+        self.runs += 1
+        self.started.set()
+        self.release.wait()
+        return True
+
+
+class TestControlLoop (object):
+
+    def setup (self):
+        self.manager = Manager()
+
+    def teardown (self):
+        self.manager.shutdown()
+        del self.manager
+
+    def add (self, name, hz, cls=Ticker):
+        self.manager.addClass(cls, name, start=False)
+        instance = self.manager.resources.get("/%s/%s" % (cls.__name__, name)).instance
+        instance.setHz(hz)
+        self.manager.start("/%s/%s" % (cls.__name__, name))
+        return instance
+
+    def test_rate (self):
+
+        # faster than the old 0.5 s timeslice allowed
+        ticker = self.add("fast", 50)
+        time.sleep(1.0)
+        stats = ticker.__get_loop_stats__()
+        runs = len(ticker.ticks)
+
+        print
+        print "50 Hz for 1 s: %d runs, jitter %.2f ms (max %.2f ms)" % \
+            (runs, stats["jitter"] * 1e3, stats["maxJitter"] * 1e3)
+
+        # loose bounds, the suite may be running on a busy machine
+        assert 40 <= runs <= 52
+        assert stats["overruns"] <= 2
+
+        # setHz takes effect right away
+        ticker.setHz(5)
+        before = len(ticker.ticks)
+        time.sleep(1.0)
+        assert 3 <= len(ticker.ticks) - before <= 7
+
+    def test_overrun (self):
+
+        ticker = self.add("slow", 10)
+        ticker.work = 0.25
+        time.sleep(1.0)
+        ticker.work = 0
+
+        stats = ticker.__get_loop_stats__()
+        assert stats["overruns"] >= 6
+        assert stats["maxDuration"] >= 0.25
+
+    def test_wakeup_cancel (self):
+
+        # only runs when woken
+        ticker = self.add("idle", 0)
+        time.sleep(0.1)
+        assert len(ticker.ticks) == 1
+
+        t0 = time.time()
+        ticker.wakeUp()
+        while len(ticker.ticks) < 2 and time.time() - t0 < 5:
+            time.sleep(0.001)
+        woken = ticker.ticks[-1] - t0
+        assert len(ticker.ticks) == 2
+
+        # stop doesn't wait for the next tick (10 s away)
+        slow = self.add("rare", 0.1)
+        t0 = time.time()
+        self.manager.stop("/Ticker/rare")
+        stopped = time.time() - t0
+
+        print
+        print "woken after %.2f ms, stopped after %.2f ms" % (woken * 1e3, stopped * 1e3)
+
+        assert woken < 1
+        assert stopped < 5
+        assert not self.manager.resources.get("/Ticker/rare").loop.isAlive()
+
+        # stopped and done loops don't run again (the first run may
+        # have been cancelled before a worker got to it)
+        ran = len(slow.ticks)
+        assert ran <= 1
+        slow.wakeUp()
+        time.sleep(0.05)
+        assert len(slow.ticks) == ran
+
+        done = self.add("once", 10)
+        done.times = 2
+        time.sleep(0.5)
+        assert len(done.ticks) == 2
+
+        broken = self.add("broken", 10, cls=Broken)
+        time.sleep(0.1)
+        assert not self.manager.resources.get("/Broken/broken").loop.isAlive()
+
+    def test_threads (self):
+
+        before = threading.activeCount()
+
+        tickers = [self.add("t%d" % i, 4) for i in range(30)]
+        time.sleep(1.0)
+
+        threads = threading.activeCount() - before
+        runs = sum([len(ticker.ticks) for ticker in tickers])
+
+        print
+        print "30 objects at 4 Hz: %d new threads (was 30), %d runs in 1 s" % (threads, runs)
+
+        assert threads <= 10
+        assert runs >= 30 * 4
+
+        t0 = time.time()
+        for i in range(30):
+            self.manager.stop("/Ticker/t%d" % i)
+        print "stopped all in %.1f ms" % ((time.time() - t0) * 1e3)
+
+        assert time.time() - t0 < 5
+
+    def test_cancel_queued (self):
+
+        # the only worker is stuck, the next loop waits queued for it
+        scheduler = LoopScheduler(maxWorkers=1)
+        try:
+            stuck = Blocker()
+            queued = Blocker()
+            queued.release.set()
+
+            scheduler.schedule(stuck, "stuck")
+            stuck.started.wait(1)
+            assert stuck.started.isSet()
+
+            loop = scheduler.schedule(queued, "queued")
+            time.sleep(0.05)
+            assert loop.running and queued.runs == 0
+
+            loop.cancel()
+            stuck.release.set()
+
+            loop.join(1)
+            assert not loop.isAlive()
+            time.sleep(0.05)
+            assert queued.runs == 0
+        finally:
+            stuck.release.set()
+            scheduler.stop()
@@ -3,11 +3,14 @@ from chimera.core.manager        import Manager
 from chimera.core.chimeraobject  import ChimeraObject
 from chimera.core.proxy          import Proxy
 from chimera.core.event          import event
+from chimera.core.eventsproxy    import OverflowPolicy, SubscriberQueue
 
 from nose.tools import assert_raises
 
+import threading
 import time
 import math
+import os
 
 class Publisher (ChimeraObject):
 
@@ -56,6 +59,79 @@ class Subscriber (ChimeraObject):
         return self.results
 
 
+def countSockets (port):
+    """
+    Count TCP sockets talking to the given port, by state (Linux only).
+    Returns (established, time_wait) or None if /proc is not available.
+    """
+
+    if not os.path.exists("/proc/net/tcp"):
+        return None
+
+    established = time_wait = 0
+
+    for line in open("/proc/net/tcp").readlines()[1:]:
+        fields = line.split()
+        local, remote, state = fields[1], fields[2], fields[3]
+
+        if int(local.split(":")[1], 16) != port and \
+           int(remote.split(":")[1], 16) != port:
+            continue
+
+        if state == "01":
+            established += 1
+        elif state == "06":
+            time_wait += 1
+
+    return (established, time_wait)
+
+
+class AsyncPublisher (ChimeraObject):
+
+    def __init__ (self):
+        ChimeraObject.__init__(self)
+        self.__events_proxy__.setAsync(size=5)
+        self.__events_proxy__.setPolicy("valueChange", OverflowPolicy.COALESCE_LATEST)
+
+    def foo (self):
+        self.fooDone(time.time())
+        return 42
+
+    def change (self, value):
+        self.valueChange(value)
+        return value
+
+    @event
+    def fooDone (self, when):
+        pass
+
+    @event
+    def valueChange (self, value):
+        pass
+
+
+class SlowSubscriber (Subscriber):
+
+    def fooDoneClbk (self, when):
+        time.sleep(0.1)
+        Subscriber.fooDoneClbk(self, when)
+
+    def valueChangeClbk (self, value):
+        time.sleep(0.1)
+        self.results.append(value)
+
+
+# GatedSubscriber handlers wait for it
+gate = threading.Event()
+
+
+class GatedSubscriber (Subscriber):
+
+    def fooDoneClbk (self, when):
+        gate.wait(10)
+        Subscriber.fooDoneClbk(self, when)
+
+
 class TestEvents (object):
 
     def setup (self):
@@ -97,6 +173,107 @@ class TestEvents (object):
         assert s.getCounter() == 2
         assert p.getCounter() == 2        
 
+    def test_connection_reuse (self):
+
+        assert self.manager.addClass (Publisher, "p") != False
+        assert self.manager.addClass (Subscriber, "s") != False
+
+        p = self.manager.getProxy("/Publisher/p")
+        s = self.manager.getProxy("/Subscriber/s")
+
+        p.fooDone += s.fooDoneClbk
+
+        for i in range (10):
+            assert p.foo() == 42
+
+        assert s.getCounter() == 10
+
+        # one persistent connection per subscriber, not one per event
+        pool = self.manager.resources.get("/Publisher/p").instance.__events_proxy__.pool
+        assert pool.opened == 2
+        assert len(pool) == 2
+
+        # unsubscribing releases the connection
+        p.fooDone -= s.fooDoneClbk
+        assert len(pool) == 1
+
+    def test_async_publish (self):
+
+        assert self.manager.addClass (AsyncPublisher, "p") != False
+        assert self.manager.addClass (GatedSubscriber, "slow") != False
+        assert self.manager.addClass (Subscriber, "s") != False
+
+        p = self.manager.getProxy("/AsyncPublisher/p")
+        slow = self.manager.getProxy("/GatedSubscriber/slow")
+        s = self.manager.getProxy("/Subscriber/s")
+
+        p.fooDone += slow.fooDoneClbk
+        p.fooDone += s.fooDoneClbk
+
+        # a stuck subscriber doesn't hold the publisher: all published
+        # while it hasn't handled any (a synchronous publish would
+        # wait 10 s on the gate for each)
+        gate.clear()
+        t0 = time.time()
+        for i in range (5):
+            assert p.foo() == 42
+        assert slow.getCounter() == 0
+        assert time.time() - t0 < 5
+
+        stats = p.__get_event_stats__()
+        assert sum([stat["depth"] for stat in stats.values()]) >= 4
+
+        gate.set()
+        time.sleep (1)
+        assert s.getCounter() == 5
+        assert slow.getCounter() == 5
+
+        stats = p.__get_event_stats__()
+        assert len(stats) == 2
+        for uri, stat in stats.items():
+            assert stat["delivered"] == 5
+            assert stat["depth"] == 0
+            assert stat["dropped"] == 0
+
+    def test_async_coalesce (self):
+
+        assert self.manager.addClass (AsyncPublisher, "p") != False
+        assert self.manager.addClass (SlowSubscriber, "slow") != False
+
+        p = self.manager.getProxy("/AsyncPublisher/p")
+        slow = self.manager.getProxy("/SlowSubscriber/slow")
+
+        p.valueChange += slow.valueChangeClbk
+
+        for i in range (10):
+            p.change(i)
+
+        time.sleep (0.5)
+
+        # intermediate values coalesced, but the latest always arrives
+        results = slow.getResults()
+        assert len(results) < 10
+        assert results[-1] == 9
+
+        stats = p.__get_event_stats__().values()[0]
+        assert stats["coalesced"] > 0
+        assert stats["dropped"] == 0
+
+    def test_coalesce_latency (self):
+
+        # not started, so nothing leaves the queue
+        queue = SubscriberQueue(None, "PYROLOC://127.0.0.1:0/s")
+
+        queue.put("valueChange", "clbk", (1,), {}, OverflowPolicy.COALESCE_LATEST)
+        first = queue._queue[0][4]
+        time.sleep(0.01)
+        queue.put("valueChange", "clbk", (2,), {}, OverflowPolicy.COALESCE_LATEST)
+
+        # the latest value, still counted as waiting since the first
+        assert len(queue._queue) == 1 and queue.coalesced == 1
+        topic, handler, args, kwargs, queued = queue._queue[0]
+        assert args == (2,) and queued == first
+
     def test_performance (self):
 
         assert self.manager.addClass (Publisher, "p") != False
@@ -112,6 +289,8 @@ class TestEvents (object):
 
         for check in range (1):
 
+            before = countSockets(self.manager.getPort())
+
             start = time.time()
             for i in range (100):
                 p.foo()
@@ -119,6 +298,8 @@ class TestEvents (object):
 
             time.sleep (5)
 
+            after = countSockets(self.manager.getPort())
+
             results = s.getResults()
 
             dt   = [ (t - t0)*1000 for t0, t in results]
@@ -133,4 +314,6 @@ class TestEvents (object):
             print "# max   : %-6.3f ms" % max(dt)        
             print "# mean  : %-6.3f ms" % mean
             print "# sigma : %-6.3f ms" % sigma
+            if before and after:
+                print "# sockets (established/time_wait): %d/%d -> %d/%d" % (before + after)
             print "#"*25
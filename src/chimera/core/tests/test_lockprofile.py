@@ -0,0 +1,154 @@
+
+import threading
+import time
+
+from chimera.core.manager       import Manager
+from chimera.core.chimeraobject import ChimeraObject
+from chimera.core.lock          import lock
+from chimera.core.lockprofile   import profiler, BUCKETS
+
+
+class Mount (ChimeraObject):
+
+    def __init__ (self):
+        ChimeraObject.__init__(self)
+        self.holding = threading.Event()
+
+    @lock
+    def slew (self, duration):
+        self.holding.set()
+        time.sleep(duration)
+        return self.getRa()
+
+    @lock
+    def getRa (self):
+        return 42
+
+    def poll (self):
+        self.acquire()
+        try:
+            self.holding.set()
+            time.sleep(0.1)
+        finally:
+            self.release()
+
+
+class TestLockProfile (object):
+
+    def setup (self):
+        profiler.reset()
+
+    def teardown (self):
+        profiler.disable()
+        profiler.reset()
+
+    def test_contention (self):
+
+        mount = Mount()
+        mount.__setlocation__("/Mount/m")
+
+        profiler.enable()
+
+        slew = threading.Thread(target=mount.slew, args=(0.3,))
+        slew.start()
+        mount.holding.wait(5)
+        assert mount.getRa() == 42
+        slew.join()
+
+        mount.holding.clear()
+        poll = threading.Thread(target=mount.poll)
+        poll.start()
+        mount.holding.wait(5)
+        mount.getRa()
+        poll.join()
+
+        profiler.disable()
+        mount.getRa()
+
+        stats = profiler.getStats()["/Mount/m"]
+
+        # the nested getRa from slew and both from us, not the last one
+        assert stats["getRa"]["calls"] == 3
+        assert stats["getRa"]["contended"] == 2
+        assert stats["slew"]["hold"] >= 0.3
+        assert stats["poll"]["hold"] >= 0.1
+        assert sum(stats["getRa"]["waitHist"]) == 3
+        assert stats["slew"]["holdHist"][BUCKETS.index("<1s")] == 1
+
+        times, waited = stats["getRa"]["blockedBy"]["slew"]
+        # blocked, but not for longer than slew held the lock
+        assert times == 1 and 0 < waited <= stats["slew"]["hold"]
+
+        top = profiler.topContenders(2)
+        assert [contender[:4] for contender in top] == [("/Mount/m", "getRa", "slew", 1),
+                                                       ("/Mount/m", "getRa", "poll", 1)]
+
+    def test_toggle (self):
+
+        mount = Mount()
+        holders = profiler._holders
+
+        # enabled while held: released as taken, nothing left behind
+        profiler.enable()
+        mount.acquire()
+        profiler.disable()
+        mount.release()
+        assert holders == {}
+
+        # a plain non-blocking acquire inside a profiled one doesn't
+        # end the outer hold
+        profiler.enable()
+        mount.acquire()
+        assert mount.acquire(False)
+        mount.release()
+        assert len(holders) == 1
+        mount.release()
+        assert holders == {}
+
+        # and the monitor is free
+        other = threading.Thread(target=mount.getRa)
+        other.start()
+        other.join(5)
+        assert not other.isAlive()
+
+    def test_overhead (self):
+
+        mount = Mount()
+        n = 20000
+
+        t0 = time.time()
+        for i in xrange(n):
+            mount.getRa()
+        disabled = (time.time() - t0) / n
+
+        profiler.enable()
+        t0 = time.time()
+        for i in xrange(n):
+            mount.getRa()
+        enabled = (time.time() - t0) / n
+        profiler.disable()
+
+        print
+        print "@lock call: %.2f us disabled, %.2f us profiled" % (disabled * 1e6, enabled * 1e6)
+
+        assert profiler.getStats()["Mount"]["getRa"]["calls"] == n
+
+    def test_remote (self):
+
+        manager = Manager()
+        try:
+            manager.addClass(Mount, "remote")
+            mount = manager.getProxy("/Mount/remote")
+            remote = manager.getProxy("/Manager/manager")
+
+            assert remote.setLockProfiling(True)
+            mount.getRa()
+            assert remote.getLockStats()["/Mount/remote"]["getRa"]["calls"] == 1
+            assert remote.getLockContenders() == []
+
+            assert remote.setLockProfiling(False)
+            assert remote.resetLockStats()
+            mount.getRa()
+            assert remote.getLockStats() == {}
+        finally:
+            manager.shutdown()
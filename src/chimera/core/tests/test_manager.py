@@ -1,7 +1,7 @@
 
 from chimera.core.manager        import Manager
 from chimera.core.chimeraobject  import ChimeraObject
-from chimera.core.proxy          import Proxy
+from chimera.core.proxy          import Proxy, ManagerProxy
 
 from nose.tools import assert_raises
 
@@ -22,6 +22,12 @@ class Simple (ChimeraObject):
     def answer (self):
         return 42
 
+    def lookup (self, location):
+        # twice, from the same thread
+        p1 = self.getManager().getProxy(location)
+        p2 = self.getManager().getProxy(location)
+        return (self.getManager() is self.getManager()) and (p1 is p2) and p1.answer()
+
 
 class NotValid (object): pass
              
@@ -118,6 +124,56 @@ class TestManager (object):
         # oops
         assert_raises (AttributeError, p.wrong)
 
+    def test_proxy_cache (self):
+
+        assert self.manager.addClass(Simple, "simple")
+
+        p1 = self.manager.getProxy ('/Simple/simple')
+        assert len(self.manager._proxyCache) == 1
+
+        p2 = self.manager.getProxy ('/Simple/simple')
+        assert p1.URI == p2.URI
+        assert len(self.manager._proxyCache) == 1
+
+        # index lookups are cached on their own
+        assert self.manager.getProxy ('/Simple/0').URI == p1.URI
+        assert len(self.manager._proxyCache) == 2
+
+        # lifecycle changes invalidate the cache
+        self.manager.stop('/Simple/simple')
+        assert len(self.manager._proxyCache) == 0
+
+        assert self.manager.getProxy ('/Simple/0').answer() == 42
+        assert self.manager.remove ('/Simple/simple') == True
+        assert_raises(ObjectNotFoundException, self.manager.getProxy, '/Simple/0')
+
+        # client side: one manager proxy per thread, reusing the proxies it returned
+        assert self.manager.addClass(Simple, "other")
+        assert self.manager.addClass(Simple, "simple")
+        p = self.manager.getProxy ('/Simple/other')
+        assert p.lookup('/Simple/simple') == 42
+
+        # and never returns proxies for objects removed since
+        client = ManagerProxy(uri=self.manager.getProxy('/Manager/manager').URI)
+        assert client.getProxy('/Simple/simple').answer() == 42
+        assert client.getProxy('/Simple/simple') is client.getProxy('/Simple/simple')
+
+        self.manager.remove('/Simple/simple')
+        assert_raises(ObjectNotFoundException, client.getProxy, '/Simple/simple')
+
+        # restarted, a fresh one
+        assert self.manager.addClass(Simple, "simple")
+        fresh = client.getProxy('/Simple/simple')
+        assert fresh.answer() == 42
+        self.manager.stop('/Simple/simple')
+        self.manager.start('/Simple/simple')
+        assert client.getProxy('/Simple/simple') is not fresh
+
+        # lazy and non-lazy lookups are cached apart
+        lazy = client.getProxy('/Simple/simple', lazy=True)
+        assert client.getProxy('/Simple/simple') is not lazy
+        assert client.getProxy('/Simple/simple', lazy=True) is lazy
+
     def test_manager (self):
 
         assert self.manager.addClass(Simple, "simple")
@@ -126,4 +182,5 @@ class TestManager (object):
         assert p
 
         m = p.getManager()
+        assert isinstance(m, ManagerProxy)
         assert m.GUID() == self.manager.GUID()
@@ -6,6 +6,8 @@ from nose.tools import assert_raises
 
 from types import StringType
 
+import time
+
 
 class TestResources:
 
@@ -118,3 +120,57 @@ class TestResources:
         
         assert (entries == found)
 
+
+    def test_creation_order (self):
+
+        assert self.res.add ("/Location/l1", "instance-1", "uri-1") == 0
+        assert self.res.add ("/Location/l2", "instance-2", "uri-2") == 1
+
+        assert self.res.get("/Location/0").location == "/Location/l1"
+
+        # Manager updates creation time when starting an object
+        self.res.get("/Location/l1").created = time.time() + 1
+
+        assert self.res.get("/Location/0").location == "/Location/l2"
+        assert [r.location for r in self.res.getByClass("Location")] == ["/Location/l2", "/Location/l1"]
+
+        assert self.res.remove("/Location/l2")
+        assert self.res.get("/Location/0").location == "/Location/l1"
+        assert self.res.getByClass("Location", checkBases=False) == [self.res.get("/Location/l1")]
+
+    def test_lookup_scaling (self):
+
+        class Base(object): pass
+        class A(Base): pass
+        class B(Base): pass
+
+        def lookups (n=2000):
+            t0 = time.time()
+            for i in range(n):
+                self.res.get("/B/0")
+                self.res.get("/B/b")
+                self.res.getByClass("B")
+                "/B/b" in self.res
+            return (time.time() - t0) / n
+
+        assert self.res.add ("/B/b", B(), "b-uri") == 0
+
+        for i in range(100):
+            self.res.add ("/A/a%d" % i, A(), "a-uri")
+        few = lookups()
+
+        for i in range(100, 5000):
+            self.res.add ("/A/a%d" % i, A(), "a-uri")
+        many = lookups()
+
+        print
+        print "#"*25
+        print "# 101 resources : %.3f us/lookup" % (few*1e6)
+        print "# 5001 resources: %.3f us/lookup" % (many*1e6)
+        print "#"*25
+
+        assert len(self.res.getByClass("Base")) == 5001
+        assert self.res.get("/Base/4999").location == "/A/a4998"
+
+        # lookups don't depend on how many objects are registered
+        assert many < few * 3
@@ -31,6 +31,9 @@ import time
 import sys
 import logging
 
+import ephem
+import numpy as np
+
 
 
 class TestSite (object):
@@ -125,3 +128,117 @@ class TestSite (object):
         except Exception, e:
             printException(e)
 
+
+class TestSiteArrays (object):
+
+    def setup (self):
+        self.site = Site()
+        self.site["latitude"] = "-27 36 13"
+        self.site["longitude"] = "-48 31 20"
+
+        rand = np.random.RandomState(0)
+        self.ra = rand.uniform(0, 360, 500)
+        self.dec = rand.uniform(-90, 90, 500)
+        self.mjd = 55000 + rand.uniform(0, 7000, 50)
+
+    def observer (self, date):
+        # what Site used to create on every call
+        site = ephem.Observer()
+        site.lat = self.site["latitude"].strfcoord('%(d)d:%(m)d:%(s).2f')
+        site.long = self.site["longitude"].strfcoord('%(d)d:%(m)d:%(s).2f')
+        site.elev = self.site['altitude']
+        site.date = date
+        site.epoch = '2000/1/1 00:00:00'
+        return site
+
+    def date (self, mjd):
+        return ephem.Date(mjd + 2400000.5 - 2415020.0).datetime()
+
+    def test_lst (self):
+
+        lst = self.site.LSTArray(self.mjd)
+        scalar = np.array([float(self.observer(self.date(mjd)).sidereal_time()) for mjd in self.mjd])
+
+        # seconds of time
+        diff = np.abs(np.angle(np.exp(1j * (lst - scalar)))) * 86400 / (2 * np.pi)
+        print
+        print "LSTArray: max difference %.3f s" % diff.max()
+        assert diff.max() < 0.1
+
+    def test_altaz (self):
+
+        lst = self.site.LSTArray(self.mjd[:5])
+        alt, az = self.site.raDecToAltAzArray(self.ra, self.dec, lst)
+
+        assert alt.shape == az.shape == (len(self.ra), 5)
+
+        t0 = time.time()
+        for j in range(5):
+            for i in range(len(self.ra)):
+                altAz = Position.raDecToAltAz(Position.fromRaDec(Coord.fromD(self.ra[i]), Coord.fromD(self.dec[i])),
+                                              self.site["latitude"], lst[j])
+                assert abs(altAz.alt.D - alt[i, j]) < 1e-6
+                # azimuth is meaningless at the zenith
+                if abs(altAz.alt.D) < 89.9:
+                    assert abs(np.angle(np.exp(1j * np.radians(altAz.az.D - az[i, j])))) < 1e-6
+        scalar = time.time() - t0
+
+        t0 = time.time()
+        self.site.raDecToAltAzArray(self.ra, self.dec, lst)
+        print
+        print "alt/az of %d targets x 5 times: %.4f s (%.3f s one by one)" % (len(self.ra), time.time() - t0, scalar)
+
+        # one time, one row
+        alt, az = self.site.raDecToAltAzArray(self.ra, self.dec, lst[0])
+        assert alt.shape == (len(self.ra),)
+
+    def test_moon_separation (self):
+
+        date = self.date(self.mjd[0])
+        sep = self.site.moonSeparationArray(self.ra, self.dec, date)
+
+        moon = ephem.Moon()
+        moon.compute(self.observer(date))
+
+        for i in range(0, len(self.ra), 10):
+            star = ephem.FixedBody()
+            star._ra, star._dec = np.radians(self.ra[i]), np.radians(self.dec[i])
+            star.compute(self.observer(date))
+            expected = np.degrees(float(ephem.separation((moon.a_ra, moon.a_dec), (star.a_ra, star.a_dec))))
+            assert abs(sep[i] - expected) < 1e-4
+
+    def test_events (self):
+
+        for mjd in self.mjd[:10]:
+            date = self.date(mjd)
+            site = self.observer(date)
+            assert abs(self.site._event("sun", False, date) - site.next_setting(ephem.Sun())) < 1 / 86400.
+            assert abs(self.site._event("moon", True, date) - site.next_rising(ephem.Moon())) < 1 / 86400.
+
+            site.elev = 0
+            site.horizon = '-18:00:00'
+            assert abs(self.site._event("sun", True, date, '-18:00:00') - site.next_rising(ephem.Sun())) < 1 / 86400.
+
+        # the rest of the night comes from the cache
+        start = self.date(self.mjd[0])
+        sunset = self.site._event("sun", False, start)
+
+        t0 = time.time()
+        for minutes in range(0, 600, 5):
+            date = start + relativedelta(minutes=minutes)
+            expected = self.observer(date).next_setting(ephem.Sun())
+            assert abs(self.site._event("sun", False, date) - expected) < 1 / 86400.
+        print
+        print "120 sunsets: %.4f s" % (time.time() - t0)
+
+        t0 = time.time()
+        for minutes in range(0, 600, 5):
+            self.site.sunset(start + relativedelta(minutes=minutes))
+        cached = time.time() - t0
+
+        t0 = time.time()
+        for minutes in range(0, 600, 5):
+            self.observer(start + relativedelta(minutes=minutes)).next_setting(ephem.Sun())
+        scalar = time.time() - t0
+
+        print "sunset x 120: %.4f s cached, %.4f s computing each one" % (cached, scalar)
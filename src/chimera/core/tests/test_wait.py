@@ -0,0 +1,119 @@
+
+import threading
+import time
+
+from chimera.core.wait import StateWaiter, WaitStatus, waitFor
+
+
+class Axis (object):
+
+    """
+    Something that arrives after duration seconds and tells waiter.
+    """
+
+    def __init__ (self, waiter, duration):
+        self.waiter = waiter
+        self.duration = duration
+        self.arrived = False
+        self.arrivedAt = None
+        self.reads = 0
+
+        self.start = time.time()
+        timer = threading.Timer(duration, self.arrive)
+        timer.setDaemon(True)
+        timer.start()
+
+    def arrive (self):
+        self.arrivedAt = time.time()
+        self.arrived = True
+        if self.waiter:
+            self.waiter.changed()
+
+    def isArrived (self):
+        self.reads += 1
+        return self.arrived
+
+    def eta (self):
+        return max(self.duration - (time.time() - self.start), 0)
+
+
+class TestWait (object):
+
+    def test_status (self):
+
+        waiter = StateWaiter()
+
+        result = waiter.wait(lambda: True)
+        assert result and result.status == WaitStatus.OK and result.checks == 1
+
+        # the last poll is cut short to the deadline, and checked
+        result = waiter.wait(lambda: False, timeout=0.2)
+        assert not result and result.status == WaitStatus.TIMEOUT
+        assert result.checks == 2
+        assert 0.2 <= result.elapsed < 5
+
+        # polls far apart: the abort has to wake us
+        waiter = StateWaiter(maxPoll=10)
+        abort = threading.Event()
+
+        def stop ():
+            abort.set()
+            waiter.changed()
+
+        threading.Timer(0.1, stop).start()
+
+        result = waiter.wait(lambda: False, timeout=30, abort=abort)
+        assert result.status == WaitStatus.ABORTED
+        assert result.checks == 1
+        assert result.elapsed < 5
+
+    def test_changed (self):
+
+        # polls far apart: only the change gets the second check in
+        waiter = StateWaiter(maxPoll=10)
+        axis = Axis(waiter, 0.1)
+
+        result = waiter.wait(axis.isArrived, timeout=30)
+        assert result and result.checks == 2 and axis.reads == 2
+        assert result.elapsed < 5
+
+    def test_latency (self):
+
+        duration = 1.23
+
+        # fixed 0.1 s polls (the old _waitSlew loop)
+        axis = Axis(None, duration)
+        while not axis.isArrived():
+            time.sleep(0.1)
+        fixed = time.time() - axis.arrivedAt
+        fixedReads = axis.reads
+
+        # fixed cadence, as slow as the slowest adaptive poll
+        axis = Axis(None, duration)
+        result = waitFor(axis.isArrived, timeout=5, minPoll=0.5, maxPoll=0.5)
+        slow = time.time() - axis.arrivedAt
+        assert result
+
+        # adaptive: polls follow the eta
+        axis = Axis(None, duration)
+        result = waitFor(axis.isArrived, timeout=5, eta=axis.eta, minPoll=0.02, maxPoll=0.5)
+        adaptive = time.time() - axis.arrivedAt
+        adaptiveReads = axis.reads
+        assert result
+
+        # woken by the change
+        waiter = StateWaiter(maxPoll=0.5)
+        axis = Axis(waiter, duration)
+        result = waiter.wait(axis.isArrived, timeout=5)
+        event = time.time() - axis.arrivedAt
+        eventReads = axis.reads
+        assert result
+
+        print
+        print "noticed after: fixed 0.1 s %.1f ms (%d reads), fixed 0.5 s %.1f ms," \
+            " adaptive %.1f ms (%d reads), event %.1f ms (%d reads)" % \
+            (fixed * 1e3, fixedReads, slow * 1e3, adaptive * 1e3, adaptiveReads,
+             event * 1e3, eventReads)
+
+        assert eventReads <= 4
+        assert adaptiveReads < fixedReads
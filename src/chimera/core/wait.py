@@ -0,0 +1,169 @@
+#! /usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+# chimera - observatory automation system
+# Copyright (C) 2006-2007  P. Henrique Silva <henrique@astro.ufsc.br>
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.
+
+import threading
+import time
+
+from collections import namedtuple
+
+from chimera.util.enum import Enum
+
+__all__ = ['StateWaiter', 'WaitStatus', 'WaitResult', 'waitFor']
+
+
+WaitStatus = Enum("OK", "ABORTED", "TIMEOUT")
+
+
+class WaitResult (namedtuple("WaitResult", "status elapsed latency checks")):
+
+    """
+    How a wait ended: status (L{WaitStatus}), elapsed seconds,
+    latency (seconds between the last check that found the condition
+    false and the one that found it true, so at most how late the
+    change was noticed) and the number of checks made.
+    """
+
+    __slots__ = ()
+
+    def __nonzero__(self):
+        return self.status == WaitStatus.OK
+
+
+class StateWaiter (object):
+
+    """
+    Wait for a condition on instrument state, with a deadline and an
+    abort event.
+
+    Whoever changes the state (an event handler, the telemetry
+    poller, abortSlew) calls changed() and waiting threads check the
+    condition again right away. Between changes the condition is
+    polled, at an interval that follows eta (a callable returning the
+    estimated seconds left, e.g. distance / slew speed): half of it,
+    kept between minPoll and maxPoll, so checks are frequent close to
+    the end and rare far from it.
+
+    >>> waiter = StateWaiter()
+    >>> result = waiter.wait(lambda: not self.isSlewing(), timeout=90, abort=self._abort)
+    >>> if result.status == WaitStatus.ABORTED: ...
+    """
+
+    def __init__(self, minPoll=0.01, maxPoll=1.0):
+        self.minPoll = minPoll
+        self.maxPoll = maxPoll
+
+        self._condition = threading.Condition(threading.Lock())
+        self._changes = 0
+
+    def changed(self):
+        """
+        Wake everybody waiting to check their conditions again.
+        """
+        self._condition.acquire()
+        try:
+            self._changes += 1
+            self._condition.notifyAll()
+        finally:
+            self._condition.release()
+
+    def wait(self, condition, timeout=None, abort=None, eta=None, minPoll=None, maxPoll=None):
+
+        minPoll = self.minPoll if minPoll is None else minPoll
+        maxPoll = self.maxPoll if maxPoll is None else maxPoll
+
+        start = time.time()
+        deadline = start + timeout if timeout is not None else None
+
+        checks = 0
+        lastCheck = start
+
+        while True:
+
+            if abort is not None and abort.isSet():
+                return WaitResult(WaitStatus.ABORTED, time.time() - start, 0.0, checks)
+
+            # changes counted before the check, so one that happens
+            # while we check isn't lost
+            self._condition.acquire()
+            try:
+                changes = self._changes
+            finally:
+                self._condition.release()
+
+            checked = time.time()
+            done = condition()
+            checks += 1
+
+            if done:
+                now = time.time()
+                latency = checked - lastCheck if checks > 1 else 0.0
+                return WaitResult(WaitStatus.OK, now - start, latency, checks)
+
+            lastCheck = checked
+
+            now = time.time()
+            if deadline is not None and now >= deadline:
+                return WaitResult(WaitStatus.TIMEOUT, now - start, 0.0, checks)
+
+            interval = maxPoll
+            if eta is not None:
+                interval = min(max(eta() / 2.0, minPoll), maxPoll)
+
+            if deadline is not None:
+                interval = min(interval, deadline - now)
+
+            self._sleep(changes, interval)
+
+    def _sleep(self, changes, interval):
+        """
+        Sleep for interval or until the next change. Condition.wait
+        with a timeout polls in steps of up to 50 ms, a timer waking
+        us keeps wake ups on changes immediate.
+        """
+        expired = []
+
+        def wake():
+            self._condition.acquire()
+            try:
+                expired.append(True)
+                self._condition.notifyAll()
+            finally:
+                self._condition.release()
+
+        timer = threading.Timer(interval, wake)
+        timer.setDaemon(True)
+        timer.start()
+
+        self._condition.acquire()
+        try:
+            while self._changes == changes and not expired:
+                self._condition.wait()
+        finally:
+            self._condition.release()
+            timer.cancel()
+
+
+def waitFor(condition, timeout=None, abort=None, eta=None, minPoll=0.01, maxPoll=1.0):
+    """
+    Poll condition (see L{StateWaiter}) when nobody will tell us about
+    changes.
+    """
+    return StateWaiter(minPoll, maxPoll).wait(condition, timeout, abort, eta)
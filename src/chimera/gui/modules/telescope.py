@@ -169,15 +169,15 @@ class TelescopeController:
         self.getTelescope().unpark()
 
     def isParked(self):
-        return self.getTelescope().isParked()
+        return self.getTelescope().getTelemetry().parked
 
     def getCurrentRaDec(self):
         telescope = self.getTelescope()
-        return telescope.getPositionRaDec()
+        return telescope.getTelemetry().raDec
 
     def getCurrentAltAz(self):
         telescope = self.getTelescope()
-        return telescope.getPositionAltAz()
+        return telescope.getTelemetry().altAz
 
     def getLocaltime(self):
         return self.getSite().localtime()
@@ -187,7 +187,7 @@ class TelescopeController:
 
     def isTracking(self):
         telescope = self.getTelescope()
-        return telescope.isTracking()
+        return telescope.getTelemetry().tracking
 
     def abortSlew(self):
         self.module.view.abortBeginUI()
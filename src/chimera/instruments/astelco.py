@@ -32,7 +32,7 @@ except ImportError:
 
 
 from chimera.instruments.telescope import TelescopeBase
-from chimera.interfaces.telescope import SlewRate, AlignMode, TelescopeStatus
+from chimera.interfaces.telescope import SlewRate, AlignMode, TelescopeStatus, Telemetry
 
 from chimera.util.coord import Coord
 from chimera.util.position import Position
@@ -264,16 +264,11 @@ class Astelco (TelescopeBase):  # converted to Astelco
         self.setTargetRaDec(position.ra, position.dec)
         self.log.debug('Done')
         
-        status = TelescopeStatus.OK
-
+        # _waitSlew sends slewComplete
         try:
-            status = self._slewToRaDec()
-            #return True
+            return self._slewToRaDec()
         finally:
             self._slewing = False
-            self.slewComplete(self.getPositionRaDec(), status)
-
-        return status
 
     def _slewToRaDec(self):  # converted to Astelco
         self._slewing = True
@@ -305,10 +300,10 @@ class Astelco (TelescopeBase):  # converted to Astelco
 
         try:
             self.setAlignMode(AlignMode.ALT_AZ)
+            # _waitSlew sends slewComplete
             status = self._slewToAltAz()
-            #return True
         finally:
-            self.slewComplete(self.getPositionRaDec(), status)
+            self._slewing = False
             self.setAlignMode(lastAlignMode)
 
         return status
@@ -328,23 +323,35 @@ class Astelco (TelescopeBase):  # converted to Astelco
 
     def _waitSlew(self, start_time, target, local=False, slew_time=-1):  # converted to Astelco
         self.slewBegin(target)
-        
+
+        # one slewComplete and _slewing cleared, however we leave
+        status = TelescopeStatus.ERROR
+        try:
+            status = self._trackTarget(target, start_time, slew_time)
+        finally:
+            self._slewing = False
+            self.slewComplete(self.getPositionRaDec(), status)
+
+        return status
+
+    def _trackTarget(self, target, start_time, slew_time):
+
         # Set offset to zero
         
         self.log.debug('SEND: POINTING.TRACK 2')
-        cmdid = self._tpl.set('POINTING.TRACK',2,wait=True)
+        cmdid = self._tpl.set('POINTING.TRACK',2)
+        cmd = self._tpl.command(cmdid)
+        cmd.waitAck(self["timeout"])
         self.log.debug('PASSED')
         
-        err = not self._tpl.succeeded(cmdid)
+        err = bool(cmd.errors)
 
         if err:
             # check error message
-            msg = self._tpl.commands_sent[cmdid]['received']
+            msg = cmd.received
             self.log.error('Error pointing to %s'%target)
             for line in msg:
-                self.log.error(line[:-1])
-            self.slewComplete(self.getPositionRaDec(),
-                              TelescopeStatus.ERROR)
+                self.log.error(line)
 
             return TelescopeStatus.ERROR
     
@@ -354,12 +361,10 @@ class Astelco (TelescopeBase):  # converted to Astelco
         
         if not status == TelescopeStatus.OK:
             self.log.warning('Pointing operations failed with status: %s...'%status)
-            self.slewComplete(self.getPositionRaDec(),
-                              status)
             return status
         
         self.log.debug('SEND: POINTING.TRACK 1')
-        cmdid = self._tpl.set('POINTING.TRACK', 1, wait=True)
+        cmdid = self._tpl.set('POINTING.TRACK', 1)
         self.log.debug('PASSED')
         
         self.log.debug('Wait cmd complete...')
@@ -375,27 +380,31 @@ class Astelco (TelescopeBase):  # converted to Astelco
         if op_time < 0:
             op_time = self["max_slew_time"]+1
         
-        while not self._tpl.finished(cmdid):
+        # the server finishes the command when the motion ends (or is
+        # stopped), wait wakes up right then instead of at the next poll
+        while not self._tpl.wait(cmdid, self["slew_idle_time"]):
 
+            # abortSlew already stopped the mount
             if self._abort.isSet():
-                self._slewing = False
-                self.abortSlew()
-                self.slewComplete(self.getPositionRaDec(),
-                                  TelescopeStatus.ABORTED)
                 return TelescopeStatus.ABORTED
 
             # check timeout
             if time.time() >= (start_time + self["max_slew_time"]):
                 self.abortSlew()
-                self._slewing = False
                 self.log.error('Slew aborted. Max slew time reached.')
                 raise AstelcoException("Slew aborted. Max slew time reached.")
 
             if time.time() >= (start_time + op_time):
                 self.log.warning('Estimated slewtime has passed...')
                 op_time+=op_time
-            
-            time.sleep(self["slew_idle_time"])
+
+        if self._abort.isSet():
+            return TelescopeStatus.ABORTED
+
+        if not self._tpl.succeeded(cmdid):
+            for line in self._tpl.command(cmdid).errors:
+                self.log.error(line)
+            return TelescopeStatus.ERROR
 
         return TelescopeStatus.OK
 
@@ -405,7 +414,9 @@ class Astelco (TelescopeBase):  # converted to Astelco
 
         self._abort.set()
 
-        self.stopMoveAll()
+        # straight to the connection, stopMoveAll would wait for the
+        # slew to release the instrument lock
+        self._tpl.set('TELESCOPE.STOP', 1, wait=True)
 
         time.sleep(self["stabilization_time"])
 
@@ -416,10 +427,9 @@ class Astelco (TelescopeBase):  # converted to Astelco
             return self._slewing
         # if not, need to check if a external command did that...
         
-        self.log.debug('GET TELESCOPE.MOTION_STATE')
-        mstate = self._tpl.getobject('TELESCOPE.MOTION_STATE')
-        self.log.debug('GET POINTING.TRACK')
-        ptrack = self._tpl.getobject('POINTING.TRACK')
+        self.log.debug('GET TELESCOPE.MOTION_STATE;POINTING.TRACK')
+        mstate, ptrack = self._tpl.getobjects('TELESCOPE.MOTION_STATE',
+                                              'POINTING.TRACK')
         self.log.debug('Done')
         
         self._slewing = (int(mstate) != 0) and (int(ptrack) != 1)
@@ -581,26 +591,53 @@ class Astelco (TelescopeBase):  # converted to Astelco
     def getRa(self):  # converted to Astelco
 
         ret = self._tpl.getobject('POSITION.EQUATORIAL.RA_J2000')
+        return self._setRa(ret)
+
+    def _setRa(self, ret):
         if ret:
-			self._ra = Coord.fromH(ret)
+            self._ra = Coord.fromH(ret)
         self.log.debug('Ra: %9.5f'%float(ret))
         return self._ra
 
     @lock
     def getDec(self):  # converted to Astelco
         ret = self._tpl.getobject('POSITION.EQUATORIAL.DEC_J2000')
+        return self._setDec(ret)
+
+    def _setDec(self, ret):
         if ret:
-			self._dec = Coord.fromD(ret)
+            self._dec = Coord.fromD(ret)
         self.log.debug('Dec: %9.5f'%float(ret))
         return self._dec
 
     @lock
-    def getPositionRaDec(self):  # no need to convert to Astelco
-        return Position.fromRaDec(self.getRa(), self.getDec())
+    def getPositionRaDec(self):  # converted to Astelco
+        # both in one round trip
+        ra, dec = self._tpl.getobjects('POSITION.EQUATORIAL.RA_J2000',
+                                       'POSITION.EQUATORIAL.DEC_J2000')
+        return Position.fromRaDec(self._setRa(ra), self._setDec(dec))
 
     @lock
-    def getPositionAltAz(self):  # no need to convert to Astelco
-        return Position.fromAltAz(self.getAlt(), self.getAz())
+    def getPositionAltAz(self):  # converted to Astelco
+        alt, az = self._tpl.getobjects('POSITION.HORIZONTAL.ALT',
+                                       'POSITION.HORIZONTAL.AZ')
+        return Position.fromAltAz(self._setAlt(alt), self._setAz(az))
+
+    def _readTelemetry(self):
+        # everything in one GET
+        timestamp = time.time()
+
+        ra, dec, alt, az, track, ready, mstate = self._tpl.getobjects(
+            'POSITION.EQUATORIAL.RA_J2000', 'POSITION.EQUATORIAL.DEC_J2000',
+            'POSITION.HORIZONTAL.ALT', 'POSITION.HORIZONTAL.AZ',
+            'POINTING.TRACK', 'TELESCOPE.READY_STATE', 'TELESCOPE.MOTION_STATE')
+
+        self._parked = ready == 0
+        slewing = self._slewing or (int(mstate) != 0 and int(track) != 1)
+
+        return Telemetry(Position.fromRaDec(self._setRa(ra), self._setDec(dec)),
+                         Position.fromAltAz(self._setAlt(alt), self._setAz(az)),
+                         bool(track), self._parked, slewing, timestamp)
 
     @lock
     def getTargetRaDec(self):  # no need to convert to Astelco
@@ -667,10 +704,13 @@ class Astelco (TelescopeBase):  # converted to Astelco
     @lock
     def getAz(self):  # converted to Astelco
         ret = self._tpl.getobject('POSITION.HORIZONTAL.AZ')
+        return self._setAz(ret)
+
+    def _setAz(self, ret):
         if ret:
-			self._az = Coord.fromD(ret)
+            self._az = Coord.fromD(ret)
         self.log.debug('Az: %9.5f'%float(ret))
-		
+
         c = self._az #Coord.fromD(ret)
 
         if self['azimuth180Correct']:
@@ -684,10 +724,13 @@ class Astelco (TelescopeBase):  # converted to Astelco
     @lock
     def getAlt(self):  # converted to Astelco
         ret = self._tpl.getobject('POSITION.HORIZONTAL.ALT')
+        return self._setAlt(ret)
+
+    def _setAlt(self, ret):
         if ret:
-			self._alt = Coord.fromD(ret)
+            self._alt = Coord.fromD(ret)
         self.log.debug('Alt: %9.5f'%float(ret))
-		
+
         return self._alt
 
     def getTargetAlt(self):  # no need to convert to Astelco
@@ -899,12 +942,12 @@ class Astelco (TelescopeBase):  # converted to Astelco
         return True
 
     def isParked(self):  # (yes) -no- need to convert to Astelco
-		self._parked = self._tpl.getobject('TELESCOPE.READY_STATE') == 0
-		return self._parked
+        self._parked = self._tpl.getobject('TELESCOPE.READY_STATE') == 0
+        return self._parked
 
     def isOpen(self):  # (yes) -no- need to convert to Astelco
-		self._open = self._tpl.getobject('AUXILIARY.COVER.REALPOS') == 1
-		return self._open
+        self._open = self._tpl.getobject('AUXILIARY.COVER.REALPOS') == 1
+        return self._open
 
     @lock
     def park(self):  # converted to Astelco
@@ -917,17 +960,10 @@ class Astelco (TelescopeBase):  # converted to Astelco
         site = self.getManager().getProxy("/Site/0")
         #self.slewToRaDec(Position.fromRaDec(str(self.getLocalSiderealTime()),
 #                                            site["latitude"]))
-        cmdid = self._tpl.set('TELESCOPE.READY', 0, wait=True)
-
-        ready_state = self._tpl.getobject('TELESCOPE.READY_STATE')
-        while ready_state > 0.0:
-            self.log.debug("Powering down Astelco: %s"%(ready_state))
-            old_ready_state = ready_state
-            ready_state = self._tpl.getobject('TELESCOPE.READY_STATE')
-            if ready_state != old_ready_state:
-                self.log.debug("Powering down Astelco: %s"%(ready_state))
-                old_ready_state = ready_state
-            time.sleep(5.0)
+        cmdid = self._tpl.set('TELESCOPE.READY', 0)
+
+        self._waitState(cmdid, 'TELESCOPE.READY_STATE',
+                        lambda state: state <= 0.0, "Powering down Astelco")
 
         # 2. stop tracking
         #self.stopTracking ()
@@ -946,19 +982,12 @@ class Astelco (TelescopeBase):  # converted to Astelco
             return True
         # 1. power on
         #self.powerOn ()
-        cmdid = self._tpl.set('TELESCOPE.READY', 1, wait=True)
+        cmdid = self._tpl.set('TELESCOPE.READY', 1)
 
         # 2. start tracking
         #self.startTracking()
-        ready_state = 0.0
-        while ready_state < 1.0:
-            self.log.debug("Powering up Astelco: %s"%(ready_state))
-            old_ready_state = ready_state
-            ready_state = self._tpl.getobject('TELESCOPE.READY_STATE')
-            if ready_state != old_ready_state:
-                self.log.debug("Powering up Astelco: %s"%(ready_state))
-                old_ready_state = ready_state
-            time.sleep(5.0)
+        self._waitState(cmdid, 'TELESCOPE.READY_STATE',
+                        lambda state: state >= 1.0, "Powering up Astelco")
 
         # 3. set location, date and time
         self._initTelescope()
@@ -979,46 +1008,47 @@ class Astelco (TelescopeBase):  # converted to Astelco
 
     @lock
     def openCover(self):
-		if self.isOpen():
-			return True
-
-		cmdid = self._tpl.set('AUXILIARY.COVER.TARGETPOS', 1, wait=True)
+        if self.isOpen():
+            return True
 
-		self.log.debug('Opening telescope cover...')
+        cmdid = self._tpl.set('AUXILIARY.COVER.TARGETPOS', 1)
 
-		ready_state = 0.0
-		while ready_state < 1.0:
-			self.log.debug("Opening telescope cover: %s"%(ready_state))
-			#old_ready_state = ready_state
-			ready_state = self._tpl.getobject('AUXILIARY.COVER.REALPOS')
-			#if ready_state != old_ready_state:
-			#    self.log.debug("Powering up Astelco: %s"%(ready_state))
-			#    old_ready_state = ready_state
-			time.sleep(5.0)
+        self.log.debug('Opening telescope cover...')
 
+        self._waitState(cmdid, 'AUXILIARY.COVER.REALPOS',
+                        lambda state: state >= 1.0, "Opening telescope cover")
 
-		return self._tpl.succeeded(cmdid)
+        return self._tpl.succeeded(cmdid)
 
     @lock
     def closeCover(self):
-		if not self.isOpen():
-			return True
-			
-		self.log.debug('Closing telescope cover...')
+        if not self.isOpen():
+            return True
+
+        self.log.debug('Closing telescope cover...')
 
-		cmdid = self._tpl.set('AUXILIARY.COVER.TARGETPOS', 0, wait=True)
+        cmdid = self._tpl.set('AUXILIARY.COVER.TARGETPOS', 0)
 
-		ready_state = 1.0
-		while ready_state > 0.0:
-			self.log.debug("Closing telescope cover: %s"%(ready_state))
-			#old_ready_state = ready_state
-			ready_state = self._tpl.getobject('AUXILIARY.COVER.REALPOS')
-			#if ready_state != old_ready_state:
-			#    self.log.debug("Powering up Astelco: %s"%(ready_state))
-			#    old_ready_state = ready_state
-			time.sleep(5.0)
+        self._waitState(cmdid, 'AUXILIARY.COVER.REALPOS',
+                        lambda state: state <= 0.0, "Closing telescope cover")
+
+        return True #self._tpl.succeeded(cmdid)
+
+    def _waitState(self, cmdid, object, reached, what):
+        """
+        Wait for the SET cmdid to finish (the server finishes it when
+        the move is done) and for object to reach the new state.
+        """
+        self._tpl.wait(cmdid, self["max_slew_time"])
+
+        state = self._tpl.getobject(object)
+        while not reached(state):
+            # finished early (or no answer yet), check again
+            self.log.debug("%s: %s" % (what, state))
+            time.sleep(self["slew_idle_time"])
+            state = self._tpl.getobject(object)
 
-		return True #self._tpl.succeeded(cmdid)
+        return state
 
     # low-level
     def _debug(self, msg):  # no need to convert to Astelco
@@ -1071,11 +1101,12 @@ class Astelco (TelescopeBase):  # converted to Astelco
         return self._tpl.getobject(object)
 
     def set(self, object, value, wait=False, binary=False):
-        return self._tpl.set(object, value, wait=False, binary=False)
+        return self._tpl.set(object, value, wait=wait, binary=binary)
 
     def getcommands_sent(self):
-        return self._tpl.commands_sent
+        return dict([(cmdid, {'command': cmd.command, 'received': list(cmd.received)})
+                     for cmdid, cmd in self._tpl.commands_sent.items()])
 
     def getlog(self):
-        return self._tpl.log
+        return list(self._tpl.log)
 
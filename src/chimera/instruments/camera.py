@@ -23,22 +23,73 @@
 import threading
 import time
 import os
+import copy
+import Queue
 import datetime as dt
 from math import pi
 
 from chimera.core.chimeraobject import ChimeraObject
 from chimera.interfaces.camera import (CameraExpose, CameraTemperature,
-                                       CameraInformation,
+                                       CameraInformation, CameraStatus,
                                        InvalidReadoutMode, Shutter)
 
 from chimera.controllers.imageserver.imagerequest import ImageRequest
 from chimera.controllers.imageserver.util import getImageServer
 
 from chimera.core.lock import lock
+from chimera.core.wait import StateWaiter
 
 from chimera.util.image import Image, ImageUtil
 
 
+class FrameWriter (threading.Thread):
+
+    """
+    Background stage of a pipelined expose: saves and registers frames,
+    in order, while the camera is already taking the next one. The
+    queue is bounded, so a slow disk ends up holding the camera back
+    instead of piling frames up in memory.
+    """
+
+    def __init__(self, camera, size):
+        threading.Thread.__init__(self, name="frame writer")
+        self.setDaemon(True)
+
+        self.camera = camera
+        self.queue = Queue.Queue(size)
+        self.images = []
+
+    def put(self, imageRequest, imageData, headers):
+        self.queue.put((imageRequest, imageData, headers))
+
+    def pending(self):
+        return self.queue.qsize()
+
+    def finish(self):
+        """
+        Wait for all queued frames to be saved and return their proxies.
+        """
+        self.queue.put(None)
+        self.join()
+        return self.images
+
+    def run(self):
+
+        while True:
+            item = self.queue.get()
+
+            if item is None:
+                return
+
+            try:
+                proxy = self.camera._writeImage(*item)
+                if proxy is not None:
+                    self.images.append(proxy)
+            except Exception:
+                self.camera.log.exception("Unable to save frame.")
+                self.camera.imageSaved(None, CameraStatus.ERROR)
+
+
 class CameraBase (ChimeraObject,
                   CameraExpose, CameraTemperature, CameraInformation):
 
@@ -50,6 +101,22 @@ class CameraBase (ChimeraObject,
 
         self.__isExposing = threading.Event()
 
+        # exposures ending and aborts, see abortExposure
+        self._waiter = StateWaiter()
+
+        self.__writer = None
+        # last frame read out, waiting for its post-exposure headers
+        self.__frame = None
+
+        # metadata source times of the current/last request
+        self.__metadataTimes = {}
+
+        # duty cycle of the current/last expose
+        self.__frames = 0
+        self.__shutterOpen = 0.0
+        self.__exposeStart = None
+        self.__exposeEnd = None
+
     def __stop__(self):
         self.abortExposure(readout=False)
 
@@ -62,6 +129,7 @@ class CameraBase (ChimeraObject,
             return self._baseExpose(request, **kwargs)
         finally:
             self.__isExposing.clear()
+            self._waiter.changed()
 
     def _baseExpose(self, request, **kwargs):
 
@@ -105,30 +173,70 @@ class CameraBase (ChimeraObject,
         images = []
         manager = self.getManager()
 
-        for frame_num in range(frames):
+        # filled by the request as each frame collects its headers
+        self.__metadataTimes = imageRequest.metadataTimes
+
+        # pipelined: readout goes to a writer thread and we start the
+        # next exposure right away
+        writer = None
+        if imageRequest["pipeline"] and frames > 1:
+            writer = FrameWriter(self, self["writer_queue_size"])
+            writer.start()
 
-            # [ABORT POINT]
-            if self.abort.isSet():
-                return tuple(images)
+        self.__writer = writer
 
-            imageRequest.beginExposure(manager)
-            self._expose(imageRequest)
+        self.__frames = 0
+        self.__shutterOpen = 0.0
+        self.__exposeStart = time.time()
+        self.__exposeEnd = None
 
-            # [ABORT POINT]
-            if self.abort.isSet():
-                return tuple(images)
+        try:
+            for frame_num in range(frames):
+
+                # [ABORT POINT]
+                if self.abort.isSet():
+                    break
+
+                imageRequest.beginExposure(manager)
+                self._expose(imageRequest)
+
+                # [ABORT POINT]
+                if self.abort.isSet():
+                    break
+
+                self.__frames += 1
+                self.__shutterOpen += imageRequest["exptime"]
 
-            image = self._readout(imageRequest)
-            if image is not None:
-                images.append(image)
-                imageRequest.endExposure(manager)
+                image = self._readout(imageRequest)
+                if image is not None:
+                    images.append(image)
 
-            # [ABORT POINT]
-            if self.abort.isSet():
-                return tuple(images)
+                if image is not None or writer is not None:
+                    imageRequest.endExposure(manager)
+
+                # the request keeps changing while we take the next
+                # frame, so the writer gets a copy, headers and all
+                if self.__frame is not None:
+                    imageData, headers = self.__frame
+                    self.__frame = None
+
+                    request = copy.copy(imageRequest)
+                    request.headers = list(imageRequest.headers)
+                    writer.put(request, imageData, headers)
+
+                # [ABORT POINT]
+                if self.abort.isSet():
+                    break
+
+                if (interval > 0 and frame_num < frames) and (not frames == 1):
+                    self._waiter.wait(self.abort.isSet, timeout=interval)
+        finally:
+            # frames already read out are saved, even if aborted
+            if writer is not None:
+                images += writer.finish()
+                self.__writer = None
 
-            if (interval > 0 and frame_num < frames) and (not frames == 1):
-                time.sleep(interval)
+            self.__exposeEnd = time.time()
 
         return tuple(images)
 
@@ -139,10 +247,10 @@ class CameraBase (ChimeraObject,
 
         # set our event, so current exposure know that it must abort
         self.abort.set()
+        self._waiter.changed()
 
         # then wait
-        while self.isExposing():
-            time.sleep(0.1)
+        self._waiter.wait(lambda: not self.isExposing())
 
         return True
 
@@ -164,50 +272,62 @@ class CameraBase (ChimeraObject,
         CRPIX1 = ((int(full_width / 2.0)) - left) - 1
         CRPIX2 = ((int(full_height / 2.0)) - top) - 1
 
-        t0 = time.time()
-        img = Image.create(imageData, imageRequest)
+        headers = [('DATE-OBS',
+                    ImageUtil.formatDate(
+                        extra.get("frame_start_time", dt.datetime.utcnow())),
+                    'Date exposure started'),
 
-        img += [('DATE-OBS',
-                 ImageUtil.formatDate(
-                     extra.get("frame_start_time", dt.datetime.utcnow())),
-                 'Date exposure started'),
+                   ('CCD-TEMP', extra.get("frame_temperature", -275.0),
+                    'CCD Temperature at Exposure Start [deg. C]'),
 
-                ('CCD-TEMP', extra.get("frame_temperature", -275.0),
-                 'CCD Temperature at Exposure Start [deg. C]'),
+                   ("EXPTIME", float(imageRequest['exptime']) or -1,
+                    "exposure time in seconds"),
 
-                ("EXPTIME", float(imageRequest['exptime']) or -1,
-                 "exposure time in seconds"),
+                   ('IMAGETYP', imageRequest['type'].strip(),
+                    'Image type'),
 
-                ('IMAGETYP', imageRequest['type'].strip(),
-                 'Image type'),
+                   ('SHUTTER', str(imageRequest['shutter']),
+                    'Requested shutter state'),
 
-                ('SHUTTER', str(imageRequest['shutter']),
-                 'Requested shutter state'),
+                   ("CRPIX1", CRPIX1, "coordinate system reference pixel"),
+                   ("CRPIX2", CRPIX2, "coordinate system reference pixel"),
+                   ("CD1_1", scale_x, "transformation matrix element (1,1)"),
+                   ("CD1_2", 0.0, "transformation matrix element (1,2)"),
+                   ("CD2_1", 0.0, "transformation matrix element (2,1)"),
+                   ("CD2_2", scale_y, "transformation matrix element (2,2)"),
 
-                ("CRPIX1", CRPIX1, "coordinate system reference pixel"),
-                ("CRPIX2", CRPIX2, "coordinate system reference pixel"),
-                ("CD1_1", scale_x, "transformation matrix element (1,1)"),
-                ("CD1_2", 0.0, "transformation matrix element (1,2)"),
-                ("CD2_1", 0.0, "transformation matrix element (2,1)"),
-                ("CD2_2", scale_y, "transformation matrix element (2,2)"),
+                   ('CAMERA', str(self['camera_model']), 'Camera Model'),
+                   ('CCD',    str(self['ccd_model']), 'CCD Model'),
+                   ('CCD_DIMX', self.getPhysicalSize()
+                    [0], 'CCD X Dimension Size'),
+                   ('CCD_DIMY', self.getPhysicalSize()
+                    [1], 'CCD Y Dimension Size'),
+                   ('CCDPXSZX', self.getPixelSize()[0],
+                    'CCD X Pixel Size [micrometer]'),
+                   ('CCDPXSZY', self.getPixelSize()[1],
+                    'CCD Y Pixel Size [micrometer]')]
 
-                ('CAMERA', str(self['camera_model']), 'Camera Model'),
-                ('CCD',    str(self['ccd_model']), 'CCD Model'),
-                ('CCD_DIMX', self.getPhysicalSize()
-                 [0], 'CCD X Dimension Size'),
-                ('CCD_DIMY', self.getPhysicalSize()
-                 [1], 'CCD Y Dimension Size'),
-                ('CCDPXSZX', self.getPixelSize()[0],
-                 'CCD X Pixel Size [micrometer]'),
-                ('CCDPXSZY', self.getPixelSize()[1],
-                 'CCD Y Pixel Size [micrometer]')]
+        if self.__writer is not None:
+            # queued once endExposure has added its headers
+            self.__frame = (imageData, headers)
+            return None
+
+        return self._writeImage(imageRequest, imageData, headers)
+
+    def _writeImage(self, imageRequest, imageData, headers):
+
+        # all headers go in at once, so the file is written only once
+        img = Image.create(imageData, imageRequest, headers=headers)
 
         # register image on ImageServer
         server = getImageServer(self.getManager())
         proxy = server.register(img)
 
-        # and finally compress the image
-        img.compress(multiprocess=True)
+        # and finally compress the image (on ImageServer's workers)
+        if imageRequest["compress"]:
+            server.compress(img.GUID(), imageRequest["compress_format"])
+
+        self.imageSaved(proxy, CameraStatus.OK)
 
         return proxy
 
@@ -280,6 +400,24 @@ class CameraBase (ChimeraObject,
     def isExposing(self):
         return self.__isExposing.isSet()
 
+    def getMetadataTimes(self):
+        return dict(self.__metadataTimes)
+
+    def getExposureStats(self):
+
+        if self.__exposeStart is None:
+            wallTime = 0.0
+        else:
+            wallTime = (self.__exposeEnd or time.time()) - self.__exposeStart
+
+        writer = self.__writer
+
+        return {"frames": self.__frames,
+                "shutterOpen": self.__shutterOpen,
+                "wallTime": wallTime,
+                "dutyCycle": wallTime and self.__shutterOpen / wallTime,
+                "pending": writer and writer.pending() or 0}
+
     @lock
     def startCooling(self, tempC):
         raise NotImplementedError()
@@ -158,13 +158,17 @@ class DomeBase(ChimeraObject, DomeSlew, DomeSlit, DomeLights, DomeSync):
                 if not self._tel:
                     return True
 
+            # a flag, no hardware reads (and no waiting for the next
+            # telemetry snapshot to notice a slew)
             if self._tel.isSlewing():
                 self.log.debug(
                     "[control] telescope slewing... not checking az.")
                 self._waitAfterSlew.set()
                 return True
 
-            self._telescopeChanged(self._tel.getAz())
+            # the telescope's telemetry snapshot, not another read of
+            # its hardware
+            self._telescopeChanged(self._tel.getTelemetry().altAz.az)
             # flag all waiting threads that the control loop already checked the new telescope position
             # probably adding new azimuth to the queue
             self._waitAfterSlew.clear()
@@ -194,7 +198,7 @@ class DomeBase(ChimeraObject, DomeSlew, DomeSlit, DomeLights, DomeSync):
     def _processQueue(self):
 
         if self._waitAfterSlew.isSet():
-            self._telescopeChanged(self._tel.getAz())
+            self._telescopeChanged(self._tel.getTelemetry().altAz.az)
 
         if self.queue.empty():
             return
@@ -247,7 +251,7 @@ class DomeBase(ChimeraObject, DomeSlew, DomeSlit, DomeLights, DomeSync):
 
     @lock
     def isSyncWithTel(self):
-        return self._needToMove(self._tel.getAz())
+        return self._needToMove(self._tel.getTelemetry().altAz.az)
 
     def getMode(self):
         return self._mode
@@ -106,16 +106,11 @@ class FakeCamera (CameraBase, FilterWheelBase):
 
         status = CameraStatus.OK
 
-        t = 0
         self.__lastFrameStart = dt.datetime.utcnow()
-        while t < imageRequest["exptime"]:
-            # [ABORT POINT]
-            if self.abort.isSet():
-                status = CameraStatus.ABORTED
-                break
-
-            time.sleep(0.1)
-            t += 0.1
+
+        # [ABORT POINT] abortExposure wakes us
+        if self._waiter.wait(self.abort.isSet, timeout=imageRequest["exptime"]):
+            status = CameraStatus.ABORTED
 
         self.exposeComplete(imageRequest, status)
 
@@ -20,6 +20,7 @@
 # 02110-1301, USA.
 
 from chimera.core.lock import lock
+from chimera.core.wait import StateWaiter
 from chimera.util.coord import Coord
 
 from chimera.interfaces.dome import InvalidDomePositionException, DomeStatus
@@ -38,6 +39,7 @@ class FakeDome (DomeBase):
         self._slewing = False
         self._slitOpen = False
         self._abort = threading.Event()
+        self._waiter = StateWaiter()
         self._maxSlewTime = 5 / 180.0
 
     def __start__(self):
@@ -80,16 +82,18 @@ class FakeDome (DomeBase):
                 status = DomeStatus.ABORTED
                 break
 
-            time.sleep(0.1)
+            # abortSlew wakes us
+            self._waiter.wait(self._abort.isSet, timeout=0.1)
             t += 0.1
 
         if status == DomeStatus.OK:
             self._position = az  # move :)
         else:
             # assume half movement in case of abort
-            self._position = self.position + distance / 2.0
+            self._position = self._position + distance / 2.0
 
         self._slewing = False
+        self._waiter.changed()
         self.slewComplete(self.getAz(), status)
 
     def isSlewing(self):
@@ -100,8 +104,8 @@ class FakeDome (DomeBase):
             return
 
         self._abort.set()
-        while self.isSlewing():
-            time.sleep(0.1)
+        self._waiter.changed()
+        self._waiter.wait(lambda: not self.isSlewing())
 
     @lock
     def getAz(self):
@@ -19,7 +19,6 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
 # 02110-1301, USA.
 
-import time
 import threading
 
 from chimera.interfaces.telescope import SlewRate, TelescopeStatus
@@ -124,10 +123,12 @@ class FakeTelescope (TelescopeBase):
             self._dec += dec_steps
             self._setAltAzFromRaDec()
 
-            time.sleep(0.5)
+            # abortSlew wakes us
+            self._waiter.wait(self._abort.isSet, timeout=0.5)
             t += 0.5
 
         self._slewing = False
+        self._waiter.changed()
 
         self.slewComplete(self.getPositionRaDec(), status)
 
@@ -161,17 +162,19 @@ class FakeTelescope (TelescopeBase):
             self._az += az_steps
             self._setRaDecFromAltAz()
 
-            time.sleep(0.5)
+            # abortSlew wakes us
+            self._waiter.wait(self._abort.isSet, timeout=0.5)
             t += 0.5
 
         self._slewing = False
+        self._waiter.changed()
 
         self.slewComplete(self.getPositionRaDec(), status)
 
     def abortSlew(self):
         self._abort.set()
-        while self.isSlewing():
-            time.sleep(0.1)
+        self._waiter.changed()
+        self._waiter.wait(lambda: not self.isSlewing())
 
         self._slewing = False
 
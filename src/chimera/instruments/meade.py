@@ -33,19 +33,39 @@ except ImportError:
 import serial
 
 from chimera.instruments.telescope import TelescopeBase
-from chimera.interfaces.telescope import SlewRate, AlignMode, TelescopeStatus
+from chimera.interfaces.telescope import SlewRate, AlignMode, TelescopeStatus, Telemetry
 
 from chimera.util.coord import Coord
 from chimera.util.position import Position
 from chimera.util.enum import Enum
 
 from chimera.core.lock import lock
+from chimera.core.wait import WaitStatus
 from chimera.core.exceptions import ObjectNotFoundException, MeadeException
 from chimera.core.constants import SYSTEM_CONFIG_DIRECTORY
 
 Direction = Enum("E", "W", "N", "S")
 
 
+def exchange(method):
+    """
+    Hold the serial line (TelescopeBase._ioLock) for a whole command
+    and its answer. The telemetry poller doesn't wait for the
+    instrument monitor, so it could otherwise read in the middle of
+    one.
+    """
+    def locked(self, *args, **kwargs):
+        self._ioLock.acquire()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self._ioLock.release()
+
+    locked.__name__ = method.__name__
+    locked.__doc__ = method.__doc__
+    return locked
+
+
 class Meade(TelescopeBase):
 
     __config__ = {'azimuth180Correct': True}
@@ -196,6 +216,7 @@ class Meade(TelescopeBase):
     # --
 
     @lock
+    @exchange
     def autoAlign(self):
 
         self._write(":Aa#")
@@ -209,6 +230,7 @@ class Meade(TelescopeBase):
         return True
 
     @lock
+    @exchange
     def getAlignMode(self):
 
         self._write('\x06')  # ACK
@@ -231,6 +253,7 @@ class Meade(TelescopeBase):
             return AlignMode.LAND
 
     @lock
+    @exchange
     def setAlignMode(self, mode):
 
         if mode == self.getAlignMode():
@@ -274,16 +297,22 @@ class Meade(TelescopeBase):
         self._abort.clear()
 
         # slew
-        self._write(':MS#')
+        self._ioLock.acquire()
+        try:
+            self._write(':MS#')
 
-        # to handle timeout
-        start_time = time.time()
+            # to handle timeout
+            start_time = time.time()
 
-        err = self._readbool()
+            err = self._readbool()
+
+            if err:
+                # check error message
+                msg = self._readline()
+        finally:
+            self._ioLock.release()
 
         if err:
-            # check error message
-            msg = self._readline()
             self._slewing = False
             raise MeadeException(msg[:-1])
 
@@ -325,12 +354,16 @@ class Meade(TelescopeBase):
         self._abort.clear()
 
         # slew
-        self._write(':MA#')
+        self._ioLock.acquire()
+        try:
+            self._write(':MA#')
 
-        # to handle timeout
-        start_time = time.time()
+            # to handle timeout
+            start_time = time.time()
 
-        err = self._readbool()
+            err = self._readbool()
+        finally:
+            self._ioLock.release()
 
         if err:
             # check error message
@@ -347,32 +380,43 @@ class Meade(TelescopeBase):
 
         self.slewBegin(target)
 
-        while True:
-
-            # check slew abort event
-            if self._abort.isSet():
-                self._slewing = False
-                return TelescopeStatus.ABORTED
-
-            # check timeout
-            if time.time() >= (start_time + self["max_slew_time"]):
-                self.abortSlew()
-                self._slewing = False
-                raise MeadeException("Slew aborted. Max slew time reached.")
+        # distance left on the last check, for the poll cadence
+        distance = [None]
 
+        def arrived():
             if local:
                 position = self.getPositionAltAz()
             else:
                 position = self.getPositionRaDec()
 
-            if target.within(position, eps=Coord.fromAS(60)):
-                time.sleep(self["stabilization_time"])
-                self._slewing = False
-                return TelescopeStatus.OK
+            distance[0] = target.angsep(position).D
+            return target.within(position, eps=Coord.fromAS(60))
+
+        def eta():
+            return distance[0] / self["slew_speed"]
+
+        # checks every slew_idle_time close to the target, up to once a
+        # second far from it, abortSlew wakes us at once
+        result = self._waiter.wait(arrived,
+                                   timeout=start_time + self["max_slew_time"] - time.time(),
+                                   abort=self._abort, eta=eta,
+                                   minPoll=self["slew_idle_time"], maxPoll=1.0)
+
+        if result.status == WaitStatus.ABORTED:
+            self._slewing = False
+            return TelescopeStatus.ABORTED
+
+        if result.status == WaitStatus.TIMEOUT:
+            self.abortSlew()
+            self._slewing = False
+            raise MeadeException("Slew aborted. Max slew time reached.")
 
-            time.sleep(self["slew_idle_time"])
+        self.log.debug("[slew] done in %.3f s, %d checks, noticed within %.3f s" %
+                       (result.elapsed, result.checks, result.latency))
 
-        return TelescopeStatus.ERROR
+        time.sleep(self["stabilization_time"])
+        self._slewing = False
+        return TelescopeStatus.OK
 
     def abortSlew(self):
 
@@ -380,6 +424,7 @@ class Meade(TelescopeBase):
             return True
 
         self._abort.set()
+        self._waiter.changed()
 
         self.stopMoveAll()
 
@@ -547,6 +592,7 @@ class Meade(TelescopeBase):
         return True
 
     @lock
+    @exchange
     def getRa(self):
         self._write(":GR#")
         ret = self._readline()
@@ -560,6 +606,7 @@ class Meade(TelescopeBase):
         return Coord.fromHMS(ret[:-1])
 
     @lock
+    @exchange
     def getDec(self):
         self._write(":GD#")
         ret = self._readline()
@@ -580,6 +627,20 @@ class Meade(TelescopeBase):
     def getPositionAltAz(self):
         return Position.fromAltAz(self.getAlt(), self.getAz())
 
+    def _readTelemetry(self):
+        # one exchange at a time, between the ones of a running slew
+        # (which holds the instrument monitor until it arrives)
+        timestamp = time.time()
+
+        raDec = Position.fromRaDec(self._unlocked(self.getRa)(),
+                                   self._unlocked(self.getDec)())
+        altAz = Position.fromAltAz(self._unlocked(self.getAlt)(),
+                                   self._unlocked(self.getAz)())
+        tracking = self._unlocked(self.getAlignMode)() != AlignMode.LAND
+
+        return Telemetry(raDec, altAz, tracking, self.isParked(), self.isSlewing(),
+                         timestamp)
+
     @lock
     def getTargetRaDec(self):
         return Position.fromRaDec(self.getTargetRa(), self.getTargetDec())
@@ -605,6 +666,7 @@ class Meade(TelescopeBase):
         return True
 
     @lock
+    @exchange
     def getTargetRa(self):
 
         self._write(":Gr#")
@@ -613,6 +675,7 @@ class Meade(TelescopeBase):
         return Coord.fromHMS(ret[:-1])
 
     @lock
+    @exchange
     def setTargetRa(self, ra):
 
         if not isinstance(ra, Coord):
@@ -628,6 +691,7 @@ class Meade(TelescopeBase):
         return True
 
     @lock
+    @exchange
     def setTargetDec(self, dec):
 
         if not isinstance(dec, Coord):
@@ -643,6 +707,7 @@ class Meade(TelescopeBase):
         return True
 
     @lock
+    @exchange
     def getTargetDec(self):
         self._write(":Gd#")
         ret = self._readline()
@@ -652,6 +717,7 @@ class Meade(TelescopeBase):
         return Coord.fromDMS(ret[:-1])
 
     @lock
+    @exchange
     def getAz(self):
         self._write(":GZ#")
         ret = self._readline()
@@ -668,6 +734,7 @@ class Meade(TelescopeBase):
         return c
 
     @lock
+    @exchange
     def getAlt(self):
         self._write(":GA#")
         ret = self._readline()
@@ -679,6 +746,7 @@ class Meade(TelescopeBase):
         return self._target_alt
 
     @lock
+    @exchange
     def setTargetAlt(self, alt):
 
         if not isinstance(alt, Coord):
@@ -699,6 +767,7 @@ class Meade(TelescopeBase):
         return self._target_az
 
     @lock
+    @exchange
     def setTargetAz(self, az):
 
         if not isinstance(az, Coord):
@@ -725,6 +794,7 @@ class Meade(TelescopeBase):
         return True
 
     @lock
+    @exchange
     def getLat(self):
         self._write(":Gt#")
         ret = self._readline()
@@ -733,6 +803,7 @@ class Meade(TelescopeBase):
         return Coord.fromDMS(ret)
 
     @lock
+    @exchange
     def setLat(self, lat):
 
         if not isinstance(lat, Coord):
@@ -751,6 +822,7 @@ class Meade(TelescopeBase):
         return True
 
     @lock
+    @exchange
     def getLong(self):
         self._write(":Gg#")
         ret = self._readline()
@@ -759,6 +831,7 @@ class Meade(TelescopeBase):
         return Coord.fromDMS(ret)
 
     @lock
+    @exchange
     def setLong(self, coord):
 
         if not isinstance(coord, Coord):
@@ -774,12 +847,14 @@ class Meade(TelescopeBase):
         return True
 
     @lock
+    @exchange
     def getDate(self):
         self._write(":GC#")
         ret = self._readline()
         return dt.datetime.strptime(ret[:-1], "%m/%d/%y").date()
 
     @lock
+    @exchange
     def setDate(self, date):
 
         if type(date) == FloatType:
@@ -808,12 +883,14 @@ class Meade(TelescopeBase):
             return True
 
     @lock
+    @exchange
     def getLocalTime(self):
         self._write(":GL#")
         ret = self._readline()
         return dt.datetime.strptime(ret[:-1], "%H:%M:%S").time()
 
     @lock
+    @exchange
     def setLocalTime(self, local):
 
         if type(local) == FloatType:
@@ -829,12 +906,14 @@ class Meade(TelescopeBase):
         return True
 
     @lock
+    @exchange
     def getLocalSiderealTime(self):
         self._write(":GS#")
         ret = self._readline()
         return dt.datetime.strptime(ret[:-1], "%H:%M:%S").time()
 
     @lock
+    @exchange
     def setLocalSiderealTime(self, local):
 
         self._write(":SS%s#" % local.strftime("%H:%M:%S"))
@@ -847,12 +926,14 @@ class Meade(TelescopeBase):
         return True
 
     @lock
+    @exchange
     def getUTCOffset(self):
         self._write(":GG#")
         ret = self._readline()
         return ret[:-1]
 
     @lock
+    @exchange
     def setUTCOffset(self, offset):
 
         offset = "%+02.1f" % offset
@@ -867,6 +948,7 @@ class Meade(TelescopeBase):
         return True
 
     @lock
+    @exchange
     def getCurrentTrackingRate(self):
 
         self._write(":GT#")
@@ -881,6 +963,7 @@ class Meade(TelescopeBase):
         return ret
 
     @lock
+    @exchange
     def setCurrentTrackingRate(self, trk):
 
         trk = "%02.1f" % trk
@@ -924,6 +1007,7 @@ class Meade(TelescopeBase):
 
         return False
 
+    @exchange
     def _setHighPrecision(self):
 
         self._write(":GR#")
@@ -941,9 +1025,12 @@ class Meade(TelescopeBase):
 
         self.setTargetRaDec(position.ra, position.dec)
 
-        self._write(":CM#")
-
-        ret = self._readline()
+        self._ioLock.acquire()
+        try:
+            self._write(":CM#")
+            ret = self._readline()
+        finally:
+            self._ioLock.release()
 
         if not ret:
             raise MeadeException(
@@ -954,6 +1041,7 @@ class Meade(TelescopeBase):
         return True
 
     @lock
+    @exchange
     def setSlewRate(self, rate):
 
         if rate == SlewRate.GUIDE:
@@ -1094,9 +1182,14 @@ class Meade(TelescopeBase):
         if not self._tty.isOpen():
             raise IOError("Device not open")
 
-        if flush:
-            self._tty.flushOutput()
+        # commands with no answer, the others hold the line already
+        self._ioLock.acquire()
+        try:
+            if flush:
+                self._tty.flushOutput()
 
-        self._debug("[write] %s" % repr(data))
+            self._debug("[write] %s" % repr(data))
 
-        return self._tty.write(data)
+            return self._tty.write(data)
+        finally:
+            self._ioLock.release()
@@ -24,27 +24,55 @@ from chimera.core.chimeraobject import ChimeraObject
 
 from chimera.interfaces.telescope import (TelescopeSlew, TelescopeSync,
                                           TelescopePark, TelescopeTracking,
+                                          TelescopeTelemetry, Telemetry,
                                           SlewRate)
 
 from chimera.core.lock import lock
 from chimera.core.exceptions import ObjectTooLowException
+from chimera.core.wait import StateWaiter
 
 from chimera.util.simbad import Simbad
 from chimera.util.position import Epoch, Position
 
+import threading
+import time
+
 
 __all__ = ["TelescopeBase"]
 
 
 class TelescopeBase(ChimeraObject,
                     TelescopeSlew, TelescopeSync,
-                    TelescopePark, TelescopeTracking):
+                    TelescopePark, TelescopeTracking,
+                    TelescopeTelemetry):
 
     def __init__(self):
         ChimeraObject.__init__(self)
 
         self._park_position = None
 
+        # latest Telemetry, the poller thread, and one hardware read
+        # at a time (see getTelemetry)
+        self._telemetry = None
+        self._telemetryThread = None
+        self._telemetryAbort = None
+        self._telemetryLock = threading.Lock()
+        self._readLock = threading.Lock()
+
+        # the line to the hardware. Telemetry is read without the
+        # instrument monitor (a slew holds it until the telescope
+        # arrives), so drivers sharing a line between calls hold this
+        # around each command and its answer
+        self._ioLock = threading.RLock()
+
+        # woken on every new snapshot, drivers also use it for their
+        # own slew/abort changes
+        self._waiter = StateWaiter()
+
+    def __abort_loop__(self):
+        self.stopTelemetry()
+        ChimeraObject.__abort_loop__(self)
+
     @lock
     def slewToObject(self, name):
         target = Simbad.lookup(name)
@@ -209,7 +237,136 @@ class TelescopeBase(ChimeraObject,
     def isTracking(self):
         raise NotImplementedError()
 
+    #
+    # telemetry
+    #
+
+    def getTelemetry(self, maxAge=None):
+
+        # first use (stopTelemetry keeps it stopped)
+        if self._telemetryAbort is None:
+            self.startTelemetry()
+
+        if maxAge is None and not self._polling():
+            maxAge = 0
+
+        telemetry = self._telemetry
+        if telemetry is None or (maxAge is not None and telemetry.age > maxAge):
+            since = None
+            if maxAge is not None:
+                since = time.time() - maxAge
+            telemetry = self._refreshTelemetry(since)
+
+        return telemetry
+
+    def startTelemetry(self):
+        """
+        Start the poller (getTelemetry does it on the first call).
+        """
+        self._telemetryLock.acquire()
+        try:
+            if self._polling() or self["telemetry_rate"] <= 0:
+                return
+
+            self._telemetryAbort = threading.Event()
+            self._telemetryThread = threading.Thread(target=self._telemetryLoop,
+                                                     args=(self._telemetryAbort,),
+                                                     name="%s telemetry" % self.getLocation())
+            self._telemetryThread.setDaemon(True)
+            self._telemetryThread.start()
+        finally:
+            self._telemetryLock.release()
+
+    def stopTelemetry(self):
+        # not joined, the poller may be waiting for a slow hardware
+        # read to finish
+        self._telemetryLock.acquire()
+        try:
+            self._telemetryThread = None
+            if self._telemetryAbort:
+                self._telemetryAbort.set()
+        finally:
+            self._telemetryLock.release()
+
+    def _polling(self):
+        return self._telemetryThread is not None and self._telemetryThread.isAlive()
+
+    def _telemetryLoop(self, abort):
+
+        failing = False
+
+        while not abort.isSet():
+            rate = self["telemetry_rate"]
+            if rate <= 0:
+                break
+
+            try:
+                self._refreshTelemetry(time.time() - 1.0 / rate / 2)
+                if failing:
+                    self.log.info("Telemetry back.")
+                failing = False
+            except Exception, e:
+                # once, not at every poll
+                if not failing:
+                    self.log.warning("Error reading telemetry (%s), keeping the last one." % e)
+                failing = True
+
+            abort.wait(1.0 / rate)
+
+    def _refreshTelemetry(self, since):
+        """
+        Read a new snapshot unless one read while we waited (for
+        another reader that asked first) started after since.
+        """
+        self._readLock.acquire()
+        try:
+            telemetry = self._telemetry
+            if telemetry is not None and since is not None and telemetry.timestamp >= since:
+                return telemetry
+
+            # not under the instrument monitor, see _ioLock
+            telemetry = self._readTelemetry()
+
+            self._telemetry = telemetry
+            self._waiter.changed()
+            return telemetry
+        finally:
+            self._readLock.release()
+
+    def _readTelemetry(self):
+        """
+        Read a L{Telemetry} from the hardware, calling the getters
+        without their @lock. Drivers that can read everything in one
+        go, or whose getters call other locked methods, should
+        override this.
+        """
+        def flag(method):
+            try:
+                return bool(self._unlocked(method)())
+            except NotImplementedError:
+                return None
+
+        timestamp = time.time()
+
+        return Telemetry(self._unlocked(self.getPositionRaDec)(),
+                         self._unlocked(self.getPositionAltAz)(),
+                         flag(self.isTracking), flag(self.isParked), flag(self.isSlewing),
+                         timestamp)
+
+    def _unlocked(self, method):
+        # the function behind a (locked) method, to call it without
+        # waiting for the instrument monitor
+        func = getattr(method, "func", None)
+        if func is None:
+            return method
+        return lambda *args: func(self, *args)
+
     def getMetadata(self, request):
+
+        # a recent snapshot instead of four more hardware reads
+        telemetry = self.getTelemetry(maxAge=1.0)
+        target = self.getTargetRaDec()
+
         return [('TELESCOP', self['model'], 'Telescope Model'),
                 ('OPTICS',   self['optics'], 'Telescope Optics Type'),
                 ('MOUNT', self['mount'], 'Telescope Mount Type'),
@@ -220,20 +377,20 @@ class TelescopeBase(ChimeraObject,
                  'Telescope focal reduction'),
                 # TODO: Convert coordinates to proper equinox
                 # TODO: How to get ra,dec at start of exposure (not end)
-                ('RA', self.getRa().toHMS().__str__(),
+                ('RA', telemetry.raDec.ra.toHMS().__str__(),
                  'Right ascension of the observed object'),
-                ('DEC', self.getDec().toDMS().__str__(),
+                ('DEC', telemetry.raDec.dec.toDMS().__str__(),
                  'Declination of the observed object'),
                 ("EQUINOX", 2000.0, "coordinate epoch"),
-                ('ALT', self.getAlt().toDMS().__str__(),
+                ('ALT', telemetry.altAz.alt.toDMS().__str__(),
                  'Altitude of the observed object'),
-                ('AZ', self.getAz().toDMS().__str__(),
+                ('AZ', telemetry.altAz.az.toDMS().__str__(),
                  'Azimuth of the observed object'),
                 ("WCSAXES", 2, "wcs dimensionality"),
                 ("RADESYS", "ICRS", "frame of reference"),
-                ("CRVAL1", self.getTargetRaDec().ra.D,
+                ("CRVAL1", target.ra.D,
                  "coordinate system value at reference pixel"),
-                ("CRVAL2", self.getTargetRaDec().dec.D,
+                ("CRVAL2", target.dec.D,
                  "coordinate system value at reference pixel"),
                 ("CTYPE1", 'RA---TAN', "name of the coordinate axis"),
                 ("CTYPE2", 'DEC---TAN', "name of the coordinate axis"),
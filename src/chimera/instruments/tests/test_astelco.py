@@ -0,0 +1,117 @@
+
+import threading
+import time
+
+from chimera.instruments.astelco import Astelco
+from chimera.interfaces.telescope import TelescopeStatus
+from chimera.util.faketpl2 import FakeTPL2Server
+from chimera.util.position import Position
+
+
+class TestAstelco (object):
+
+    def setup (self):
+        self.server = FakeTPL2Server(latency=0.005, slewTime=0.5, moveTime=0.3)
+        self.server.start()
+
+        self.tel = Astelco()
+        self.tel["aport"] = str(self.server.port)
+        self.tel["skip_init"] = True
+        self.tel["slew_idle_time"] = 5.0
+        self.tel["stabilization_time"] = 0
+        # no poller, so the reads below are the only commands
+        self.tel["telemetry_rate"] = 0
+
+        # no Site to check the horizon against
+        self.tel._validateRaDec = lambda position: True
+
+        # slewComplete events sent
+        self.completed = []
+        self.tel.slewComplete = lambda position, status: self.completed.append(status)
+
+        self.tel.open()
+
+    def teardown (self):
+        self.tel.close()
+        self.server.stop()
+
+    def test_reads (self):
+
+        commands = self.server.commands
+        position = self.tel.getPositionRaDec()
+        assert self.server.commands == commands + 1
+        assert position.ra.H == 10.0 and position.dec.D == -20.0
+
+        commands = self.server.commands
+        telemetry = self.tel.getTelemetry(maxAge=0)
+        assert self.server.commands == commands + 1
+        assert telemetry.altAz.alt.D == 60.0
+        assert telemetry.tracking and not telemetry.parked and not telemetry.slewing
+
+    def test_slew (self):
+
+        t0 = time.time()
+        status = self.tel.slewToRaDec(Position.fromRaDec("12:00:00", "-30:00:00"))
+        t_slew = time.time() - t0
+
+        # TRACK 2 and TRACK 1, each 0.5 s on the server, and not a
+        # single slew_idle_time (5 s) poll
+        print
+        print "slew: %.3f s" % t_slew
+
+        assert status == TelescopeStatus.OK
+        assert self.completed == [TelescopeStatus.OK]
+        assert not self.tel.isSlewing()
+        assert t_slew < 4
+        assert self.tel.getPositionRaDec().ra.H == 12.0
+
+    def test_abort (self):
+
+        def abort():
+            time.sleep(0.2)
+            self.tel.abortSlew()
+
+        thread = threading.Thread(target=abort)
+        thread.start()
+
+        t0 = time.time()
+        status = self.tel.slewToRaDec(Position.fromRaDec("14:00:00", "-30:00:00"))
+        thread.join()
+
+        assert status == TelescopeStatus.ABORTED
+        assert self.completed == [TelescopeStatus.ABORTED]
+        assert not self.tel._slewing
+        # not a slew_idle_time (5 s) poll later
+        assert time.time() - t0 < 4
+
+    def test_error (self):
+
+        # the server refuses the slew
+        execute = self.server.execute
+
+        def refuse (handler, id, kind, args):
+            if args.startswith("POINTING.TRACK"):
+                handler.write("%d COMMAND ERROR REFUSED" % id)
+            else:
+                execute(handler, id, kind, args)
+
+        self.server.execute = refuse
+
+        status = self.tel.slewToRaDec(Position.fromRaDec("12:00:00", "-30:00:00"))
+
+        assert status == TelescopeStatus.ERROR
+        assert self.completed == [TelescopeStatus.ERROR]
+        assert not self.tel._slewing
+
+    def test_cover (self):
+
+        t0 = time.time()
+        self.tel.openCover()
+        assert self.tel.isOpen()
+
+        self.tel.closeCover()
+        assert not self.tel.isOpen()
+
+        # 0.3 s each on the server, woken by the command completion
+        # and not by slew_idle_time (5 s) polls
+        assert time.time() - t0 < 4
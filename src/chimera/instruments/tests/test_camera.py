@@ -127,6 +127,60 @@ class CameraTest (object):
 
         self.assertEvents(CameraStatus.OK, CameraStatus.OK)
 
+        # how long each header source took, the camera at least
+        times = cam.getMetadataTimes()
+        assert len(times) >= 1
+        assert None not in times.values()
+
+    def test_expose_pipeline (self):
+
+        cam = self.manager.getProxy(self.CAMERA)
+
+        saved = []
+
+        @callback(self.manager)
+        def imageSavedClbk(proxy, status):
+            saved.append((proxy, status))
+
+        cam.imageSaved += imageSavedClbk
+
+        frames = cam.expose(exptime=1, frames=3, pipeline=True, filename="autogen-expose-pipeline.fits")
+
+        assert len(frames) == 3
+        for frame in frames:
+            assert isinstance(frame, Proxy)
+
+        # one completion event per frame
+        time.sleep(1)
+        assert len(saved) == 3
+        assert [status for proxy, status in saved] == [CameraStatus.OK]*3
+
+        stats = cam.getExposureStats()
+        print
+        print "duty cycle: %.2f (%.1f s open in %.1f s)" % (stats["dutyCycle"], stats["shutterOpen"], stats["wallTime"])
+        assert stats["frames"] == 3
+        assert stats["pending"] == 0
+        assert 0 < stats["dutyCycle"] <= 1
+
+    def test_expose_pipeline_headers (self):
+
+        from chimera.instruments.fakefocuser import FakeFocuser
+        self.manager.addClass(FakeFocuser, "fake")
+
+        cam = self.manager.getProxy(self.CAMERA)
+
+        request = ImageRequest(exptime=1, frames=2, pipeline=True, compress=False,
+                               filename="autogen-expose-pipeline-headers.fits")
+        request.auto_collect_metadata = False
+        request.metadataPost = ["/FakeFocuser/0"]
+
+        frames = cam.expose(request)
+
+        # headers collected after each exposure make it to the files
+        assert len(frames) == 2
+        for frame in frames:
+            assert "FOCUS" in frame.keys()
+
     def test_expose_checkings (self):
 
         cam = self.manager.getProxy(self.CAMERA)
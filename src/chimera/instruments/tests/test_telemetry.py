@@ -0,0 +1,215 @@
+
+import threading
+import time
+
+from chimera.core.lock import lock
+from chimera.instruments.telescope import TelescopeBase
+from chimera.interfaces.telescope import Telemetry
+from chimera.util.position import Position
+
+
+class SlowTelescope (TelescopeBase):
+
+    """
+    Every read is a 10 ms round trip, as on a serial line.
+    """
+
+    def __init__(self):
+        TelescopeBase.__init__(self)
+        self.reads = 0
+        self.broken = False
+
+    def _roundTrip(self):
+        # one command and answer on the line at a time
+        self._ioLock.acquire()
+        try:
+            if self.broken:
+                raise IOError("no answer")
+            time.sleep(0.01)
+            self.reads += 1
+        finally:
+            self._ioLock.release()
+
+    @lock
+    def getPositionRaDec(self):
+        self._roundTrip()
+        self._roundTrip()
+        return Position.fromRaDec("10:00:00", "-20:00:00")
+
+    @lock
+    def getPositionAltAz(self):
+        self._roundTrip()
+        self._roundTrip()
+        return Position.fromAltAz("60:00:00", "120:00:00")
+
+    @lock
+    def isTracking(self):
+        self._roundTrip()
+        return True
+
+    def isParked(self):
+        return False
+
+
+class SlewingTelescope (SlowTelescope):
+
+    """
+    Holds the instrument monitor for the whole slew, as Meade does.
+    """
+
+    def __init__(self):
+        SlowTelescope.__init__(self)
+        self.ra = 10.0
+        self.slewing = False
+
+    @lock
+    def slewToRaDec(self, position):
+        self.slewing = True
+        try:
+            for i in range(20):
+                self._roundTrip()
+                self.ra += 0.01
+                time.sleep(0.02)
+        finally:
+            self.slewing = False
+
+    @lock
+    def getPositionRaDec(self):
+        self._roundTrip()
+        return Position.fromRaDec(self.ra, "-20:00:00")
+
+    def isSlewing(self):
+        return self.slewing
+
+
+class TestTelemetry (object):
+
+    def setup (self):
+        self.tel = SlowTelescope()
+
+    def teardown (self):
+        self.tel.stopTelemetry()
+
+    def test_snapshot (self):
+
+        telemetry = self.tel.getTelemetry()
+
+        assert isinstance(telemetry, Telemetry)
+        assert telemetry.raDec.ra.toHMS().__str__() == Position.fromRaDec("10:00:00", "0").ra.toHMS().__str__()
+        assert telemetry.altAz.az.D == 120
+        assert telemetry.tracking is True and telemetry.parked is False
+        # not implemented
+        assert telemetry.slewing is None
+        assert 0 <= telemetry.age < 1
+
+        # immutable
+        try:
+            telemetry.tracking = False
+            assert False, "snapshot changed"
+        except AttributeError:
+            pass
+
+        # fresh enough, no reads
+        reads = self.tel.reads
+        assert self.tel.getTelemetry(maxAge=10) is self.tel.getTelemetry(maxAge=10)
+
+        # fresher than what we have
+        time.sleep(0.01)
+        fresh = self.tel.getTelemetry(maxAge=0)
+        assert fresh.timestamp > telemetry.timestamp
+        assert self.tel.reads > reads
+
+    def test_poller (self):
+
+        self.tel["telemetry_rate"] = 20.0
+        first = self.tel.getTelemetry()
+
+        time.sleep(0.3)
+        assert self.tel.getTelemetry().timestamp > first.timestamp
+
+        # errors keep the last snapshot
+        self.tel.broken = True
+        time.sleep(0.2)
+        stale = self.tel.getTelemetry()
+        assert stale.age > 0.1
+        self.tel.broken = False
+        time.sleep(0.2)
+        assert self.tel.getTelemetry().timestamp > stale.timestamp
+
+        self.tel.stopTelemetry()
+        time.sleep(0.2)
+        reads = self.tel.reads
+        time.sleep(0.2)
+        assert self.tel.reads == reads
+
+    def test_no_poller (self):
+
+        self.tel["telemetry_rate"] = 0
+
+        first = self.tel.getTelemetry()
+        assert self.tel.getTelemetry().timestamp > first.timestamp
+        assert self.tel.getTelemetry(maxAge=10).timestamp == self.tel._telemetry.timestamp
+
+    def test_readers (self):
+
+        # 8 readers (dome, GUI, xephem, ...) asking 10 times each
+        def run(read):
+            threads = [threading.Thread(target=lambda: [read() for i in range(10)]) for i in range(8)]
+            t0 = time.time()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            return time.time() - t0
+
+        reads = self.tel.reads
+        t_direct = run(lambda: (self.tel.getPositionRaDec(), self.tel.getPositionAltAz()))
+        direct = self.tel.reads - reads
+
+        self.tel["telemetry_rate"] = 10.0
+        self.tel.getTelemetry()
+
+        reads = self.tel.reads
+        t_telemetry = run(lambda: self.tel.getTelemetry())
+        telemetry = self.tel.reads - reads
+
+        # no poller, readers asking for fresh data at the same time share
+        # the reads
+        self.tel.stopTelemetry()
+        time.sleep(0.2)
+        reads = self.tel.reads
+        t_fresh = run(lambda: self.tel.getTelemetry(maxAge=0.1))
+        fresh = self.tel.reads - reads
+
+        print
+        print "80 reads: direct %.3f s (%d round trips), telemetry %.4f s (%d), maxAge=0.1 s %.3f s (%d)" % \
+            (t_direct, direct, t_telemetry, telemetry, t_fresh, fresh)
+
+        assert t_telemetry < t_direct / 10
+        assert telemetry < direct / 10
+        assert fresh < direct / 2
+
+    def test_slew (self):
+
+        self.tel = SlewingTelescope()
+        self.tel["telemetry_rate"] = 20.0
+        before = self.tel.getTelemetry()
+        assert before.slewing is False
+
+        slew = threading.Thread(target=self.tel.slewToRaDec, args=(None,))
+        slew.start()
+
+        seen = []
+        while slew.isAlive():
+            seen.append(self.tel.getTelemetry())
+            time.sleep(0.02)
+        slew.join()
+
+        # the poller kept reading while the slew held the monitor
+        during = [telemetry for telemetry in seen if telemetry.slewing]
+        assert len(during) >= 2
+        positions = [telemetry.raDec.ra.H for telemetry in during]
+        assert min(positions) > before.raDec.ra.H
+        assert len(set(positions)) >= 2
+
+        assert self.tel.getTelemetry(maxAge=0).slewing is False
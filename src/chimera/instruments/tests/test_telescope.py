@@ -151,6 +151,12 @@ class TelescopeTest (object):
 
         pool.joinAll()
 
+        # events are delivered asynchronously, give slewComplete a moment
+        start = time.time()
+        while FiredEvents.get("slewComplete", (0, None, None))[2] != TelescopeStatus.ABORTED and \
+               time.time() - start < 5:
+            time.sleep(0.1)
+
         # event checkings
         self.assertEvents(TelescopeStatus.ABORTED)
         
@@ -112,7 +112,11 @@ class Camera (Interface):
 
                   "camera_model": "Fake camera Inc.",
                   "ccd_model": "KAF XYZ 10",
-                  "telescope_focal_length": 4000  # milimeter
+                  "telescope_focal_length": 4000,  # milimeter
+
+                  # frames waiting to be saved on pipelined exposures
+                  # (see ImageRequest 'pipeline' option)
+                  "writer_queue_size": 2
                   }
 
 
@@ -159,6 +163,31 @@ class CameraExpose (Camera):
         @rtype: bool or L{ImageRequest}
         """
 
+    def getMetadataTimes(self):
+        """
+        How long each header metadata source took to answer on the
+        last frame of the current (or last) expose call. Sources which
+        didn't answer in time (see ImageRequest.metadataTimeout) are
+        None.
+
+        @return: dict of source location to seconds (or None).
+        @rtype: dict
+        """
+
+    def getExposureStats(self):
+        """
+        Statistics of the current (or last) expose call.
+
+        dutyCycle is the time the shutter was open (requested exposure
+        time of each completed frame) over the wall time of the whole
+        sequence, including saving the images. pending is the number
+        of frames waiting to be saved on pipelined exposures.
+
+        @return: dict with frames, shutterOpen, wallTime (in seconds),
+                 dutyCycle and pending.
+        @rtype: dict
+        """
+
     @event
     def exposeBegin(self, request):
         """
@@ -202,6 +231,9 @@ class CameraExpose (Camera):
     def readoutComplete(self, proxy, status):
         """Indicates that a new frame was exposed and saved.
 
+        On pipelined exposures the frame is saved later (see
+        imageSaved), so proxy is always None.
+
         @param request: The just taken Image (as a Proxy) or None is status=[ERROR or ABORTED]..
         @type  request: L{Proxy} or None
 
@@ -209,6 +241,21 @@ class CameraExpose (Camera):
         @type  status: L{CameraStatus}
         """
 
+    @event
+    def imageSaved(self, proxy, status):
+        """
+        Indicates that a frame was written to disk and registered on
+        the ImageServer. Fired once per frame, after readoutComplete
+        (much later on pipelined exposures, where the camera is
+        already taking the next frame).
+
+        @param proxy: The saved Image (as a Proxy) or None if status=ERROR.
+        @type  proxy: L{Proxy} or None
+
+        @param status: L{CameraStatus}.OK or L{CameraStatus}.ERROR
+        @type  status: L{CameraStatus}
+        """
+
 
 class CameraTemperature (Camera):
 
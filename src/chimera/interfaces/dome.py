@@ -62,6 +62,7 @@ class Dome(Interface):
 
                   "az_resolution": 2,  # dome position resolution in degrees
                   "slew_timeout": 120,
+                  "slew_speed": 3.0,  # deg/s, used to estimate slew times
                   "abort_timeout": 60,
                   "init_timeout": 5,
                   "open_timeout": 20,
@@ -71,7 +71,10 @@ class ILifeCycle(Interface):
         Main control method. Implementers could use this method to
         implement control loop functions.
 
-        @note: This method runs on their own thread.
+        @note: This method runs on their own thread. Objects that don't
+        override it get their control() called getHz() times a second
+        by the Manager's LoopScheduler instead, with no thread of
+        their own.
         """
 
     def getState(self):
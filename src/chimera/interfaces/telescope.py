@@ -27,6 +27,9 @@ from chimera.core.exceptions import ChimeraException
 from chimera.util.position import Position
 from chimera.util.enum import Enum
 
+from collections import namedtuple
+import time
+
 
 AlignMode = Enum("ALT_AZ", "POLAR", "LAND")
 SlewRate = Enum("GUIDE", "CENTER", "FIND", "MAX")
@@ -68,6 +71,7 @@ class TelescopeSlew(Telescope):
                   "slew_idle_time": 0.1,  # s
                   "max_slew_time": 90.0,  # s
                   "stabilization_time": 2.0,  # s
+                  "slew_speed": 2.0,  # deg/s, used to estimate slew times
                   "position_sigma_delta": 60.0,  # arcseconds
                   "skip_init": False,
                   "min_altitude": 20}
@@ -448,3 +452,43 @@ class TelescopeTracking (Telescope):
         @rtype: bool
 
         """
+
+
+class Telemetry (namedtuple("Telemetry", "raDec altAz tracking parked slewing timestamp")):
+
+    """
+    What the telescope was doing at timestamp (time.time() when the
+    reads started): raDec and altAz as L{Position}, tracking, parked
+    and slewing as bool (None if the telescope can't tell).
+    """
+
+    __slots__ = ()
+
+    @property
+    def age(self):
+        """
+        Seconds since this snapshot was read.
+        """
+        return time.time() - self.timestamp
+
+
+class TelescopeTelemetry (Telescope):
+
+    """
+    Telescope state read by a poller thread, so readers don't go to
+    the hardware (or wait for the instrument lock) every time.
+    """
+
+    __config__ = {"telemetry_rate": 2.0}  # Hz, 0 to only read when asked
+
+    def getTelemetry(self, maxAge=None):
+        """
+        The latest telemetry snapshot, read again if it is older than
+        maxAge seconds (maxAge=0 always reads the hardware).
+
+        @param maxAge: How old the snapshot can be, in seconds.
+        @type  maxAge: float
+
+        @return: The snapshot.
+        @rtype: L{Telemetry}
+        """
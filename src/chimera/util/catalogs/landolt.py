@@ -7,6 +7,7 @@ from chimera.util.vizquery import VizQuery
 from chimera.util.position import Position
 from chimera.util.coord import Coord
 from chimera.util.catalog import Catalog
+from chimera.util.catalogs.local import LocalCatalog
 
 
 class Landolt (VizQuery, Catalog):
@@ -26,6 +27,10 @@ class Landolt (VizQuery, Catalog):
 
     def find(self, near=None, limit=9999, **conditions):
 
+        # a converted copy doesn't need Vizier (see LocalCatalog)
+        if LocalCatalog.exists(self.getName()):
+            return self._findLocal(near, limit, **conditions)
+
         self.useCat("II/183A/")
 
         if conditions.get("closest", False):
@@ -54,6 +59,45 @@ class Landolt (VizQuery, Catalog):
 
         return x
 
+    def _findLocal(self, near, limit, **conditions):
+
+        # same target, radius (degrees) and Vmag constraint Vizier would get
+        if near:
+            radius = conditions.pop("radius", 45)
+        else:
+            near = self.args.get("-c")
+            radius = float(self.args.get("-c.rd", 45))
+
+        assert near, "No target selected, use useTarget method first."
+
+        conditions["radius"] = float(radius) * 3600
+
+        if "Vmag" in self.args:
+            conditions["magV"] = self._magRange(self.args["Vmag"])
+
+        data = LocalCatalog.open(self.getName()).find(near, limit, **conditions)
+
+        if not conditions.get("closest", False):
+            data.sort(key=lambda row: row["RA"].D)
+
+        return [{"RA": row["RA"], "DEC": row["DEC"], "ID": str(row["ID"]), "V": str(row["MAG_V"])}
+                for row in data]
+
+    @staticmethod
+    def _magRange(constraint):
+        # Vizier constraints: "<10", ">8", "8..10"
+        constraint = str(constraint).strip()
+
+        if constraint.startswith("<"):
+            return float(constraint.lstrip("<="))
+        if constraint.startswith(">"):
+            return (float(constraint.lstrip(">=")), 99.0)
+        if ".." in constraint:
+            bright, faint = constraint.split("..")
+            return (float(bright), float(faint))
+
+        return (float(constraint), float(constraint))
+
 if __name__ == '__main__':
 
     lst = "12:00:00"
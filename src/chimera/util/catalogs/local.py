@@ -0,0 +1,320 @@
+#!/usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+import os
+import json
+import logging
+import threading
+
+from collections import OrderedDict
+from types import TupleType, ListType
+
+import numpy as np
+
+from chimera.core.constants import DEFAULT_CATALOGS_DIRECTORY
+from chimera.util.catalog import Catalog
+from chimera.util.coord import Coord
+from chimera.util.position import Position
+from chimera.util.skyindex import SkyIndex, columnToDegrees
+
+log = logging.getLogger(__name__)
+
+# catalogs opened by name (see LocalCatalog.open)
+_opened = {}
+_openedLock = threading.Lock()
+
+
+class LocalCatalog (Catalog):
+
+    """
+    A catalog converted to local files and queried in-process, no
+    scat or network needed.
+
+    On disk a catalog is a directory with one .npy file per column
+    (RA and DEC in degrees, magnitudes as MAG_<band>), rows sorted by
+    declination zone (and RA cell) as kept by a L{SkyIndex}, plus
+    catalog.json with its name, bands and column metadata. Everything
+    is memory-mapped, so only the zones a query touches are read.
+
+    Convert once with L{LocalCatalog.convert} (from any text table) or
+    L{LocalCatalog.create} (from arrays), then:
+
+    >>> ucac = LocalCatalog.open("UCAC2")
+    >>> ucac.find(near="10:00:00 -30:00:00", radius=600, magUCAC=(10, 12), limit=10)
+
+    find returns a list of dicts (one per star, closest first) with
+    every column, RA/DEC as L{Coord} and R, the distance to near in
+    arcseconds. Recent results are cached (see cacheSize).
+    """
+
+    # where open/exists look for catalogs by name
+    directory = DEFAULT_CATALOGS_DIRECTORY
+
+    # number of query results kept
+    cacheSize = 128
+
+    def __init__(self, path):
+        Catalog.__init__(self)
+
+        meta = json.load(open(os.path.join(path, "catalog.json")))
+
+        self.path = path
+        self.name = str(meta["name"])
+        self.bands = [str(band) for band in meta["bands"]]
+        self.metadata = [tuple(str(m) for m in column) for column in meta["metadata"]]
+
+        self.index = SkyIndex.load(os.path.join(path, "index"))
+        self.columns = OrderedDict()
+        for name in meta["columns"]:
+            self.columns[str(name)] = np.load(os.path.join(path, "%s.npy" % name), mmap_mode="r")
+
+        self._cache = OrderedDict()
+        self._cacheLock = threading.Lock()
+
+    @staticmethod
+    def pathOf(name):
+        return os.path.join(LocalCatalog.directory, name.lower())
+
+    @staticmethod
+    def exists(name):
+        return os.path.exists(os.path.join(LocalCatalog.pathOf(name), "catalog.json"))
+
+    @staticmethod
+    def open(name):
+        """
+        The catalog installed as name (see directory), opened once per
+        process (so its query cache is shared).
+        """
+        path = LocalCatalog.pathOf(name)
+
+        _openedLock.acquire()
+        try:
+            if path not in _opened:
+                _opened[path] = LocalCatalog(path)
+            return _opened[path]
+        finally:
+            _openedLock.release()
+
+    #
+    # conversion
+    #
+
+    @staticmethod
+    def create(path, name, ra, dec, columns=None, bands=None, metadata=None):
+        """
+        Write a catalog from arrays. ra/dec in degrees, columns a dict
+        of name: array (magnitudes named MAG_<band>), metadata a list of
+        (name, unit, comment) for getMetadata.
+        """
+        columns = OrderedDict(columns or {})
+        bands = list(bands or [column[4:] for column in columns if column.startswith("MAG_")])
+
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+        index = SkyIndex.build(ra, dec)
+
+        # rows in index order, so each zone is contiguous on disk
+        order = np.asarray(index.ids)
+        index.ids = np.arange(len(order))
+        index.save(os.path.join(path, "index"))
+
+        columns["RA"] = np.asarray(ra, dtype=np.float64)
+        columns["DEC"] = np.asarray(dec, dtype=np.float64)
+
+        for column, values in columns.items():
+            np.save(os.path.join(path, "%s.npy" % column), np.asarray(values)[order])
+
+        if metadata is None:
+            metadata = [(column, "arbitrary", "") for column in columns]
+
+        json.dump({"name": name, "bands": bands, "metadata": metadata, "columns": columns.keys()},
+                  open(os.path.join(path, "catalog.json"), "w"), indent=2)
+
+        return LocalCatalog(path)
+
+    @staticmethod
+    def convert(filename, path, name, ra, dec, columns=None, bands=None, metadata=None, **kwargs):
+        """
+        Convert a text catalog (anything astropy.io.ascii reads, extra
+        keyword arguments go to it). ra/dec are column names or numbers
+        (sexagesimal text or degrees), columns a dict of new name:
+        source column (all the other columns by default).
+        """
+        from astropy.io import ascii
+
+        table = ascii.read(filename, **kwargs)
+
+        def column(key):
+            if isinstance(key, int):
+                return table.columns[key]
+            return table[key]
+
+        if columns is None:
+            skip = [column(ra).name, column(dec).name]
+            columns = OrderedDict([(c, c) for c in table.colnames if c not in skip])
+
+        data = OrderedDict([(new, np.asarray(column(old))) for new, old in columns.items()])
+
+        return LocalCatalog.create(path, name,
+                                   columnToDegrees(column(ra), hours=True),
+                                   columnToDegrees(column(dec)),
+                                   data, bands, metadata)
+
+    #
+    # Catalog interface
+    #
+
+    def getName(self):
+        return self.name
+
+    def getMetadata(self):
+        return self.metadata + [("R", "arcsec", "Distance from the target")]
+
+    def getMagnitudeBands(self):
+        return self.bands
+
+    def find(self, near, limit=None, **conditions):
+
+        ra, dec = self._center(near)
+        limit = limit or 100
+
+        key = (round(ra, 9), round(dec, 9), limit,
+               tuple(sorted([(k, tuple(v) if type(v) == ListType else v) for k, v in conditions.items()])))
+
+        self._cacheLock.acquire()
+        try:
+            if key in self._cache:
+                rows = self._cache.pop(key)
+                self._cache[key] = rows
+                return [dict(row) for row in rows]
+        finally:
+            self._cacheLock.release()
+
+        rows = self._find(ra, dec, limit, conditions)
+
+        self._cacheLock.acquire()
+        try:
+            self._cache[key] = rows
+            while len(self._cache) > self.cacheSize:
+                self._cache.popitem(last=False)
+        finally:
+            self._cacheLock.release()
+
+        return [dict(row) for row in rows]
+
+    def _center(self, near):
+        if near is None:
+            near = "00:00:00 +00:00:00"
+
+        if isinstance(near, Position):
+            return near.ra.D, near.dec.D
+
+        if type(near) in (TupleType, ListType) and len(near) == 2:
+            position = Position.fromRaDec(*near)
+            return position.ra.D, position.dec.D
+
+        if isinstance(near, basestring):
+            # "ra dec" or "hh mm ss dd mm ss"
+            fields = near.split()
+            if len(fields) == 6:
+                fields = [" ".join(fields[:3]), " ".join(fields[3:])]
+
+            if len(fields) == 2:
+                try:
+                    position = Position.fromRaDec(str(fields[0]), str(fields[1]))
+                    return position.ra.D, position.dec.D
+                except ValueError:
+                    pass
+
+        raise ValueError("Can't resolve '%s' on a local catalog, give coordinates." % str(near))
+
+    def _magnitudeMask(self, rows, conditions):
+        mask = np.ones(len(rows), dtype=np.bool)
+
+        for key, value in conditions.items():
+            if not key.startswith("mag"):
+                continue
+
+            band = key[3:]
+            if band not in self.bands:
+                log.warning("%s has no %s magnitudes, ignoring %s." % (self.name, band, key))
+                continue
+
+            mag = np.asarray(self.columns["MAG_%s" % band][rows], dtype=np.float64)
+
+            if type(value) == TupleType and len(value) >= 2:
+                mask &= (mag >= value[0]) & (mag <= value[1])
+            else:
+                mask &= (mag <= value)
+
+        return mask
+
+    def _find(self, ra, dec, limit, conditions):
+
+        for key in conditions:
+            if not key.startswith("mag") and key not in ("radius", "box", "closest"):
+                log.warning("Unknown keyword %s ignored." % key)
+
+        if "radius" in conditions and "box" in conditions:
+            raise TypeError("radius and box cannot be used together.")
+
+        if conditions.get("closest", False):
+            limit = 1
+            spatial = None
+        elif "radius" in conditions:
+            spatial = float(conditions["radius"]) / 3600.0
+        elif "box" in conditions:
+            box = conditions["box"]
+            if type(box) not in (TupleType, ListType):
+                box = (box, box)
+            width, height = float(box[0]) / 3600.0, float(box[1]) / 3600.0
+            spatial = np.hypot(width / 2, height / 2)
+        else:
+            spatial = None
+
+        if spatial is not None:
+            rows, dist = self.index.cone(ra, dec, spatial)
+
+            if "box" in conditions and not conditions.get("closest", False):
+                dRa = (np.asarray(self.columns["RA"][rows]) - ra + 180.0) % 360.0 - 180.0
+                dDec = np.asarray(self.columns["DEC"][rows]) - dec
+                inside = (np.abs(dRa * np.cos(np.radians(dec))) <= width / 2) & (np.abs(dDec) <= height / 2)
+                rows, dist = rows[inside], dist[inside]
+
+            mask = self._magnitudeMask(rows, conditions)
+            rows, dist = rows[mask], dist[mask]
+        else:
+            # no spatial limit, the closest ones that pass the magnitude
+            # limits (looking further until there are enough)
+            k = limit
+            while True:
+                rows, dist = self.index.nearest(ra, dec, k)
+                mask = self._magnitudeMask(rows, conditions)
+                if mask.sum() >= limit or k >= len(self.index):
+                    break
+                k = min(k * 4, len(self.index))
+
+            rows, dist = rows[mask], dist[mask]
+
+        rows, dist = rows[:limit], dist[:limit]
+
+        return self._rows(rows, dist)
+
+    def _rows(self, rows, dist):
+        values = [(name, np.asarray(column[rows]).tolist()) for name, column in self.columns.items()
+                  if name not in ("RA", "DEC")]
+
+        ra = np.asarray(self.columns["RA"][rows]).tolist()
+        dec = np.asarray(self.columns["DEC"][rows]).tolist()
+        r = (dist * 3600.0).tolist()
+
+        result = []
+        for i in range(len(rows)):
+            row = dict([(name, column[i]) for name, column in values])
+            row["RA"] = Coord.fromD(ra[i]).toHMS()
+            row["DEC"] = Coord.fromD(dec[i]).toDMS()
+            row["R"] = r[i]
+            result.append(row)
+
+        return result
@@ -5,6 +5,7 @@ import os
 
 from chimera.util.catalog import Catalog
 from chimera.util.scat import SCatWrapper
+from chimera.util.catalogs.local import LocalCatalog
 
 
 class PPM (Catalog):
@@ -30,6 +31,10 @@ class PPM (Catalog):
 
     def find(self, near, limit=None, **conditions):
 
+        # a converted copy doesn't need scat (see LocalCatalog)
+        if LocalCatalog.exists(self.getName()):
+            return LocalCatalog.open(self.getName()).find(near, limit, **conditions)
+
         scat_options = {"catalog": "ppm",
                         "near": near or "00:00:00 +00:00:00",
                         "limit": limit or 100,
@@ -5,6 +5,7 @@ import os
 
 from chimera.util.catalog import Catalog
 from chimera.util.scat import SCatWrapper
+from chimera.util.catalogs.local import LocalCatalog
 
 
 class UCAC2 (Catalog):
@@ -32,6 +33,10 @@ class UCAC2 (Catalog):
 
     def find(self, near, limit=None, **conditions):
 
+        # a converted copy doesn't need scat (see LocalCatalog)
+        if LocalCatalog.exists(self.getName()):
+            return LocalCatalog.open(self.getName()).find(near, limit, **conditions)
+
         scat_options = {"catalog": "ucac2",
                         "near": near or "00:00:00 +00:00:00",
                         "limit": limit or 100,
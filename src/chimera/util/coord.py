@@ -25,6 +25,8 @@ import re
 import sys
 from types import StringType, LongType, IntType, FloatType
 
+import numpy as np
+
 TWO_PI = 2.0 * math.pi
 PI_OVER_TWO = (math.pi / 2.0)
 
@@ -49,6 +51,7 @@ except ImportError:
 
 
 __all__ = ['Coord',
+           'CoordArray',
            'CoordUtil']
 
 
@@ -111,6 +114,14 @@ class CoordUtil (object):
             else:
                 mm += 1
 
+        # and the minutes into degrees (29.999999999999996 is 30:00:00)
+        if abs(mm) == 60:
+            mm = 0
+            if d < 0:
+                dd -= 1
+            else:
+                dd += 1
+
         sign = 1
         if d < 0:
             sign *= -1
@@ -233,27 +244,7 @@ class CoordUtil (object):
             default = '%(d)02d:%(m)02d:%(s)06.3f'
 
         format = format or default
-
-        # find required precision on seconds
-        need = None
-        if "%(s)" in format:
-            need = "%(s)"
-        if "%(ss)" in format:
-            need = "%(ss)"
-
-        sec_prec = None
-
-        if need:
-            try:
-                ss_index = format.index(need)
-                sec_prec = format[ss_index:format.index('f', ss_index)]
-                parts = sec_prec.split(".")
-
-                if len(parts) == 2:
-                    sec_prec = int(parts[1]) + 1
-            except ValueError:
-                # got a %d or something not like a float
-                pass
+        sec_prec = CoordUtil._secondsPrecision(format)
 
         sign, d, dm, ds = CoordUtil.d2dms(c.D, sec_prec)
         _, h, hm, hs = CoordUtil.d2hms(c.D, sec_prec)
@@ -287,6 +278,31 @@ class CoordUtil (object):
         else:
             return format % subs
 
+    @staticmethod
+    def _secondsPrecision(format):
+        # find required precision on seconds
+        need = None
+        if "%(s)" in format:
+            need = "%(s)"
+        if "%(ss)" in format:
+            need = "%(ss)"
+
+        sec_prec = None
+
+        if need:
+            try:
+                ss_index = format.index(need)
+                sec_prec = format[ss_index:format.index('f', ss_index)]
+                parts = sec_prec.split(".")
+
+                if len(parts) == 2:
+                    sec_prec = int(parts[1]) + 1
+            except ValueError:
+                # got a %d or something not like a float
+                pass
+
+        return sec_prec
+
     @staticmethod
     def coordToR(coord):
         if isinstance(coord, Coord):
@@ -824,3 +840,229 @@ class Coord (object):
             else:
                 other = Coord.fromState(other, State.D)
         return self.D >= other.D
+
+
+class CoordArray (object):
+
+    """
+    Many coordinates at once, as a float64 NumPy array of radians.
+
+    Same factories, getters and string formatting of L{Coord}, but
+    each one is a single array operation instead of one object (and
+    one conversion) per value. Use it when handling catalogs or many
+    targets, L{Coord} otherwise.
+
+    >>> ra = CoordArray.fromHMS(['10:00:00', '12:30:00'])
+    >>> ra.D
+    array([ 150. ,  187.5])
+    >>> ra.strfcoord()
+    ['10:00:00.000', '12:30:00.000']
+
+    Indexing with an integer gives a L{Coord}, with slices or masks
+    another CoordArray.
+    """
+
+    def __init__(self, r, state=State.D):
+        self.r = np.asarray(r, dtype=np.float64)
+        self.state = state
+
+    def __getstate__(self):
+        return {"r": self.r, "state": str(self.state)}
+
+    def __setstate__(self, state):
+        self.r = state["r"]
+        self.state = State.fromStr(state["state"])
+
+    #
+    # factories
+    #
+
+    @staticmethod
+    def fromHMS(c):
+        return CoordArray(np.radians(CoordArray._parse(c) * 15.0), State.HMS)
+
+    @staticmethod
+    def fromDMS(c):
+        return CoordArray(np.radians(CoordArray._parse(c)), State.DMS)
+
+    @staticmethod
+    def fromD(c):
+        return CoordArray(np.radians(np.asarray(c, dtype=np.float64)), State.D)
+
+    @staticmethod
+    def fromH(c):
+        return CoordArray(np.radians(np.asarray(c, dtype=np.float64) * 15.0), State.H)
+
+    @staticmethod
+    def fromR(c):
+        return CoordArray(c, State.R)
+
+    @staticmethod
+    def fromAS(c):
+        return CoordArray(np.radians(np.asarray(c, dtype=np.float64) / 3600.0), State.AS)
+
+    @staticmethod
+    def fromCoords(coords, state=None):
+        coords = list(coords)
+        if state is None:
+            state = coords[0].state if coords else State.D
+        return CoordArray(np.radians([c.D for c in coords]), state)
+
+    @staticmethod
+    def _parse(c):
+        """
+        Sexagesimal strings (or numbers) to decimal values. Plain
+        'dd:mm:ss.s' (or 'dd mm ss.s') strings are parsed in one go,
+        anything else goes through CoordUtil.dms2d.
+        """
+        if isinstance(c, np.ndarray) and c.dtype.kind in "iuf":
+            return c.astype(np.float64)
+
+        values = np.empty(len(c), dtype=np.float64)
+
+        for i, v in enumerate(c):
+            if not isinstance(v, basestring):
+                values[i] = float(v)
+                continue
+
+            fields = v.replace(":", " ").split()
+
+            try:
+                if len(fields) != 3:
+                    raise ValueError()
+                d = abs(int(fields[0])) + int(fields[1]) * CoordUtil._min2deg + \
+                    float(fields[2]) * CoordUtil._arcsec2deg
+                if fields[0].startswith("-"):
+                    d = -d
+                values[i] = d
+            except ValueError:
+                values[i] = CoordUtil.dms2d(str(v))
+
+        return values
+
+    #
+    # conversion factories (same values, another state)
+    #
+    def toHMS(self):
+        return CoordArray(self.r, State.HMS)
+
+    def toDMS(self):
+        return CoordArray(self.r, State.DMS)
+
+    def toD(self):
+        return CoordArray(self.r, State.D)
+
+    def toH(self):
+        return CoordArray(self.r, State.H)
+
+    def toR(self):
+        return CoordArray(self.r, State.R)
+
+    def toAS(self):
+        return CoordArray(self.r, State.AS)
+
+    def toCoords(self, state=None):
+        """
+        List of L{Coord}, in the given state (or this array's).
+        """
+        state = state or self.state
+        return [Coord(d, state) for d in self.D.tolist()]
+
+    #
+    # primitive getters
+    #
+
+    D = property(lambda self: np.degrees(self.r))
+    H = property(lambda self: np.degrees(self.r) / 15.0)
+    R = property(lambda self: self.r)
+    AS = property(lambda self: np.degrees(self.r) * 3600.0)
+
+    # (sign, degrees/hours, minutes, seconds) arrays
+    HMS = property(lambda self: CoordArray._d2dms(self.H))
+    DMS = property(lambda self: CoordArray._d2dms(self.D))
+
+    def __len__(self):
+        return len(self.r)
+
+    def __getitem__(self, item):
+        if isinstance(item, (int, long, np.integer)):
+            return Coord(float(np.degrees(self.r[item])), self.state)
+        return CoordArray(self.r[item], self.state)
+
+    def __iter__(self):
+        return iter(self.toCoords())
+
+    def __eq__(self, other):
+        if isinstance(other, CoordArray):
+            return self.r.shape == other.r.shape and bool(np.all(self.r == other.r))
+        return False
+
+    def __ne__(self, other):
+        return not (self == other)
+
+    #
+    # string conversions
+    #
+
+    def __repr__(self):
+        return '<%s object %d coords (%s) at %s>' % (CoordArray.__name__, len(self),
+                                                     self.state, hex(id(self))[:-1])
+
+    def __str__(self):
+        return "[%s]" % ", ".join(self.strfcoord())
+
+    @staticmethod
+    def _d2dms(d, sec_prec=None):
+        # CoordUtil.d2dms, one array at a time. Seconds are rounded to
+        # the format's decimals as a total before splitting, so 59.9999
+        # seconds carry into minutes and degrees (and never show as 60)
+        if sec_prec is None:
+            decimals = 8
+        else:
+            decimals = sec_prec - 1
+
+        ss = np.round(np.abs(d) * 3600.0, decimals)
+        dd = np.floor(ss / 3600.0)
+        ss = ss - dd * 3600.0
+        mm = np.floor(ss / 60.0)
+        ss = ss - mm * 60.0
+
+        sign = np.where(d < 0, -1, 1)
+
+        return (sign, dd, mm, ss)
+
+    def strfcoord(self, format=None, signed=True):
+        """
+        List of strings, each one as L{CoordUtil.strfcoord} would
+        format the respective L{Coord}.
+        """
+        if self.state == State.HMS:
+            default = '%(h)02d:%(m)02d:%(s)06.3f'
+        elif self.state == State.DMS:
+            default = '%(d)02d:%(m)02d:%(s)06.3f'
+        else:
+            return ['%.2f' % v for v in self.get().tolist()]
+
+        format = format or default
+        sec_prec = CoordUtil._secondsPrecision(format)
+
+        d = self.D
+        sign, dd, dm, ds = CoordArray._d2dms(d, sec_prec)
+        _, h, hm, hs = CoordArray._d2dms(d / 15, sec_prec)
+
+        if '(h)' in format or '(hh)' in format:
+            m, s = hm, hs
+            signs = np.where(sign < 0, "-", "")
+        else:
+            m, s = dm, ds
+            signs = np.where(sign < 0, "-", "+")
+
+        if not signed:
+            signs = [""] * len(d)
+
+        return [sign_str + format % dict(d=d, dd=d, m=m, mm=m, s=s, ss=s, h=h, hh=h)
+                for sign_str, d, m, s, h in zip(signs, dd.astype(int).tolist(), m.astype(int).tolist(),
+                                                s.tolist(), h.astype(int).tolist())]
+
+    def get(self, state=None):
+        return getattr(self, str(state or self.state))
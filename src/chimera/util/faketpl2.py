@@ -0,0 +1,252 @@
+#! /usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+# chimera - observatory automation system
+# Copyright (C) 2006-2007  P. Henrique Silva <henrique@astro.ufsc.br>
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.
+
+import socket
+import threading
+import SocketServer
+import logging
+
+from chimera.util.tpl2 import parseValue, formatValue
+
+log = logging.getLogger(__name__)
+
+__all__ = ['FakeTPL2Server']
+
+
+class FakeTPL2Handler (SocketServer.StreamRequestHandler):
+
+    disable_nagle_algorithm = True
+
+    def handle(self):
+        self._writeLock = threading.Lock()
+
+        self.write("TPL2 VERSION=2.0 FAKE")
+        self.write("AUTH PLAIN")
+
+        auth = self.rfile.readline().strip()
+        if not auth.startswith("AUTH PLAIN"):
+            self.write("AUTH FAILED")
+            return
+        self.write("AUTH OK 0 0")
+
+        try:
+            while True:
+                line = self.rfile.readline()
+                if not line or line.strip() == "DISCONNECT":
+                    break
+
+                fields = line.strip().split(" ", 2)
+                if len(fields) < 2:
+                    continue
+
+                # every command on its own, after the configured
+                # latency, so answers interleave as on a busy server
+                timer = threading.Timer(self.server.latency, self.server.execute,
+                                        args=(self, int(fields[0]), fields[1],
+                                              fields[2] if len(fields) > 2 else ""))
+                timer.setDaemon(True)
+                timer.start()
+        except socket.error:
+            pass
+
+    def write(self, line):
+        self._writeLock.acquire()
+        try:
+            self.wfile.write(line + "\n")
+            self.wfile.flush()
+        except (socket.error, AttributeError, ValueError):
+            # client gone (the file is closed under us)
+            pass
+        finally:
+            self._writeLock.release()
+
+
+class FakeTPL2Server (SocketServer.ThreadingMixIn, SocketServer.TCPServer):
+
+    """
+    A local TPL2 server that behaves enough like an Astelco mount to
+    run the Astelco driver and L{TPL2} against it (tests and
+    benchmarks). Every command is answered after latency seconds,
+    slews take slewTime and cover/ready changes moveTime.
+
+    >>> server = FakeTPL2Server(latency=0.005)
+    >>> server.start()
+    >>> tpl = TPL2(host="localhost", port=server.port)
+    """
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, host="localhost", port=0, latency=0.0, slewTime=1.0, moveTime=1.0):
+        SocketServer.TCPServer.__init__(self, (host, port), FakeTPL2Handler)
+
+        self.host, self.port = self.server_address
+
+        self.latency = latency
+        self.slewTime = slewTime
+        self.moveTime = moveTime
+
+        self.commands = 0
+
+        self._lock = threading.Lock()
+        self._motions = {}
+        self._thread = None
+
+        self.objects = {"SERVER.UPTIME": 0,
+                        "TELESCOPE.CONFIG.MOUNTOPTIONS": "AZ-ZD",
+                        "TELESCOPE.MOTION_STATE": 0,
+                        "TELESCOPE.READY_STATE": 1.0,
+                        "TELESCOPE.READY": 1,
+                        "TELESCOPE.STOP": 0,
+                        "POINTING.TRACK": 1,
+                        "POINTING.SLEWTIME": slewTime,
+                        "POINTING.SETUP.LOCAL.LATITUDE": -22.5,
+                        "POINTING.SETUP.LOCAL.LONGITUDE": -45.6,
+                        "POSITION.EQUATORIAL.RA_J2000": 10.0,
+                        "POSITION.EQUATORIAL.DEC_J2000": -20.0,
+                        "POSITION.HORIZONTAL.AZ": 120.0,
+                        "POSITION.HORIZONTAL.ALT": 60.0,
+                        "POSITION.LOCAL.UTC": 0.0,
+                        "POSITION.LOCAL.SIDEREAL": 10.0,
+                        "OBJECT.EQUATORIAL.RA": 10.0,
+                        "OBJECT.EQUATORIAL.DEC": -20.0,
+                        "OBJECT.HORIZONTAL.AZ": 120.0,
+                        "OBJECT.HORIZONTAL.ALT": 60.0,
+                        "AUXILIARY.COVER.TARGETPOS": 0,
+                        "AUXILIARY.COVER.REALPOS": 0.0}
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name="fake TPL2 server")
+        self._thread.setDaemon(True)
+        self._thread.start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def execute(self, handler, id, kind, args):
+
+        self._lock.acquire()
+        try:
+            self.commands += 1
+        finally:
+            self._lock.release()
+
+        if kind == "GET":
+            handler.write("%d COMMAND OK" % id)
+            for name in args.split(";"):
+                name = name.strip()
+                self._lock.acquire()
+                try:
+                    known = name in self.objects
+                    value = self.objects.get(name)
+                finally:
+                    self._lock.release()
+
+                if known:
+                    handler.write("%d DATA INLINE %s=%s" % (id, name, formatValue(value)))
+                else:
+                    handler.write("%d DATA ERROR %s:UNKNOWN" % (id, name))
+            handler.write("%d COMMAND COMPLETE" % id)
+
+        elif kind == "SET":
+            name, _, value = args.partition("=")
+            name, value = name.strip(), parseValue(value)
+
+            handler.write("%d COMMAND OK" % id)
+            self._set(handler, id, name, value)
+
+        else:
+            handler.write("%d COMMAND ERROR UNKNOWN COMMAND %s" % (id, kind))
+
+    def _set(self, handler, id, name, value):
+
+        aborted = []
+
+        self._lock.acquire()
+        try:
+            self.objects[name] = value
+
+            if name == "TELESCOPE.STOP" and value:
+                for motionId, (motion, motionHandler) in self._motions.items():
+                    motion.cancel()
+                    aborted.append((motionId, motionHandler))
+                self._motions.clear()
+                self.objects["TELESCOPE.MOTION_STATE"] = 0
+
+            if name == "POINTING.TRACK" and value in (1, 2):
+                done = self._slewDone
+                duration = self.slewTime
+                self.objects["TELESCOPE.MOTION_STATE"] = 1
+            elif name == "TELESCOPE.READY":
+                done = self._readyDone
+                duration = self.moveTime
+            elif name == "AUXILIARY.COVER.TARGETPOS":
+                done = self._coverDone
+                duration = self.moveTime
+            else:
+                done = None
+        finally:
+            self._lock.release()
+
+        for motionId, motionHandler in aborted:
+            motionHandler.write("%d COMMAND ERROR ABORTED" % motionId)
+
+        if done is None:
+            handler.write("%d COMMAND COMPLETE" % id)
+            return
+
+        # motions end with the command (COMMAND COMPLETE is the event
+        # clients wait for)
+        motion = threading.Timer(duration, self._finish, args=(handler, id, done))
+        motion.setDaemon(True)
+
+        self._lock.acquire()
+        try:
+            self._motions[id] = (motion, handler)
+        finally:
+            self._lock.release()
+
+        motion.start()
+
+    def _finish(self, handler, id, done):
+        self._lock.acquire()
+        try:
+            # aborted meanwhile
+            if self._motions.pop(id, None) is None:
+                return
+            done()
+        finally:
+            self._lock.release()
+
+        handler.write("%d COMMAND COMPLETE" % id)
+
+    def _slewDone(self):
+        objects = self.objects
+        objects["TELESCOPE.MOTION_STATE"] = 0
+        objects["POSITION.EQUATORIAL.RA_J2000"] = objects["OBJECT.EQUATORIAL.RA"]
+        objects["POSITION.EQUATORIAL.DEC_J2000"] = objects["OBJECT.EQUATORIAL.DEC"]
+
+    def _readyDone(self):
+        self.objects["TELESCOPE.READY_STATE"] = float(self.objects["TELESCOPE.READY"])
+
+    def _coverDone(self):
+        self.objects["AUXILIARY.COVER.REALPOS"] = float(self.objects["AUXILIARY.COVER.TARGETPOS"])
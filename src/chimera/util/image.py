@@ -36,6 +36,63 @@ class WCSNotFoundException (ChimeraException):
     pass
 
 
+# files are streamed through the compressors in chunks of this size
+COMPRESS_CHUNK = 1024 * 1024
+
+# compression format -> extension added to the compressed file. rice
+# and hcompress are FITS tile compression, readable by FITS tools.
+COMPRESS_FORMATS = {"bz2": ".bz2",
+                    "gzip": ".gz",
+                    "zip": ".zip",
+                    "rice": ".fz",
+                    "hcompress": ".fz"}
+
+
+def compressFile(filename, format="bz2"):
+    """
+    Compress filename using the given format (see COMPRESS_FORMATS),
+    remove the original and return the name of the compressed file.
+    """
+
+    format = format.lower()
+
+    if format not in COMPRESS_FORMATS:
+        raise ValueError("Unknown compression format '%s'" % format)
+
+    compressed = filename + COMPRESS_FORMATS[format]
+
+    if format in ("rice", "hcompress"):
+        # keep raw (scaled) integers, tile compression needs them
+        src = fits.open(filename, do_not_scale_image_data=True, memmap=True)
+        try:
+            hdu = fits.CompImageHDU(data=src[0].data, header=src[0].header,
+                                    compression_type="%s_1" % format.upper())
+            fits.HDUList([fits.PrimaryHDU(), hdu]).writeto(compressed,
+                                                          overwrite=True)
+        finally:
+            src.close()
+    elif format == "zip":
+        zipfp = zipfile.ZipFile(compressed, 'w', zipfile.ZIP_DEFLATED)
+        zipfp.write(filename, os.path.basename(filename))
+        zipfp.close()
+    else:
+        if format == "bz2":
+            outfp = bz2.BZ2File(compressed, 'wb', compresslevel=4)
+        else:
+            outfp = gzip.GzipFile(compressed, 'wb', compresslevel=5)
+
+        rawfp = open(filename, 'rb')
+        try:
+            shutil.copyfileobj(rawfp, outfp, COMPRESS_CHUNK)
+        finally:
+            rawfp.close()
+            outfp.close()
+
+    os.unlink(filename)
+
+    return compressed
+
+
 class ImageUtil (object):
 
     @staticmethod
@@ -158,7 +215,16 @@ class Image (DictMixin, RemoteObject):
         return img
 
     @staticmethod
-    def create(data, imageRequest=None, filename=None):
+    def create(data, imageRequest=None, filename=None, headers=None):
+        """
+        Write data to a new FITS file with all the given headers (plus
+        the ones from imageRequest) and return the Image for it.
+
+        The file is written exactly once: CHM_ID is stamped before
+        writing (so ImageServer.register doesn't have to touch the file
+        again) and the written header is kept in memory instead of
+        reopening the file to read it back.
+        """
 
         if imageRequest:
             try:
@@ -170,31 +236,41 @@ class Image (DictMixin, RemoteObject):
 
         filename = ImageUtil.makeFilename(filename)
 
+        img = Image(filename, None)
+
         hdu = fits.PrimaryHDU(data)
 
-        headers = [("DATE", ImageUtil.formatDate(dt.datetime.utcnow()), "date of file creation"),
-                   ("CREATOR", _chimera_name_, _chimera_long_description_)]
+        cards = [("DATE", ImageUtil.formatDate(dt.datetime.utcnow()), "date of file creation"),
+                 ("CREATOR", _chimera_name_, _chimera_long_description_)]
 
         # TODO: Implement BITPIX support
         hdu.scale('int16', '', bzero=32768, bscale=1)
 
         if imageRequest:
-            headers += imageRequest.headers
+            cards += imageRequest.headers
 
-        for header in headers:
+        if headers:
+            cards += headers
+
+        cards.append(("CHM_ID", img.GUID()))
+
+        for card in cards:
             try:
-                hdu.header.set(*header)
+                hdu.header.set(*card)
             except Exception, e:
-                log.warning("Couldn't add %s: %s" % (str(header), str(e)))
+                log.warning("Couldn't add %s: %s" % (str(card), str(e)))
 
         hduList = fits.HDUList([hdu])
         hduList.writeto(filename)
         hduList.close()
 
+        # keep only the header, pixels stay on disk
+        img._header = hdu.header
+
         del hduList
         del hdu
 
-        return Image.fromFile(filename)
+        return img
 
     #
     # standard constructor
@@ -206,21 +282,41 @@ class Image (DictMixin, RemoteObject):
         self._filename = filename
         self._http = None
         self._wcs = None
+        self._compressed = None
+
+        # header of a file we just wrote (see create), used for reading
+        # until something needs the file itself
+        self._header = None
 
     filename = lambda self: self._filename
 
     def close(self):
-        self._fd.close()
-
-    def compressedFilename(self):
-        if os.path.exists(self._filename + ".bz2"):
-            return self._filename + ".bz2"
-        elif os.path.exists(self._filename + ".gzip"):
-            return self._filename + ".gzip"
-        elif os.path.exists(self._filename + ".zip"):
-            return self._filename + ".zip"
-        else:
-            return self._filename
+        if self._fd is not None:
+            self._fd.close()
+
+    def _getFd(self):
+        if self._fd is None:
+            self._fd = fits.open(self._filename, mode="update")
+            self._header = None
+        return self._fd
+
+    def _getHeader(self):
+        if self._header is not None:
+            return self._header
+        return self._getFd()["PRIMARY"].header
+
+    def compressedFilename(self, filename=None):
+        if filename:
+            self._compressed = filename
+
+        if self._compressed:
+            return self._compressed
+
+        for ext in (".bz2", ".gz", ".zip", ".fz"):
+            if os.path.exists(self._filename + ext):
+                return self._filename + ext
+
+        return self._filename
 
     def http(self, http=None):
         if http:
@@ -232,15 +328,16 @@ class Image (DictMixin, RemoteObject):
 
     #
     # serialization support
-    # we close before pickle and reopen after it
+    # we close before pickle and reopen (when needed) after it
     #
     def __getstate__(self):
-        self._fd.close()
+        if self._fd is not None:
+            self._fd.close()
+            self._fd = None
         return self.__dict__
 
     def __setstate__(self, args):
         self.__dict__ = args
-        self._fd = fits.open(self._filename, mode="update")
 
     #
     # geometry
@@ -286,7 +383,7 @@ class Image (DictMixin, RemoteObject):
 
         if not self._wcs:
             try:
-                self._wcs = wcs.WCS(self._fd["PRIMARY"].header)
+                self._wcs = wcs.WCS(self._getHeader())
             except (KeyError, ValueError), e:
                 raise WCSNotFoundException(
                     "Couldn't find WCS information on %s ('%s')" % (self._filename, e))
@@ -360,40 +457,19 @@ class Image (DictMixin, RemoteObject):
     #
 
     def fix(self):
-        self._fd.verify('fix')
+        self._getFd().verify('fix')
 
     def save(self, filename=None, verify='exception'):
 
         if filename:
-            self._fd.writeto(filename, output_verify=verify)
+            self._getFd().writeto(filename, output_verify=verify)
         else:
-            self._fd.flush(output_verify=verify)
+            self._getFd().flush(output_verify=verify)
 
         return True
 
     def _doCompress(self, filename, format):
-        if format.lower() == "bz2":
-            bzfilename = filename + '.bz2'
-            bzfp = bz2.BZ2File(bzfilename, 'wb', compresslevel=4)
-            rawfp = open(filename)
-            bzfp.write(rawfp.read())
-            bzfp.close()
-            rawfp.close()
-            os.unlink(filename)
-        elif format.lower() == "gzip":
-            gzfilename = filename + '.gz'
-            gzfp = gzip.GzipFile(gzfilename, 'wb', compresslevel=5)
-            rawfp = open(filename)
-            gzfp.write(rawfp.read())
-            gzfp.close()
-            rawfp.close()
-            os.unlink(filename)
-        else:  # zip
-            zipfilename = filename + '.zip'
-            zipfp = zipfile.ZipFile(zipfilename, 'w', zipfile.ZIP_DEFLATED)
-            zipfp.write(filename, os.path.basename(filename))
-            zipfp.close()
-            os.unlink(filename)
+        self._compressed = compressFile(filename, format)
 
     def compress(self, format="bz2", multiprocess=False):
 
@@ -407,7 +483,7 @@ class Image (DictMixin, RemoteObject):
 
     # dict mixin implementation for headers
     def __getitem__(self, key):
-        return self._fd["PRIMARY"].header.__getitem__(key)
+        return self._getHeader().__getitem__(key)
 
     def __setitem__(self, key, value):
 
@@ -415,19 +491,19 @@ class Image (DictMixin, RemoteObject):
             self += (key, value)
             return True
 
-        return self._fd["PRIMARY"].header.__setitem__(key, value)
+        return self._getFd()["PRIMARY"].header.__setitem__(key, value)
 
     def __delitem__(self, key):
-        return self._fd["PRIMARY"].header.__delitem__(key)
+        return self._getFd()["PRIMARY"].header.__delitem__(key)
 
     def keys(self):
-        return [item[0] for item in self._fd["PRIMARY"].header.items()]
+        return [item[0] for item in self._getHeader().items()]
 
     def items(self):
-        return self._fd["PRIMARY"].header.items()
+        return self._getHeader().items()
 
     def __contains__(self, key):
-        return key in self._fd["PRIMARY"].header
+        return key in self._getHeader()
 
     def __iter__(self):
         for k in self.keys():
@@ -454,7 +530,7 @@ class Image (DictMixin, RemoteObject):
             headers = [headers]
 
         for header in headers:
-            self._fd["PRIMARY"].header.set(*header)
+            self._getFd()["PRIMARY"].header.set(*header)
 
         self.save()
 
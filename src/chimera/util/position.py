@@ -1,8 +1,8 @@
 # to allow use outsise chimera
 try:
-    from chimera.util.coord import Coord, CoordUtil
+    from chimera.util.coord import Coord, CoordArray, CoordUtil, State
 except ImportError:
-    from coord import Coord, CoordUtil
+    from coord import Coord, CoordArray, CoordUtil, State
 
 try:
     from chimera.util.enum import Enum
@@ -10,10 +10,11 @@ except ImportError:
     from enum import Enum
 
 import ephem
+import numpy as np
 from types import StringType
 
 
-__all__ = ['Position']
+__all__ = ['Position', 'PositionArray']
 
 
 Epoch = Enum("J2000", "B1950", "NOW")
@@ -383,3 +384,257 @@ class Position (object):
 
         return Position.fromRaDec(
             CoordUtil.makeValid0to360(ra), CoordUtil.makeValid180to180(decR))
+
+
+def _ephemEpoch(epoch):
+    # same epochs Position.toEphem/precess use
+    if str(epoch).lower() == str(Epoch.J2000).lower():
+        return ephem.J2000
+    elif str(epoch).lower() == str(Epoch.B1950).lower():
+        return ephem.B1950
+    elif str(epoch).lower() == str(Epoch.NOW).lower():
+        return ephem.now()
+    return ephem.Date(epoch)
+
+
+def _precessionMatrix(epoch):
+    """
+    J2000 to mean equator and equinox of epoch (an ephem date),
+    IAU 1976 (Lieske) precession angles.
+    """
+    t = (float(epoch) - float(ephem.J2000)) / 36525.0
+
+    zeta = np.radians((2306.2181 * t + 0.30188 * t ** 2 + 0.017998 * t ** 3) / 3600.0)
+    z = np.radians((2306.2181 * t + 1.09468 * t ** 2 + 0.018203 * t ** 3) / 3600.0)
+    theta = np.radians((2004.3109 * t - 0.42665 * t ** 2 - 0.041833 * t ** 3) / 3600.0)
+
+    def rz(a):
+        return np.array([[np.cos(a), -np.sin(a), 0], [np.sin(a), np.cos(a), 0], [0, 0, 1]])
+
+    def ry(a):
+        return np.array([[np.cos(a), 0, -np.sin(a)], [0, 1, 0], [np.sin(a), 0, np.cos(a)]])
+
+    return np.dot(rz(z), np.dot(ry(theta), rz(zeta)))
+
+
+class PositionArray (object):
+
+    """
+    Many positions at once, the array counterpart of L{Position}.
+
+    Coordinates are kept as two L{CoordArray} (float64 radians), so
+    conversions, precession, distances and alt/az transformations are
+    single NumPy operations instead of a few objects per point. Same
+    factories (and the same assumptions about strings and numbers) of
+    L{Position}:
+
+    >>> p = PositionArray.fromRaDec(['10:00:00', '12:00:00'], ['-30:00:00', '+10:00:00'])
+    >>> p = PositionArray.fromRaDec(ra_hours, dec_degrees)  # arrays
+    >>> p = PositionArray.fromPositions([Position.fromRaDec(10, 20), ...])
+
+    Indexing with an integer gives a L{Position}, with slices or masks
+    another PositionArray.
+    """
+
+    @staticmethod
+    def fromRaDec(ra, dec, epoch=Epoch.J2000):
+
+        try:
+            ra = PositionArray._coordArray(ra, CoordArray.fromHMS)
+        except ValueError:
+            raise ValueError("Invalid RA coordinates")
+
+        PositionArray._checkRange(ra, 0, 360,
+                                  "Invalid RA range. Must be between 0-24 hours or 0-360 deg.")
+
+        try:
+            dec = PositionArray._coordArray(dec, CoordArray.fromDMS)
+        except ValueError:
+            raise ValueError("Invalid DEC coordinates")
+
+        PositionArray._checkRange(dec, -90, 360,
+                                  "Invalid DEC range. Must be between 0-360 deg or -90 - +90 deg.")
+
+        return PositionArray((ra.toHMS(), dec.toDMS()), system=System.CELESTIAL, epoch=epoch)
+
+    @staticmethod
+    def fromAltAz(alt, az):
+
+        try:
+            az = PositionArray._coordArray(az, CoordArray.fromDMS)
+            alt = PositionArray._coordArray(alt, CoordArray.fromDMS)
+        except ValueError:
+            raise ValueError("Invalid ALT/AZ coordinates")
+
+        PositionArray._checkRange(az, -180, 360,
+                                  "Invalid AZ range. Must be between 0-360 deg or -180 - +180 deg.")
+        PositionArray._checkRange(alt, -90, 180,
+                                  "Invalid ALT range. Must be between 0-180 deg or -90 - +90 deg.")
+
+        return PositionArray((alt.toDMS(), az.toDMS()), system=System.TOPOCENTRIC)
+
+    @staticmethod
+    def fromPositions(positions):
+        positions = list(positions)
+        if not positions:
+            return PositionArray((CoordArray.fromD([]), CoordArray.fromD([])))
+
+        first = positions[0]
+        coords = (CoordArray.fromCoords([p.coords[0] for p in positions]),
+                  CoordArray.fromCoords([p.coords[1] for p in positions]))
+        return PositionArray(coords, epoch=first.epoch, system=first.system)
+
+    @staticmethod
+    def _coordArray(c, factory):
+        if isinstance(c, CoordArray):
+            return c
+        if not isinstance(c, np.ndarray):
+            c = list(c)
+        if len(c) and isinstance(c[0], Coord):
+            return CoordArray.fromCoords(c)
+        return factory(c)
+
+    @staticmethod
+    def _checkRange(coords, lower, upper, message):
+        # handle -0 problem
+        d = coords.D
+        d = np.where(d == 0, 0.0, d)
+        bad = ~((lower <= d) & (d <= upper))
+        if np.any(bad):
+            raise ValueError("%s (%d of %d values)" % (message, np.sum(bad), len(coords)))
+
+    def __init__(self, coords, epoch=Epoch.J2000, system=System.CELESTIAL):
+        self._coords = coords
+        self.system = System.fromStr(str(system).upper())
+        self.epoch = Epoch.fromStr(str(epoch).upper())
+
+    def __getstate__(self):
+        return {"_coords": self._coords,
+                "system": str(self.system),
+                "epoch": str(self.epoch)}
+
+    def __setstate__(self, state):
+        self._coords = state["_coords"]
+        self.system = System.fromStr(state["system"])
+        self.epoch = Epoch.fromStr(state["epoch"])
+
+    def __len__(self):
+        return len(self._coords[0])
+
+    def __getitem__(self, item):
+        if isinstance(item, (int, long, np.integer)):
+            return Position((self._coords[0][item], self._coords[1][item]),
+                            epoch=self.epoch, system=self.system)
+        return PositionArray((self._coords[0][item], self._coords[1][item]),
+                             epoch=self.epoch, system=self.system)
+
+    def __iter__(self):
+        return iter(self.toPositions())
+
+    def toPositions(self):
+        return [Position(coords, epoch=self.epoch, system=self.system)
+                for coords in zip(self._coords[0].toCoords(), self._coords[1].toCoords())]
+
+    def __str__(self):
+        return "\n".join(["%s %s" % pair for pair in zip(self._coords[0].strfcoord(),
+                                                          self._coords[1].strfcoord())])
+
+    def __repr__(self):
+        return '<%s object %d positions (%s) at %s>' % (PositionArray.__name__, len(self),
+                                                        self.system, hex(id(self))[:-1])
+
+    coords = property(lambda self: self._coords)
+
+    ra = property(lambda self: self._coords[0])
+    dec = property(lambda self: self._coords[1])
+
+    alt = property(lambda self: self._coords[0])
+    az = property(lambda self: self._coords[1])
+
+    long = property(lambda self: self._coords[0])
+    lat = property(lambda self: self._coords[1])
+
+    # (array, array) tuples
+    D = property(lambda self: tuple((c.D for c in self.coords)))
+    R = property(lambda self: tuple((c.R for c in self.coords)))
+    AS = property(lambda self: tuple((c.AS for c in self.coords)))
+    H = property(lambda self: tuple((c.H for c in self.coords)))
+
+    def precess(self, epoch=Epoch.NOW):
+        """
+        Same as L{Position.precess} for every position (mean places,
+        precession only).
+        """
+        source = _precessionMatrix(_ephemEpoch(self.epoch))
+        target = _precessionMatrix(_ephemEpoch(epoch))
+
+        ra, dec = self.R
+        xyz = np.array([np.cos(dec) * np.cos(ra), np.cos(dec) * np.sin(ra), np.sin(dec)])
+        x, y, z = np.dot(np.dot(target, source.T), xyz)
+
+        return PositionArray((CoordArray(np.mod(np.arctan2(y, x), 2 * np.pi), State.HMS),
+                              CoordArray(np.arcsin(np.clip(z, -1, 1)), State.DMS)),
+                             epoch=Epoch.NOW)
+
+    #
+    # great circle distance
+    #
+    def angsep(self, other):
+        """
+        Great circle distance from other (a L{Position} or a
+        PositionArray of the same length).
+
+        @rtype: L{CoordArray} in degrees.
+        """
+        ra1, dec1 = self.R
+        ra2, dec2 = other.R
+        ra2, dec2 = np.asarray(ra2), np.asarray(dec2)
+
+        # same haversine formula of CoordUtil.gcdist
+        hav = np.sin(0.5 * (dec2 - dec1)) ** 2 + \
+            np.cos(dec1) * np.cos(dec2) * np.sin(0.5 * (ra2 - ra1)) ** 2
+        return CoordArray.fromR(2.0 * np.arcsin(np.sqrt(np.clip(hav, 0, 1)))).toD()
+
+    def within(self, other, eps=Coord.fromAS(60)):
+        return self.angsep(other).R <= eps.R
+
+    @staticmethod
+    def _coordRotate(x, y, z):
+        # CoordUtil.coordRotate for arrays
+        xt = np.arcsin(np.clip(np.sin(x) * np.sin(y) + np.cos(x) * np.cos(y) * np.cos(z), -1, 1))
+        yt = np.arccos(np.clip((np.sin(x) - np.sin(y) * np.sin(xt)) / (np.cos(y) * np.cos(xt)), -1, 1))
+        yt = np.where(np.sin(z) > 0.0, 2 * np.pi - yt, yt)
+        return (xt, yt)
+
+    @staticmethod
+    def raDecToAltAz(raDec, latitude, lst):
+        """
+        Same as L{Position.raDecToAltAz}, lst (radians) may be a single
+        value or one per position.
+        """
+        ra, dec = raDec.R
+        ha = np.asarray(lst, dtype=np.float64) - ra
+
+        alt, az = PositionArray._coordRotate(dec, CoordUtil.coordToR(latitude), ha)
+
+        alt = np.mod(alt, 2 * np.pi)
+        alt = np.where(alt > np.pi, alt - 2 * np.pi, alt)
+
+        return PositionArray((CoordArray(alt, State.DMS), CoordArray(np.mod(az, 2 * np.pi), State.DMS)),
+                             system=System.TOPOCENTRIC)
+
+    @staticmethod
+    def altAzToRaDec(altAz, latitude, lst):
+        """
+        Same as L{Position.altAzToRaDec}, lst (radians) may be a single
+        value or one per position.
+        """
+        alt, az = altAz.R
+
+        dec, ha = PositionArray._coordRotate(alt, CoordUtil.coordToR(latitude), az)
+        ra = np.asarray(lst, dtype=np.float64) - ha
+
+        dec = np.mod(dec, 2 * np.pi)
+        dec = np.where(dec > np.pi, dec - 2 * np.pi, dec)
+
+        return PositionArray((CoordArray(np.mod(ra, 2 * np.pi), State.HMS), CoordArray(dec, State.DMS)))
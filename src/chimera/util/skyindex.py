@@ -0,0 +1,312 @@
+#! /usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+# chimera - observatory automation system
+# Copyright (C) 2006-2007  P. Henrique Silva <henrique@astro.ufsc.br>
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.
+
+import os
+
+import numpy as np
+
+from chimera.util.coord import CoordArray
+
+__all__ = ['SkyIndex', 'columnToDegrees']
+
+
+# about how many points per cell when the cell size isn't given
+POINTS_PER_CELL = 20
+
+# whole sky, in square degrees
+SKY_AREA = 4 * np.pi * (180 / np.pi) ** 2
+
+
+def columnToDegrees(values, hours=False):
+    """
+    A catalog column as degrees: numbers are taken as degrees, text as
+    sexagesimal (hours if hours=True, as for RA).
+    """
+    values = np.asarray(values)
+    if values.dtype.kind in "iuf":
+        return values.astype(np.float64)
+
+    factory = CoordArray.fromHMS if hours else CoordArray.fromDMS
+    return factory([str(v) for v in values]).D
+
+
+def _unitVectors(ra, dec):
+    ra, dec = np.radians(ra), np.radians(dec)
+    return np.column_stack((np.cos(dec) * np.cos(ra), np.cos(dec) * np.sin(ra), np.sin(dec)))
+
+
+class SkyIndex (object):
+
+    """
+    Cone and nearest neighbour searches over a fixed set of sky
+    positions.
+
+    The sky is cut in declination zones of cellSize degrees, each
+    zone in RA cells about cellSize degrees wide (so cells have
+    about the same area). Points are kept sorted by cell as unit
+    vectors, with the offset of each cell on that order, so a search
+    only looks at the points of the cells the cone touches and then
+    checks the exact distance (a dot product) on them.
+
+    Indexes can be saved to a directory (plain .npy files) and loaded
+    memory-mapped, so a catalog with millions of rows costs nothing
+    to open and only the cells touched are read from disk.
+
+    >>> index = SkyIndex.build(ra, dec)               # degrees
+    >>> ids, dist = index.cone(150.0, -30.0, 1.0)     # within 1 deg
+    >>> ids, dist = index.nearest(150.0, -30.0, 10)   # 10 closest
+
+    ids are the ones given to build (row numbers by default) and
+    distances are in degrees, closest first.
+    """
+
+    def __init__(self, xyz, ids, offsets, cellSize):
+        self.xyz = xyz
+        self.ids = ids
+        self.offsets = offsets
+        self.cellSize = float(cellSize)
+
+        self.zones = int(np.ceil(180.0 / self.cellSize))
+
+        # RA cells of each zone (about cellSize wide where the zone is
+        # widest), and where each zone starts on the cell numbering
+        edges = np.linspace(-90, 90, self.zones + 1)
+        widest = np.where((edges[:-1] < 0) & (edges[1:] > 0), 0,
+                          np.minimum(np.abs(edges[:-1]), np.abs(edges[1:])))
+        self.cells = np.maximum(1, (360 * np.cos(np.radians(widest)) / self.cellSize).astype(int))
+        self.zoneStart = np.concatenate(([0], np.cumsum(self.cells)))
+
+    def __len__(self):
+        return len(self.ids)
+
+    #
+    # building
+    #
+
+    @staticmethod
+    def build(ra, dec, ids=None, cellSize=None):
+        """
+        Index positions given in degrees (J2000, or whatever the
+        queries will use). ids default to the row numbers.
+        """
+        ra = np.asarray(ra, dtype=np.float64)
+        dec = np.asarray(dec, dtype=np.float64)
+
+        if ids is None:
+            ids = np.arange(len(ra))
+        ids = np.asarray(ids)
+
+        if cellSize is None:
+            cellSize = np.sqrt(SKY_AREA * POINTS_PER_CELL / max(len(ra), 1))
+            cellSize = float(np.clip(cellSize, 0.05, 10.0))
+
+        index = SkyIndex(None, None, None, cellSize)
+
+        cell = index._cell(ra, dec)
+        order = np.argsort(cell, kind="mergesort")
+
+        index.xyz = _unitVectors(ra[order], dec[order])
+        index.ids = ids[order]
+        index.offsets = np.searchsorted(cell[order], np.arange(index.zoneStart[-1] + 1))
+
+        return index
+
+    @staticmethod
+    def fromTargets(session=None, type=None, cellSize=None):
+        """
+        Index the scheduler Targets table (all targets or the ones of
+        the given type), ids are target ids.
+        """
+        from chimera.controllers.scheduler.model import Session, Targets
+
+        session = session or Session()
+
+        query = session.query(Targets.id, Targets.targetRa, Targets.targetDec)
+        if type is not None:
+            query = query.filter(Targets.type == type)
+
+        rows = query.all()
+        if not rows:
+            return SkyIndex.build([], [], cellSize=cellSize)
+
+        ids, ra, dec = [np.array(column) for column in zip(*rows)]
+
+        # targetRa is in hours
+        return SkyIndex.build(ra * 15.0, dec, ids, cellSize)
+
+    @staticmethod
+    def fromCatalog(filename, ra, dec, id=None, cellSize=None, **kwargs):
+        """
+        Index a catalog file (anything astropy.io.ascii reads, extra
+        keyword arguments go to it). ra/dec/id are column names, or
+        numbers, as in col1. Text columns are read as sexagesimal
+        (hours for RA), numbers as degrees. ids default to the row
+        numbers.
+        """
+        from astropy.io import ascii
+
+        table = ascii.read(filename, **kwargs)
+
+        def column(name):
+            if isinstance(name, int):
+                return table.columns[name]
+            return table[name]
+
+        raD = columnToDegrees(column(ra), hours=True)
+        decD = columnToDegrees(column(dec))
+
+        ids = None
+        if id is not None:
+            ids = np.asarray(column(id))
+
+        return SkyIndex.build(raD, decD, ids, cellSize)
+
+    #
+    # persistence
+    #
+
+    def save(self, path):
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+        np.save(os.path.join(path, "xyz.npy"), self.xyz)
+        np.save(os.path.join(path, "ids.npy"), self.ids)
+        np.save(os.path.join(path, "offsets.npy"), self.offsets)
+        np.save(os.path.join(path, "cellsize.npy"), np.array([self.cellSize]))
+
+    @staticmethod
+    def load(path, mmap=True):
+        mode = "r" if mmap else None
+
+        def load(name):
+            return np.load(os.path.join(path, name), mmap_mode=mode)
+
+        return SkyIndex(load("xyz.npy"), load("ids.npy"), load("offsets.npy"),
+                        float(np.load(os.path.join(path, "cellsize.npy"))[0]))
+
+    #
+    # queries
+    #
+
+    def _zone(self, dec):
+        return np.clip(((np.asarray(dec) + 90.0) / self.cellSize).astype(int), 0, self.zones - 1)
+
+    def _cell(self, ra, dec):
+        zone = self._zone(dec)
+        cells = self.cells[zone]
+        column = np.clip((np.mod(ra, 360.0) / 360.0 * cells).astype(int), 0, cells - 1)
+        return self.zoneStart[zone] + column
+
+    def _candidates(self, ra, dec, radius):
+        """
+        Row ranges (start, end) of the cells touched by the cone.
+        """
+        ranges = []
+
+        low, high = max(dec - radius, -90.0), min(dec + radius, 90.0)
+
+        # RA half width of the cone (all of it if it has a pole)
+        if high >= 90.0 or low <= -90.0 or \
+           np.sin(np.radians(radius)) >= np.cos(np.radians(dec)):
+            width = 180.0
+        else:
+            width = np.degrees(np.arcsin(np.sin(np.radians(radius)) / np.cos(np.radians(dec))))
+
+        for zone in range(self._zone(low), self._zone(high) + 1):
+            cells = self.cells[zone]
+            start = self.zoneStart[zone]
+
+            first = int(np.floor((ra - width) / 360.0 * cells))
+            last = int(np.floor((ra + width) / 360.0 * cells))
+
+            if last - first + 1 >= cells:
+                ranges.append((self.offsets[start], self.offsets[start + cells]))
+                continue
+
+            first, last = first % cells, last % cells
+
+            if first <= last:
+                ranges.append((self.offsets[start + first], self.offsets[start + last + 1]))
+            else:
+                # crosses RA 0
+                ranges.append((self.offsets[start + first], self.offsets[start + cells]))
+                ranges.append((self.offsets[start], self.offsets[start + last + 1]))
+
+        return ranges
+
+    def _search(self, ra, dec, radius):
+        """
+        Rows within radius and their chord distances (between unit
+        vectors, which unlike the dot product keep their precision
+        for tiny angles).
+        """
+        center = _unitVectors(ra, dec)[0]
+
+        ranges = [(start, end) for start, end in self._candidates(ra, dec, radius) if end > start]
+        if not ranges:
+            return np.array([], dtype=int), np.array([])
+
+        # slices, so a memory-mapped index only reads these cells
+        rows = np.concatenate([np.arange(start, end) for start, end in ranges])
+        chord = np.concatenate([np.sqrt(((self.xyz[start:end] - center) ** 2).sum(axis=1))
+                                for start, end in ranges])
+
+        inside = chord <= 2 * np.sin(np.radians(min(radius, 180.0)) / 2)
+        return rows[inside], chord[inside]
+
+    def _result(self, rows, chord):
+        order = np.argsort(chord, kind="mergesort")
+        rows, chord = rows[order], chord[order]
+        return np.asarray(self.ids[rows]), np.degrees(2 * np.arcsin(np.clip(chord / 2, 0, 1)))
+
+    def cone(self, ra, dec, radius):
+        """
+        Everything within radius of (ra, dec), all in degrees.
+
+        @returns: (ids, distances), closest first.
+        """
+        rows, chord = self._search(ra, dec, radius)
+        return self._result(rows, chord)
+
+    def nearest(self, ra, dec, k=1):
+        """
+        The k closest points to (ra, dec), in degrees.
+
+        @returns: (ids, distances), closest first.
+        """
+        k = min(k, len(self))
+        if k <= 0:
+            return np.asarray(self.ids[:0]), np.array([])
+
+        # a cone that should have about k points, grown until it does
+        radius = max(np.sqrt(SKY_AREA * k / len(self) / np.pi) * 1.5, self.cellSize)
+
+        while True:
+            rows, chord = self._search(ra, dec, radius)
+            if len(rows) >= k or radius >= 180.0:
+                break
+            radius = min(radius * 2, 180.0)
+
+        if len(rows) > k:
+            best = np.argpartition(chord, k - 1)[:k]
+            rows, chord = rows[best], chord[best]
+
+        return self._result(rows, chord)
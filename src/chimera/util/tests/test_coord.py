@@ -1,11 +1,13 @@
 
-from chimera.util.coord import Coord
+from chimera.util.coord import Coord, CoordArray
 
 from astropy.io import ascii
 
 import os
 import time
 
+import numpy as np
+
 class TestCoord (object):
 
     @staticmethod
@@ -129,3 +131,77 @@ class TestCoord (object):
 
         print "#%d coords parsed in %.3fs (%.3f/s) and checked in %.3fs (%.3f/s) ..." % (len(coords), t_parse, len(coords)/t_parse,
                                                                                          t_check, len(coords)/t_check)
+
+
+class TestCoordArray (object):
+
+    def test_bsc (self):
+        """Same values and strings as Coord for the entire 5th Bright Star Catalogue"""
+
+        bsc = ascii.read(os.path.abspath(os.path.join(os.path.dirname(__file__), 'bsc.dat')), format="tab", converters={})
+
+        ra_str = [str(row[2]) for row in bsc]
+        dec_str = [str(row[3]) for row in bsc]
+
+        t0 = time.time()
+        ra = [Coord.fromHMS(s) for s in ra_str]
+        dec = [Coord.fromDMS(s) for s in dec_str]
+        ra_fmt = [c.strfcoord("%(h)02d %(m)02d %(s)04.1f") for c in ra]
+        dec_fmt = [c.strfcoord("%(d)02d %(m)02d %(s)02.0f") for c in dec]
+        t_scalar = time.time() - t0
+
+        t0 = time.time()
+        ra_array = CoordArray.fromHMS(ra_str)
+        dec_array = CoordArray.fromDMS(dec_str)
+        ra_array_fmt = ra_array.strfcoord("%(h)02d %(m)02d %(s)04.1f")
+        dec_array_fmt = dec_array.strfcoord("%(d)02d %(m)02d %(s)02.0f")
+        t_array = time.time() - t0
+
+        print
+        print "%d coords parsed and formatted: %.3f s (%.3f s with Coord)" % (2 * len(bsc), t_array, t_scalar)
+
+        assert np.abs(ra_array.D - [c.D for c in ra]).max() < 1e-10
+        assert np.abs(dec_array.D - [c.D for c in dec]).max() < 1e-10
+
+        assert ra_array_fmt == ra_fmt
+        assert dec_array_fmt == dec_fmt
+
+        # default formats too
+        assert ra_array.strfcoord() == [str(c) for c in ra]
+        assert dec_array.strfcoord() == [str(c) for c in dec]
+
+    def test_conversions (self):
+
+        c = CoordArray.fromD([-10.5, 0, 190.25])
+
+        assert np.allclose(c.R, np.radians([-10.5, 0, 190.25]))
+        assert np.allclose(c.H, [-0.7, 0, 12.683333333])
+        assert np.allclose(c.AS, [-37800, 0, 684900])
+
+        coords = c.toDMS().toCoords()
+        assert [str(x) for x in coords] == ["-10:30:00.000", "+00:00:00.000", "+190:15:00.000"]
+        assert CoordArray.fromCoords(coords) == c.toDMS()
+
+        assert c[0].D == -10.5
+        assert isinstance(c[1:], CoordArray) and len(c[1:]) == 2
+
+        # mixed input goes through the scalar parser
+        mixed = CoordArray.fromDMS(["-00 30 00", 12.5, "10d20m30s"])
+        assert np.allclose(mixed.D, [-0.5, 12.5, Coord.fromDMS("10d20m30s").D])
+
+    def test_whole_values (self):
+        """No 29:60:00 for whole (and half) degrees and hours"""
+
+        values = np.arange(-90, 90.5, 0.5)
+
+        for state, formats in (("DMS", [None, "%(d)02d %(m)02d %(s)04.1f", "%(d)02d %(m)02d %(s)02.0f"]),
+                               ("HMS", [None, "%(h)02d %(m)02d %(s)04.1f"])):
+
+            # going through radians, 30 comes back as 29.999999999999996
+            array = getattr(CoordArray.fromD(values), "to" + state)()
+            coords = [getattr(Coord.fromD(v), "to" + state)() for v in values.tolist()]
+
+            for format in formats:
+                expected = [c.strfcoord(format) for c in coords]
+                assert array.strfcoord(format) == expected, format
+                assert [c.strfcoord(format) for c in array] == expected, format
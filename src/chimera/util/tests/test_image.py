@@ -1,9 +1,16 @@
 from nose.tools import assert_raises
-from chimera.util.image import Image, ImageUtil, WCSNotFoundException
+from chimera.util.image import Image, ImageUtil, WCSNotFoundException, compressFile
+from chimera.instruments.fakecamera import FakeCamera
 
 import numpy as N
 import os
 import time
+import pickle
+import bz2
+import gzip
+import zipfile
+
+from astropy.io import fits
 
 class TestImage (object):
 
@@ -64,6 +71,88 @@ class TestImage (object):
 
         os.unlink(img.filename())
 
+    def test_create_headers (self):
+
+        img = Image.create(N.zeros((100,100)), filename="autogen-teste.fits",
+                           headers=[("CRPIX1", 49, "coordinate system reference pixel"),
+                                    ("CAMERA", "Fake Cameras Inc.", "Camera Model")])
+
+        # ImageServer.register will find it already stamped
+        assert img["CHM_ID"] == img.GUID()
+        assert img["CRPIX1"] == 49
+
+        # same thing on disk, and on a (pickled) copy
+        disk = Image.fromFile(img.filename(), mode="readonly")
+        assert disk["CHM_ID"] == img.GUID()
+        assert disk["CAMERA"] == "Fake Cameras Inc."
+        disk.close()
+
+        copy = pickle.loads(pickle.dumps(img))
+        assert "CHM_ID" in copy
+        assert copy["CRPIX1"] == 49
+
+        # writing still reaches the file
+        img += ("OBSERVER", "nobody")
+        assert Image.fromFile(img.filename(), mode="readonly")["OBSERVER"] == "nobody"
+        img.close()
+
+        os.unlink(img.filename())
+
+    def test_compress (self):
+
+        data = N.random.normal(1000, 10, (256, 256))
+
+        for format in ("bz2", "gzip", "zip", "rice", "hcompress"):
+
+            img = Image.create(data, filename="autogen-compress.fits")
+            raw = open(img.filename(), "rb").read()
+            pixels = fits.getdata(img.filename())
+
+            compressed = compressFile(img.filename(), format)
+            assert not os.path.exists(img.filename())
 
+            if format == "bz2":
+                assert bz2.BZ2File(compressed).read() == raw
+            elif format == "gzip":
+                assert gzip.GzipFile(compressed).read() == raw
+            elif format == "zip":
+                assert zipfile.ZipFile(compressed).read(os.path.basename(img.filename())) == raw
+            else:
+                # tile compression is lossless for our integer data, and still FITS
+                hdu = fits.open(compressed)[1]
+                assert hdu.header["CHM_ID"] == img.GUID()
+                assert (hdu.data == pixels).all()
 
+            os.unlink(compressed)
+
+        assert_raises(ValueError, compressFile, "autogen-nothing.fits", "lzma")
+
+    def test_create_performance (self):
+
+        frames = 5
+
+        camera = FakeCamera()
+        data = camera.make_flat((4096, 4096), N.float)
+
+        headers = [("CRPIX1", 2047, "coordinate system reference pixel"),
+                   ("CRPIX2", 2047, "coordinate system reference pixel"),
+                   ("CD1_1", 0.0001, "transformation matrix element (1,1)"),
+                   ("CD2_2", 0.0001, "transformation matrix element (2,2)"),
+                   ("CAMERA", camera["camera_model"], "Camera Model")]
+
+        t0 = time.time()
+
+        for i in range(frames):
+            img = Image.create(data, filename="autogen-bench.fits", headers=headers)
+
+            # what ImageServer.register gets
+            copy = pickle.loads(pickle.dumps(img))
+            assert "CHM_ID" in copy
+
+            os.unlink(img.filename())
+
+        t = time.time() - t0
+
+        print
+        print "4096x4096 frames: %.2f frames/s (%.3f s/frame)" % (frames / t, t / frames)
 
@@ -0,0 +1,152 @@
+
+from nose import SkipTest
+from nose.tools import assert_raises
+
+from chimera.util.catalogs.local import LocalCatalog
+from chimera.util.catalogs.landolt import Landolt
+from chimera.util.position import Position
+
+import numpy as np
+
+import tempfile
+import shutil
+import time
+import os
+
+
+def distances(ra, dec, ra0, dec0):
+    ra, dec, ra0, dec0 = np.radians(ra), np.radians(dec), np.radians(ra0), np.radians(dec0)
+    cos = np.sin(dec) * np.sin(dec0) + np.cos(dec) * np.cos(dec0) * np.cos(ra - ra0)
+    return np.degrees(np.arccos(np.clip(cos, -1, 1))) * 3600
+
+
+class TestLocalCatalog (object):
+
+    def setup (self):
+        self.dir = tempfile.mkdtemp()
+        self._directory = LocalCatalog.directory
+        LocalCatalog.directory = self.dir
+
+        rand = np.random.RandomState(0)
+        self.N = 500000
+        self.ra = rand.uniform(0, 360, self.N)
+        self.dec = np.degrees(np.arcsin(rand.uniform(-1, 1, self.N)))
+        self.mag = rand.uniform(5, 16, self.N)
+
+        self.catalog = LocalCatalog.create(LocalCatalog.pathOf("UCAC2"), "UCAC2", self.ra, self.dec,
+                                           {"UCAC2_NUM": np.arange(self.N), "MAG_UCAC": self.mag})
+
+    def teardown (self):
+        LocalCatalog.directory = self._directory
+        shutil.rmtree(self.dir)
+
+    def expected (self, ra0, dec0, radius, mag=None, limit=100):
+        dist = distances(self.ra, self.dec, ra0, dec0)
+        ok = dist <= radius
+        if mag is not None:
+            ok &= (self.mag >= mag[0]) & (self.mag <= mag[1])
+        rows = np.nonzero(ok)[0]
+        return list(rows[np.argsort(dist[rows])][:limit])
+
+    def test_find (self):
+
+        near = Position.fromRaDec("10:00:00", "-30:00:00")
+        ra0, dec0 = near.ra.D, near.dec.D
+
+        t0 = time.time()
+        stars = self.catalog.find(near="10:00:00 -30:00:00", radius=1800, magUCAC=(10, 12), limit=20)
+        t_find = time.time() - t0
+
+        t0 = time.time()
+        self.catalog.find(near="10:00:00 -30:00:00", radius=1800, magUCAC=(10, 12), limit=20)
+        t_cached = time.time() - t0
+
+        print
+        print "%d stars: find %.2f ms, again (cached) %.3f ms" % (self.N, t_find * 1e3, t_cached * 1e3)
+
+        assert [star["UCAC2_NUM"] for star in stars] == self.expected(ra0, dec0, 1800, (10, 12), 20)
+        assert all([10 <= star["MAG_UCAC"] <= 12 for star in stars])
+        assert np.allclose([star["R"] for star in stars],
+                           distances(self.ra, self.dec, ra0, dec0)[[star["UCAC2_NUM"] for star in stars]])
+        assert abs(stars[0]["RA"].D - self.ra[stars[0]["UCAC2_NUM"]]) < 1e-9
+
+        # results are copies
+        stars[0]["MAG_UCAC"] = -1
+        assert self.catalog.find(near=near, radius=1800, magUCAC=(10, 12), limit=20)[0]["MAG_UCAC"] != -1
+
+        # faintest only, other ways to say where
+        stars = self.catalog.find(near=("10 00 00", "-30 00 00"), radius=3600, magUCAC=8)
+        assert [star["UCAC2_NUM"] for star in stars] == self.expected(ra0, dec0, 3600, (-99, 8))
+
+        # no spatial limit: the closest ones
+        stars = self.catalog.find(near="10 00 00 -30 00 00", limit=5, magUCAC=(15, 16))
+        assert [star["UCAC2_NUM"] for star in stars] == self.expected(ra0, dec0, 648000, (15, 16), 5)
+
+        star, = self.catalog.find(near=near, closest=True, radius=10)
+        assert star["UCAC2_NUM"] == self.expected(ra0, dec0, 648000, limit=1)[0]
+
+        # box, w along RA, h along Dec (arcsec)
+        stars = self.catalog.find(near=near, box=(7200, 3600), limit=1000)
+        assert stars
+        for s in stars:
+            assert abs(s["DEC"].D - dec0) <= 0.5
+            assert abs((s["RA"].D - ra0) * np.cos(np.radians(dec0))) <= 1.0
+
+        assert_raises(TypeError, self.catalog.find, near, radius=10, box=10)
+        assert_raises(ValueError, self.catalog.find, "m5")
+
+    def test_scat_replaced (self):
+
+        try:
+            from chimera.util.catalogs.ucac2 import UCAC2
+        except ImportError:
+            # scat wrapper dependencies not installed
+            raise SkipTest()
+
+        near = "10:00:00 -30:00:00"
+        stars = UCAC2().find(near, limit=10, radius=1800)
+        assert [star["UCAC2_NUM"] for star in stars] == \
+            [star["UCAC2_NUM"] for star in self.catalog.find(near, limit=10, radius=1800)]
+
+    def test_convert (self):
+
+        filename = os.path.join(os.path.dirname(__file__), "hipparcos-tycho.dat")
+
+        catalog = LocalCatalog.convert(filename, os.path.join(self.dir, "hip"), "HIP", ra=0, dec=1,
+                                       columns={"RA_ICRS": 2, "DE_ICRS": 3}, format="tab")
+
+        assert catalog.getName() == "HIP"
+        assert catalog.getMagnitudeBands() == []
+
+        stars = catalog.find(near="00:00:12.34 -54:54:50.9", radius=60)
+        assert abs(stars[0]["RA_ICRS"] - 0.05140852) < 1e-8
+        assert stars[0]["R"] < 0.1
+
+        # opens again from disk
+        again = LocalCatalog(os.path.join(self.dir, "hip"))
+        assert again.find(near="00:00:12.34 -54:54:50.9", radius=60) == stars
+
+    def test_landolt (self):
+
+        rand = np.random.RandomState(1)
+        ra, dec = rand.uniform(0, 360, 1000), rand.uniform(-60, 60, 1000)
+        LocalCatalog.create(LocalCatalog.pathOf("Landolt"), "Landolt", ra, dec,
+                            {"ID": np.array(["SA %d" % i for i in range(1000)]),
+                             "MAG_V": rand.uniform(8, 14, 1000)})
+
+        landolt = Landolt()
+        landolt.useTarget(Position.fromRaDec("14:00:00", "-22:00:00"), radius=45)
+        landolt.constrainColumns({"Vmag": "<10"})
+
+        data = landolt.find(limit=5)
+
+        assert len(data) == 5
+        assert [obj["RA"].D for obj in data] == sorted([obj["RA"].D for obj in data])
+
+        for obj in data:
+            assert float(obj["V"]) < 10
+            assert obj["ID"].startswith("SA")
+            assert Position.fromRaDec(obj["RA"], obj["DEC"]).angsep(
+                Position.fromRaDec("14:00:00", "-22:00:00")).D <= 45
+
+        assert_raises(AssertionError, Landolt().find, limit=5)
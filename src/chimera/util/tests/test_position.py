@@ -2,12 +2,15 @@
 
 from nose.tools import assert_raises
 
-from chimera.util.position import Position
+from chimera.util.position import Position, PositionArray, Epoch
 from chimera.util.coord import Coord
 import ephem
 from datetime import datetime as dt
 from dateutil import tz
 
+import numpy as np
+import time
+
 def equal (a, b, e=0.0001):
     return ( abs(a-b) <= e)
 
@@ -79,3 +82,105 @@ class TestPosition (object):
         print
         print sirius_j2000
         print sirius_now
+
+
+class TestPositionArray (object):
+
+    def setup (self):
+        rand = np.random.RandomState(0)
+        self.ra = rand.uniform(0, 24, 1000)
+        self.dec = rand.uniform(-89, 89, 1000)
+
+        self.array = PositionArray.fromRaDec(self.ra, self.dec)
+        self.positions = [Position.fromRaDec(ra, dec) for ra, dec in zip(self.ra, self.dec)]
+
+        self.lat = Coord.fromD(-23)
+        self.lst = 1.234
+
+    def test_factories (self):
+
+        t0 = time.time()
+        positions = [Position.fromRaDec(ra, dec) for ra, dec in zip(self.ra, self.dec)]
+        t_scalar = time.time() - t0
+
+        t0 = time.time()
+        array = PositionArray.fromRaDec(self.ra, self.dec)
+        t_array = time.time() - t0
+
+        print
+        print "%d positions: %.4f s (%.3f s with Position)" % (len(self.ra), t_array, t_scalar)
+
+        # radians inside, so the last bit of the degrees may differ
+        def same(p1, p2):
+            return (str(p1) == str(p2) and p1.epoch == p2.epoch and p1.system == p2.system and
+                    equal(p1.ra.D, p2.ra.D, 1e-10) and equal(p1.dec.D, p2.dec.D, 1e-10))
+
+        assert all(map(same, array.toPositions(), positions))
+        assert all(map(same, PositionArray.fromPositions(positions).toPositions(), positions))
+        assert same(array[10], positions[10])
+
+        strings = PositionArray.fromRaDec([str(p.ra) for p in positions], [str(p.dec) for p in positions])
+        assert str(strings) == "\n".join([str(p) for p in positions])
+
+        assert_raises(ValueError, PositionArray.fromRaDec, [10, 25], [0, 0])
+        assert_raises(ValueError, PositionArray.fromRaDec, [10, 12], [0, -91])
+        assert_raises(ValueError, PositionArray.fromRaDec, ["xyz"], ["abc"])
+
+    def test_precession (self):
+
+        for epoch in (Epoch.NOW, Epoch.B1950, Epoch.J2000):
+            precessed = self.array.precess(epoch)
+
+            for i in range(0, len(self.positions), 10):
+                expected = self.positions[i].precess(epoch)
+                # arcsec
+                assert self.array[i].precess(epoch).angsep(expected).AS < 0.1
+                assert precessed[i].angsep(expected).AS < 0.1
+
+    def test_angsep (self):
+
+        other = self.array[::-1]
+        sep = self.array.angsep(other)
+
+        for i in range(len(self.positions)):
+            assert equal(sep.D[i], self.positions[i].angsep(self.positions[-i - 1]).D, 1e-8)
+
+        # against a single position
+        sep = self.array.angsep(self.positions[0])
+        assert sep.D[0] == 0 and equal(sep.D[1], self.positions[1].angsep(self.positions[0]).D, 1e-8)
+
+        assert list(self.array.within(self.positions[0], Coord.fromD(30))) == \
+            [p.within(self.positions[0], Coord.fromD(30)) for p in self.positions]
+
+    def test_alt_az (self):
+
+        t0 = time.time()
+        altAz = [Position.raDecToAltAz(p, self.lat, self.lst) for p in self.positions]
+        t_scalar = time.time() - t0
+
+        t0 = time.time()
+        altAzArray = PositionArray.raDecToAltAz(self.array, self.lat, self.lst)
+        t_array = time.time() - t0
+
+        print
+        print "%d alt/az: %.4f s (%.3f s with Position)" % (len(self.ra), t_array, t_scalar)
+
+        for i, expected in enumerate(altAz):
+            assert equal(altAzArray.alt.D[i], expected.alt.D, 1e-8)
+            # azimuth is meaningless at the zenith
+            if abs(expected.alt.D) < 89.9:
+                assert equal(altAzArray.az.D[i], expected.az.D, 1e-8)
+
+        raDec = PositionArray.altAzToRaDec(altAzArray, self.lat, self.lst)
+        for i, expected in enumerate(altAz):
+            scalar = Position.altAzToRaDec(expected, self.lat, self.lst)
+            assert equal(raDec.ra.D[i], scalar.ra.D, 1e-8)
+            assert equal(raDec.dec.D[i], scalar.dec.D, 1e-8)
+
+        # back to where we started
+        assert np.all(self.array.angsep(raDec).AS < 1e-6)
+
+        # one LST per position
+        lst = np.linspace(0, 2 * np.pi, len(self.positions))
+        altAzArray = PositionArray.raDecToAltAz(self.array, self.lat, lst)
+        assert equal(altAzArray.alt.D[-1], Position.raDecToAltAz(self.positions[-1], self.lat, lst[-1]).alt.D, 1e-8)
@@ -0,0 +1,142 @@
+
+from chimera.util.skyindex import SkyIndex
+
+import numpy as np
+
+import tempfile
+import shutil
+import time
+import os
+
+
+def brute(ra, dec, ra0, dec0):
+    ra, dec, ra0, dec0 = np.radians(ra), np.radians(dec), np.radians(ra0), np.radians(dec0)
+    cos = np.sin(dec) * np.sin(dec0) + np.cos(dec) * np.cos(dec0) * np.cos(ra - ra0)
+    return np.degrees(np.arccos(np.clip(cos, -1, 1)))
+
+
+class TestSkyIndex (object):
+
+    def setup (self):
+        rand = np.random.RandomState(0)
+
+        # uniform on the sphere
+        self.N = 200000
+        self.ra = rand.uniform(0, 360, self.N)
+        self.dec = np.degrees(np.arcsin(rand.uniform(-1, 1, self.N)))
+
+        # corners: poles and RA 0
+        self.centers = [(0.0, 90.0), (10.0, -90.0), (359.9, 0.0), (0.1, -45.0), (180.0, 89.5)] + \
+            zip(rand.uniform(0, 360, 50), rand.uniform(-90, 90, 50))
+
+        self.dir = tempfile.mkdtemp()
+
+    def teardown (self):
+        shutil.rmtree(self.dir)
+
+    def check (self, index):
+
+        for ra0, dec0 in self.centers:
+            dist = brute(self.ra, self.dec, ra0, dec0)
+
+            for radius in (0.1, 1.0, 5.0, 30.0):
+                ids, d = index.cone(ra0, dec0, radius)
+                assert set(ids) == set(np.nonzero(dist <= radius)[0]), (ra0, dec0, radius)
+                assert np.all(np.diff(d) >= 0)
+                assert np.allclose(d, dist[ids])
+
+            ids, d = index.nearest(ra0, dec0, 10)
+            assert np.allclose(d, np.sort(dist)[:10])
+            assert np.allclose(dist[ids], d)
+
+    def test_queries (self):
+
+        t0 = time.time()
+        index = SkyIndex.build(self.ra, self.dec)
+        print
+        print "%d points indexed in %.3f s (cells of %.2f deg)" % (self.N, time.time() - t0, index.cellSize)
+
+        self.check(index)
+
+        # all the sky
+        ids, d = index.cone(0, 0, 180)
+        assert len(ids) == self.N
+
+        ids, d = index.nearest(0, 0, self.N + 10)
+        assert len(ids) == self.N
+
+        t0 = time.time()
+        for ra0, dec0 in self.centers:
+            index.cone(ra0, dec0, 1.0)
+        cone = (time.time() - t0) / len(self.centers)
+
+        t0 = time.time()
+        for ra0, dec0 in self.centers:
+            index.nearest(ra0, dec0, 10)
+        nearest = (time.time() - t0) / len(self.centers)
+
+        t0 = time.time()
+        for ra0, dec0 in self.centers[:10]:
+            dist = brute(self.ra, self.dec, ra0, dec0)
+            np.nonzero(dist <= 1.0)
+        scan = (time.time() - t0) / 10
+
+        print "1 deg cone: %.2f ms, 10 nearest: %.2f ms, full scan: %.2f ms" % (cone * 1e3, nearest * 1e3, scan * 1e3)
+
+    def test_persistence (self):
+
+        index = SkyIndex.build(self.ra, self.dec, ids=np.arange(self.N) + 1000, cellSize=0.5)
+        index.save(self.dir)
+
+        t0 = time.time()
+        loaded = SkyIndex.load(self.dir)
+        print
+        print "loaded in %.4f s" % (time.time() - t0)
+
+        assert isinstance(loaded.xyz, np.memmap)
+        assert loaded.cellSize == 0.5 and len(loaded) == self.N
+
+        for ra0, dec0 in self.centers[:10]:
+            ids, d = loaded.cone(ra0, dec0, 2.0)
+            expected, _ = index.cone(ra0, dec0, 2.0)
+            assert list(ids) == list(expected)
+            assert np.all(ids >= 1000)
+
+    def test_catalog (self):
+
+        filename = os.path.join(os.path.dirname(__file__), "hipparcos-tycho.dat")
+
+        # sexagesimal columns
+        index = SkyIndex.fromCatalog(filename, ra=0, dec=1, format="tab")
+        # degrees
+        degrees = SkyIndex.fromCatalog(filename, ra=2, dec=3, format="tab")
+
+        assert len(index) == len(degrees) > 10000
+
+        for ra0, dec0 in self.centers[:10]:
+            ids, d = index.nearest(ra0, dec0, 5)
+            ids2, d2 = degrees.nearest(ra0, dec0, 5)
+            assert list(ids) == list(ids2)
+            assert np.allclose(d, d2, atol=1e-3)
+
+    def test_targets (self):
+
+        from chimera.controllers.scheduler.model import metaData, Session, Targets
+        from sqlalchemy import create_engine
+
+        engine = create_engine("sqlite:///%s" % os.path.join(self.dir, "targets.db"))
+        metaData.create_all(engine)
+
+        engine.execute(Targets.__table__.insert(),
+                       [{"id": i + 1, "name": "t%d" % i, "type": ["SCI", "STD"][i % 2],
+                         "targetRa": self.ra[i] / 15.0, "targetDec": self.dec[i]} for i in range(5000)])
+
+        session = Session(bind=engine)
+        index = SkyIndex.fromTargets(session, type="STD")
+        session.close()
+        engine.dispose()
+
+        assert len(index) == 2500
+
+        ids, d = index.nearest(self.ra[1], self.dec[1], 1)
+        assert ids[0] == 2 and d[0] < 1e-6
@@ -0,0 +1,127 @@
+
+from nose.tools import assert_raises
+
+from chimera.util.tpl2 import TPL2, SocketError, TPLException
+from chimera.util.faketpl2 import FakeTPL2Server
+
+import threading
+import time
+
+
+class TestTPL2 (object):
+
+    def setup (self):
+        self.server = FakeTPL2Server(latency=0.01, slewTime=0.3, moveTime=0.2)
+        self.server.start()
+        self.tpl = TPL2(host="localhost", port=self.server.port, debug=True)
+
+    def teardown (self):
+        self.tpl.disconnect()
+        self.server.stop()
+
+    def test_get_set (self):
+
+        assert self.tpl.isListening()
+
+        assert self.tpl.getobject("TELESCOPE.CONFIG.MOUNTOPTIONS") == "AZ-ZD"
+        assert self.tpl.getobject("POSITION.HORIZONTAL.AZ") == 120.0
+        assert self.tpl.getobject("TELESCOPE.MOTION_STATE") == 0
+
+        cmdid = self.tpl.set("OBJECT.EQUATORIAL.RA", 12.5, wait=True)
+        assert self.tpl.finished(cmdid) and self.tpl.succeeded(cmdid)
+        assert self.tpl.getobject("OBJECT.EQUATORIAL.RA") == 12.5
+
+        # batched: one command for all
+        commands = self.server.commands
+        ra, dec, nothing = self.tpl.getobjects("OBJECT.EQUATORIAL.RA", "OBJECT.EQUATORIAL.DEC", "NO.SUCH.OBJECT")
+        assert self.server.commands == commands + 1
+        assert (ra, dec, nothing) == (12.5, -20.0, None)
+
+        cmd = self.tpl.get("NO.SUCH.OBJECT")
+        assert_raises(TPLException, cmd.result, 1)
+        assert not cmd.succeeded()
+
+        assert any([line.startswith(">") for line in self.tpl.log])
+
+        assert_raises(SocketError, TPL2, host="localhost", port=1)
+
+    def test_pipelining (self):
+
+        objects = ["POSITION.EQUATORIAL.RA_J2000", "POSITION.EQUATORIAL.DEC_J2000",
+                   "POSITION.HORIZONTAL.ALT", "POSITION.HORIZONTAL.AZ",
+                   "POINTING.TRACK", "TELESCOPE.READY_STATE", "TELESCOPE.MOTION_STATE"]
+
+        # one at a time, as before
+        t0 = time.time()
+        for i in range(5):
+            serial = [self.tpl.getobject(name) for name in objects]
+        t_serial = (time.time() - t0) / 5
+
+        # all in flight at once
+        t0 = time.time()
+        for i in range(5):
+            commands = [self.tpl.get(name) for name in objects]
+            pipelined = [cmd.result(1)[name] for cmd, name in zip(commands, objects)]
+        t_pipelined = (time.time() - t0) / 5
+
+        # one GET
+        t0 = time.time()
+        for i in range(5):
+            batched = self.tpl.getobjects(*objects)
+        t_batched = (time.time() - t0) / 5
+
+        assert serial == pipelined == batched
+
+        # 8 threads sharing the connection
+        results = []
+
+        def reader():
+            for i in range(25):
+                results.append(self.tpl.getobjects(*objects) == batched)
+
+        threads = [threading.Thread(target=reader) for i in range(8)]
+        t0 = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        t_threads = time.time() - t0
+
+        print
+        print "7 objects, 10 ms latency: one by one %.1f ms, pipelined %.1f ms, one GET %.1f ms" % \
+            (t_serial * 1e3, t_pipelined * 1e3, t_batched * 1e3)
+        print "8 threads x 25 GETs: %.3f s (%.0f GETs/s)" % (t_threads, 200 / t_threads)
+
+        assert len(results) == 200 and all(results)
+        assert t_batched < t_serial / 3
+
+    def test_completion (self):
+
+        # a slew in flight doesn't hold the other commands
+        slew = self.tpl.command(self.tpl.set("POINTING.TRACK", 2))
+
+        assert slew.waitAck(1)
+        assert self.tpl.getobject("TELESCOPE.MOTION_STATE") == 1
+        assert not slew.finished()
+
+        # woken when the answer arrived, well before the timeout
+        t0 = time.time()
+        assert slew.wait(30)
+        assert time.time() - t0 < 5
+        assert slew.finished() and slew.succeeded()
+        assert slew.finishedAt - slew.sent >= 0.3
+
+        # stopped
+        slew = self.tpl.command(self.tpl.set("POINTING.TRACK", 2))
+        slew.waitAck(1)
+        self.tpl.set("TELESCOPE.STOP", 1, wait=True)
+        assert slew.wait(1) and not slew.succeeded()
+
+        # connection lost
+        pending = self.tpl.command(self.tpl.set("AUXILIARY.COVER.TARGETPOS", 1))
+        pending.waitAck(1)
+        self.tpl.disconnect()
+
+        assert pending.wait(1) and pending.errors == ["connection closed"]
+        assert not self.tpl.isListening()
+        assert_raises(SocketError, self.tpl.get, "SERVER.UPTIME")
@@ -0,0 +1,436 @@
+#! /usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+# chimera - observatory automation system
+# Copyright (C) 2006-2007  P. Henrique Silva <henrique@astro.ufsc.br>
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.
+
+import socket
+import threading
+import logging
+import time
+
+from collections import deque, OrderedDict
+
+from chimera.core.exceptions import ChimeraException
+
+log = logging.getLogger(__name__)
+
+__all__ = ['TPL2', 'TPLCommand', 'SocketError', 'TPLException']
+
+
+class SocketError (ChimeraException):
+    pass
+
+
+class TPLException (ChimeraException):
+    pass
+
+
+def parseValue(value):
+    """
+    A TPL value: quoted strings as str, numbers as int or float.
+    """
+    value = value.strip()
+
+    if value.startswith('"'):
+        return value[1:-1] if value.endswith('"') and len(value) > 1 else value[1:]
+
+    try:
+        return int(value)
+    except ValueError:
+        pass
+
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def formatValue(value):
+    if isinstance(value, basestring):
+        return '"%s"' % value
+    return str(value)
+
+
+class TPLCommand (object):
+
+    """
+    One command sent to the server, and a future for its answer.
+    Lines are added by the connection's reader thread as they arrive,
+    wait() returns when the server says the command is complete (or
+    failed).
+    """
+
+    def __init__(self, id, command):
+        self.id = id
+        self.command = command
+
+        self.received = []
+        self.values = OrderedDict()
+        self.errors = []
+
+        self.acknowledged = False
+        self.complete = False
+
+        self.sent = time.time()
+        self.finishedAt = None
+
+        self._ack = threading.Event()
+        self._done = threading.Event()
+
+    def __repr__(self):
+        return "<TPLCommand %d %s>" % (self.id, self.command)
+
+    def _receive(self, kind, rest, line):
+        self.received.append(line)
+
+        if kind == "COMMAND":
+            status = rest.split(" ", 1)[0]
+            if status == "OK":
+                self.acknowledged = True
+                self._ack.set()
+            elif status == "COMPLETE":
+                self._finish()
+            elif status == "ERROR":
+                self.errors.append(rest)
+                self._finish()
+        elif kind == "DATA":
+            status, _, data = rest.partition(" ")
+            if status == "INLINE":
+                name, _, value = data.partition("=")
+                self.values[name.strip()] = parseValue(value)
+            elif status == "ERROR":
+                self.errors.append(rest)
+            elif status == "OK":
+                pass
+        else:
+            # EVENT and anything else, keep it on received only
+            pass
+
+    def _finish(self, error=None):
+        if error:
+            self.errors.append(error)
+        self.complete = True
+        self.finishedAt = time.time()
+        self._ack.set()
+        self._done.set()
+
+    def finished(self):
+        return self._done.isSet()
+
+    def succeeded(self):
+        return self.finished() and not self.errors
+
+    def wait(self, timeout=None):
+        """
+        Wait for the command to finish (timeout in seconds), returns
+        True if it did.
+        """
+        self._done.wait(timeout)
+        return self._done.isSet()
+
+    def waitAck(self, timeout=None):
+        self._ack.wait(timeout)
+        return self._ack.isSet()
+
+    def result(self, timeout=None):
+        """
+        The values of a GET, raises TPLException on errors or timeout.
+        """
+        if not self.wait(timeout):
+            raise TPLException("Timeout waiting for '%s'." % self.command)
+        if self.errors:
+            raise TPLException("'%s' failed: %s" % (self.command, "; ".join(self.errors)))
+        return self.values
+
+
+class TPL2 (object):
+
+    """
+    Client for the OpenTPL (TPL2) protocol used by Astelco mounts.
+
+    Commands are pipelined: send() (and get/set) writes the command
+    and returns a L{TPLCommand} at once, a reader thread routes every
+    answer line to its command by id, so any number of threads can
+    have commands in flight on the same connection. getobject/getobjects
+    and set(..., wait=True) are the blocking forms.
+
+    >>> tpl = TPL2(user="admin", password="admin", host="localhost", port=65432)
+    >>> ra, dec = tpl.getobjects("POSITION.EQUATORIAL.RA_J2000", "POSITION.EQUATORIAL.DEC_J2000")
+    >>> cmd = tpl.set("POINTING.TRACK", 1)
+    >>> cmd.wait(60)
+
+    Lines that belong to no command (server EVENTs) go to the
+    listeners added with addListener.
+    """
+
+    # finished commands kept on commands_sent
+    history = 1000
+
+    def __init__(self, user="admin", password="admin", host="localhost", port=65432,
+                 echo=False, verbose=False, debug=False, timeout=30.0):
+
+        self.user = user
+        self.password = password
+        self.host = host
+        self.port = port
+
+        self.echo = echo
+        self.verbose = verbose
+        self.debug = debug
+        self.timeout = timeout
+
+        self.log = deque(maxlen=self.history)
+
+        self.commands_sent = OrderedDict()
+
+        self._nextId = 1
+        self._lock = threading.Lock()
+        self._writeLock = threading.Lock()
+        self._listeners = []
+
+        self._socket = None
+        self._file = None
+        self._reader = None
+
+        self.connect()
+
+    #
+    # connection
+    #
+
+    def connect(self):
+        try:
+            self._socket = socket.create_connection((self.host, self.port), self.timeout)
+            # small commands, don't hold them for the next one
+            self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._file = self._socket.makefile("rb")
+        except socket.error, e:
+            raise SocketError("Could not connect to TPL server %s:%s (%s)." % (self.host, self.port, e))
+
+        self._authenticate()
+
+        # the reader blocks on the socket from now on
+        self._socket.settimeout(None)
+
+        self._reader = threading.Thread(target=self._read, name="TPL2 reader %s:%s" % (self.host, self.port))
+        self._reader.setDaemon(True)
+        self._reader.start()
+
+    def _authenticate(self):
+        try:
+            while True:
+                line = self._readline()
+                if not line:
+                    raise SocketError("TPL server closed the connection.")
+                if line.startswith("AUTH"):
+                    break
+
+            self._write('AUTH PLAIN "%s" "%s"' % (self.user, self.password))
+
+            line = self._readline()
+            if not line.startswith("AUTH OK"):
+                raise SocketError("TPL authentication failed (%s)." % line)
+        except socket.error, e:
+            raise SocketError("Error talking to TPL server (%s)." % e)
+
+    def isListening(self):
+        return self._reader is not None and self._reader.isAlive()
+
+    def disconnect(self):
+        if self._socket is None:
+            return
+
+        try:
+            self._write("DISCONNECT")
+        except (socket.error, SocketError):
+            pass
+
+        try:
+            self._socket.shutdown(socket.SHUT_RDWR)
+        except socket.error:
+            pass
+        self._socket.close()
+
+        if self._reader and self._reader is not threading.currentThread():
+            self._reader.join(self.timeout)
+
+    def _readline(self):
+        line = self._file.readline()
+        if self.echo:
+            print "<", line.rstrip()
+        if self.debug:
+            self.log.append("< %s" % line.rstrip())
+        return line.rstrip("\r\n")
+
+    def _write(self, line):
+        if self.echo:
+            print ">", line
+        if self.debug:
+            self.log.append("> %s" % line)
+
+        self._writeLock.acquire()
+        try:
+            self._socket.sendall(line + "\n")
+        except socket.error, e:
+            raise SocketError("Error writing to TPL server (%s)." % e)
+        finally:
+            self._writeLock.release()
+
+    def _read(self):
+        """
+        Reader thread: route each line to its command.
+        """
+        try:
+            while True:
+                line = self._readline()
+                if not line:
+                    break
+                self._route(line)
+        except (socket.error, ValueError), e:
+            log.debug("TPL2 reader stopped (%s)." % e)
+
+        # nothing else will arrive
+        self._lock.acquire()
+        try:
+            pending = [cmd for cmd in self.commands_sent.values() if not cmd.finished()]
+        finally:
+            self._lock.release()
+
+        for cmd in pending:
+            cmd._finish("connection closed")
+
+    def _route(self, line):
+        fields = line.split(" ", 2)
+
+        try:
+            id = int(fields[0])
+        except ValueError:
+            id = None
+
+        if id is None or len(fields) < 2:
+            self._event(line)
+            return
+
+        self._lock.acquire()
+        try:
+            cmd = self.commands_sent.get(id)
+        finally:
+            self._lock.release()
+
+        kind = fields[1]
+        rest = fields[2] if len(fields) > 2 else ""
+
+        if kind == "EVENT":
+            self._event(line)
+
+        if cmd is None:
+            if kind != "EVENT":
+                log.debug("TPL2 answer for unknown command: %s" % line)
+            return
+
+        cmd._receive(kind, rest, line)
+
+    def _event(self, line):
+        for listener in list(self._listeners):
+            try:
+                listener(line)
+            except Exception:
+                log.exception("Error on TPL2 event listener.")
+
+    def addListener(self, listener):
+        """
+        Call listener(line) for every EVENT (or unrouted) line.
+        """
+        self._listeners.append(listener)
+
+    def removeListener(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    #
+    # commands
+    #
+
+    def send(self, command):
+        """
+        Send command (without the id) and return its L{TPLCommand}.
+        """
+        if not self.isListening():
+            raise SocketError("Not connected to TPL server.")
+
+        self._lock.acquire()
+        try:
+            id = self._nextId
+            self._nextId += 1
+
+            cmd = TPLCommand(id, command)
+            self.commands_sent[id] = cmd
+
+            # forget old finished commands
+            while len(self.commands_sent) > self.history:
+                oldest = self.commands_sent.keys()[0]
+                if not self.commands_sent[oldest].finished():
+                    break
+                del self.commands_sent[oldest]
+        finally:
+            self._lock.release()
+
+        self._write("%d %s" % (id, command))
+        return cmd
+
+    def get(self, *objects):
+        """
+        GET of all objects in one command (one round trip).
+        """
+        return self.send("GET %s" % ";".join(objects))
+
+    def getobjects(self, *objects):
+        """
+        Values of objects, in order (None for the ones that failed).
+        """
+        cmd = self.get(*objects)
+        if not cmd.wait(self.timeout):
+            raise TPLException("Timeout waiting for '%s'." % cmd.command)
+        return [cmd.values.get(name) for name in objects]
+
+    def getobject(self, object):
+        return self.getobjects(object)[0]
+
+    def set(self, object, value, wait=False, binary=False):
+        """
+        SET object=value, returns the command id (see finished and
+        succeeded, or commands_sent for the L{TPLCommand}). wait=True
+        waits for the command to finish.
+        """
+        cmd = self.send("SET %s=%s" % (object, formatValue(value)))
+        if wait:
+            cmd.wait(self.timeout)
+        return cmd.id
+
+    def command(self, id):
+        return self.commands_sent[id]
+
+    def finished(self, id):
+        return self.commands_sent[id].finished()
+
+    def succeeded(self, id):
+        return self.commands_sent[id].succeeded()
+
+    def wait(self, id, timeout=None):
+        return self.commands_sent[id].wait(timeout)